@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Сверка пакетного анализа с отдельным построением графа каждого пакета
+
+Для каждого сценария записи BatchAnalyzer (общий граф всех пакетов списка)
+сравниваются с записями по графу, построенному build_graph от одного
+пакета с тем же max_depth. Расхождение - ошибка, скрипт завершается с
+кодом 1.
+
+Пример:
+    python benchmarks/batch_check.py
+    python benchmarks/batch_check.py --packages 5000 --roots 200
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+
+# Добавляем корень проекта в путь для импорта
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.generate_repo import SyntheticRepository
+from src.utils.batch import BatchAnalyzer
+from src.utils.dependency_graph import DependencyGraph
+from src.utils.repository import RepositoryManager
+
+
+def compare(path, packages, max_depth):
+    """Расхождения записей пакетного анализа с отдельными графами"""
+    manager = RepositoryManager(test_mode=True, test_repo_path=path)
+    stream = io.StringIO()
+    with contextlib.redirect_stdout(io.StringIO()):
+        BatchAnalyzer(DependencyGraph(manager, max_depth)).run(packages, stream)
+    batch = [json.loads(line) for line in stream.getvalue().splitlines()]
+    
+    problems = []
+    for record in batch:
+        package = record['package']
+        graph = DependencyGraph(manager, max_depth)
+        with contextlib.redirect_stdout(io.StringIO()):
+            graph.build_graph(package)
+        expected = BatchAnalyzer(graph).analyze(package)
+        if record != expected:
+            problems.append(
+                f"{package}: зависимостей {len(record.get('dependencies', ()))}, "
+                f"отдельно {len(expected.get('dependencies', ()))}"
+            )
+    return problems
+
+
+def scenario_shared_node_depths(directory, args):
+    """Два корня доходят до общего пакета на разной глубине"""
+    # От top пакет mid лежит на глубине 2 и при max_depth=2 не раскрывается,
+    # от mid (второго корня) - на глубине 0
+    path = os.path.join(directory, 'shared.txt')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("top: upper\nupper: mid\nmid: low\nlow: base\nbase:\n")
+    return compare(path, ['top', 'mid'], max_depth=2)
+
+
+def scenario_synthetic(directory, args):
+    """Случайные корни синтетического репозитория при малом max_depth"""
+    repository = SyntheticRepository(packages=args.packages, seed=args.seed).generate()
+    path = os.path.join(directory, 'synthetic.txt')
+    repository.write_test_file(path)
+    rng = random.Random(args.seed)
+    packages = rng.sample(repository.names, min(args.roots, len(repository.names)))
+    problems = []
+    for max_depth in (1, 3, args.packages + 1):
+        problems.extend(f"max_depth={max_depth}: {problem}" for problem in compare(path, packages, max_depth))
+    return problems
+
+
+SCENARIOS = {
+    name[len('scenario_'):]: function
+    for name, function in globals().items() if name.startswith('scenario_')
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сверка пакетного анализа с отдельными графами пакетов')
+    parser.add_argument('--packages', '-n', type=int, default=2000,
+                        help='Пакетов в синтетическом репозитории (по умолчанию: 2000)')
+    parser.add_argument('--roots', type=int, default=50, help='Пакетов в списке (по умолчанию: 50)')
+    parser.add_argument('--seed', type=int, default=1, help='Зерно генератора (по умолчанию: 1)')
+    args = parser.parse_args()
+    
+    failures = 0
+    with tempfile.TemporaryDirectory() as directory:
+        for name, scenario in SCENARIOS.items():
+            problems = scenario(directory, args)
+            failures += bool(problems)
+            status = '✓' if not problems else '✗'
+            print(f"  {status} {name:<20} {scenario.__doc__}")
+            for problem in problems[:10]:
+                print(f"      {problem}")
+    
+    print(f"\nСценариев: {len(SCENARIOS)}, с ошибками: {failures}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""Генератор синтетических репозиториев для замеров производительности
+
+Пример:
+    python benchmarks/generate_repo.py --packages 100000 --format apkindex -o /tmp/repo/APKINDEX.tar.gz
+"""
+import argparse
+import base64
+import gzip
+import hashlib
+import io
+import random
+import tarfile
+import time
+
+class SyntheticRepository:
+    """Синтетический репозиторий, похожий по форме на Alpine
+    
+    Пакеты разложены по уровням: пакет уровня L зависит в основном от пакетов
+    уровня L-1 и изредка от более низких, поэтому длина самой длинной цепочки
+    близка к depth. Зависимости выбираются со смещением к началу уровня - как
+    в Alpine, где на musl и немногие базовые библиотеки ссылается почти все.
+    Доля cycle_density пакетов получает ребро вверх, замыкающее цикл.
+    """
+    
+    def __init__(self, packages=1000, fanout=4, cycle_density=0.01, depth=12, seed=1):
+        self.package_count = packages
+        self.fanout = fanout
+        self.cycle_density = cycle_density
+        self.depth = depth
+        self.seed = seed
+        self.names = []
+        self.levels = []
+        self.dependencies = []
+    
+    def generate(self):
+        """Сгенерировать имена и зависимости (детерминированно по seed)"""
+        rng = random.Random(self.seed)
+        depth = max(1, min(self.depth, self.package_count))
+        
+        # Нижние уровни меньше верхних: базовых библиотек немного
+        weights = [level + 1 for level in range(depth)]
+        total = sum(weights)
+        sizes = [max(1, self.package_count * weight // total) for weight in weights]
+        sizes[-1] += self.package_count - sum(sizes)
+        
+        self.names = []
+        self.levels = []
+        for level, size in enumerate(sizes):
+            prefix = "lib" if level < depth // 2 else ""
+            first = len(self.names)
+            self.names.extend(f"{prefix}syn{index:06d}" for index in range(first, first + size))
+            self.levels.append(range(first, first + size))
+        
+        self.dependencies = []
+        for level, members in enumerate(self.levels):
+            for package_id in members:
+                targets = []
+                if level > 0:
+                    count = min(rng.randint(0, 2 * self.fanout), len(self.levels[level - 1]))
+                    for _ in range(count):
+                        # Чаще уровень ниже, реже - любой из более низких
+                        target_level = level - 1 if rng.random() < 0.7 else rng.randrange(level)
+                        candidates = self.levels[target_level]
+                        target = candidates[int(len(candidates) * rng.random() ** 2)]
+                        if target not in targets:
+                            targets.append(target)
+                if rng.random() < self.cycle_density:
+                    upper = self.levels[min(level + rng.randint(0, 2), depth - 1)]
+                    target = upper[rng.randrange(len(upper))]
+                    if target != package_id and target not in targets:
+                        targets.append(target)
+                self.dependencies.append(targets)
+        return self
+    
+    def iter_test_lines(self):
+        """Строки формата тестового репозитория: 'имя: зав1 зав2'"""
+        for package_id, name in enumerate(self.names):
+            yield f"{name}: {' '.join(self.names[target] for target in self.dependencies[package_id])}\n"
+    
+    def iter_apkindex_lines(self):
+        """Текст APKINDEX: библиотеки предоставляют so:, часть зависимостей - через so: и с версиями"""
+        rng = random.Random(self.seed + 1)
+        timestamp = int(time.time())
+        library_levels = max(1, len(self.levels) // 2)
+        is_library = bytearray(len(self.names))
+        for members in self.levels[:library_levels]:
+            for package_id in members:
+                is_library[package_id] = 1
+        
+        for package_id, name in enumerate(self.names):
+            dependencies = []
+            for target in self.dependencies[package_id]:
+                target_name = self.names[target]
+                roll = rng.random()
+                if is_library[target] and roll < 0.6:
+                    dependencies.append(f"so:{target_name}.so.1")
+                elif roll < 0.8:
+                    dependencies.append(target_name)
+                else:
+                    dependencies.append(f"{target_name}>=1.0")
+            if rng.random() < 0.02:
+                dependencies.append(f"!{name}-legacy")
+            
+            provides = f"so:{name}.so.1=1.0.0" if is_library[package_id] else f"cmd:{name}=1.0-r0"
+            checksum = base64.b64encode(hashlib.sha1(name.encode()).digest()).decode()
+            size = rng.randint(1000, 5000000)
+            yield (
+                f"C:Q1{checksum}\n"
+                f"P:{name}\n"
+                f"V:1.0-r{package_id % 7}\n"
+                f"A:x86_64\n"
+                f"S:{size}\n"
+                f"I:{size * 3}\n"
+                f"T:Synthetic package {name}\n"
+                f"U:https://example.org/{name}\n"
+                f"L:MIT\n"
+                f"o:{name}\n"
+                f"m:Benchmark <bench@example.org>\n"
+                f"t:{timestamp}\n"
+                f"c:{checksum[:12]}\n"
+                + (f"D:{' '.join(dependencies)}\n" if dependencies else "")
+                + f"p:{provides}\n"
+                + ("k:100\n" if package_id % 97 == 0 else "")
+                + "\n"
+            )
+    
+    def write_test_file(self, path):
+        """Записать тестовый репозиторий (.gz - сжатый)"""
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'wt', encoding='utf-8') as f:
+            f.writelines(self.iter_test_lines())
+    
+    def apkindex_text(self):
+        """Содержимое APKINDEX целиком"""
+        return "".join(self.iter_apkindex_lines())
+    
+    def write_apkindex(self, path):
+        """Записать APKINDEX.tar.gz (как в зеркалах Alpine: DESCRIPTION и APKINDEX)"""
+        data = self.apkindex_text().encode('utf-8')
+        with tarfile.open(path, 'w:gz') as tar:
+            for member_name, content in (("DESCRIPTION", b"synthetic-benchmark\n"), ("APKINDEX", data)):
+                info = tarfile.TarInfo(member_name)
+                info.size = len(content)
+                info.mtime = int(time.time())
+                tar.addfile(info, io.BytesIO(content))
+    
+    def top_package(self):
+        """Пакет верхнего уровня с наибольшим числом прямых зависимостей (корень для замеров)"""
+        members = self.levels[-1]
+        return self.names[max(members, key=lambda package_id: (len(self.dependencies[package_id]), -package_id))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Генератор синтетического репозитория пакетов')
+    parser.add_argument('--packages', '-n', type=int, default=1000, help='Количество пакетов (по умолчанию: 1000)')
+    parser.add_argument('--fanout', type=int, default=4, help='Среднее число прямых зависимостей (по умолчанию: 4)')
+    parser.add_argument('--cycle-density', type=float, default=0.01,
+                        help='Доля пакетов с ребром вверх, образующим цикл (по умолчанию: 0.01)')
+    parser.add_argument('--depth', type=int, default=12, help='Количество уровней (по умолчанию: 12)')
+    parser.add_argument('--seed', type=int, default=1, help='Начальное значение генератора (по умолчанию: 1)')
+    parser.add_argument('--format', choices=['test', 'apkindex'], default='test',
+                        help='test - файл тестового репозитория, apkindex - APKINDEX.tar.gz')
+    parser.add_argument('--output', '-o', required=True, help='Путь к создаваемому файлу')
+    args = parser.parse_args()
+    
+    repository = SyntheticRepository(args.packages, args.fanout, args.cycle_density, args.depth, args.seed).generate()
+    if args.format == 'apkindex':
+        repository.write_apkindex(args.output)
+    else:
+        repository.write_test_file(args.output)
+    edges = sum(len(targets) for targets in repository.dependencies)
+    print(f"{args.output}: пакетов {len(repository.names)}, ребер {edges}, корень для замеров: {repository.top_package()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""Проверка зеркал на локальных HTTP-серверах с внедрением сбоев
+
+Сценарии запускают загрузку APKINDEX через RepositoryManager с локальными
+зеркалами, которые отвечают с задержкой, ошибками 503 и 404, обрывают
+или подвешивают передачу, поддерживают или не поддерживают Range и
+отвечают 304 на условный запрос. Для каждого сценария проверяется
+результат и счетчики профилировщика (повторы, докачки, гонки).
+
+Пример:
+    python benchmarks/mirror_standin.py
+    python benchmarks/mirror_standin.py resume_same_mirror stalled_probe
+    python benchmarks/mirror_standin.py --serve 8080 --cut-after 300000
+"""
+import argparse
+import contextlib
+import email.utils
+import http.server
+import io
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+# Добавляем корень проекта в путь для импорта
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.generate_repo import SyntheticRepository
+from src.utils.errors import RepositoryError
+from src.utils.mirrors import MirrorPool
+from src.utils.profiler import profiler
+from src.utils.repository import RepositoryManager
+
+ARCH = 'x86_64'
+
+
+class QuietServer(http.server.ThreadingHTTPServer):
+    """Сервер зеркала: клиент, оборвавший соединение (гонка, таймаут), - не ошибка"""
+    
+    daemon_threads = True
+    
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class FaultyMirror:
+    """Локальное зеркало: HTTP/1.1 с keep-alive, Range, ETag и управляемыми сбоями
+    
+    Поведение задается словарем faults и может меняться между запросами:
+    delay - задержка перед ответом, fail_503 - сколько ответов 503 отдать,
+    cut_after и cuts - после скольких байт тела и сколько раз оборвать
+    передачу, stall - сколько секунд молчать перед обрывом, down_after_cut -
+    выключить зеркало после обрыва, ranges - поддерживать ли Range,
+    redirect - URL, на который переадресовывать ответом 301. Запрос с
+    абсолютным URL (как к прокси) обслуживается по пути из URL.
+    requests хранит (путь, Range) всех запросов.
+    """
+    
+    def __init__(self, root, port=0, **faults):
+        self.root = root
+        self.faults = {'ranges': True, **faults}
+        self.requests = []
+        mirror = self
+        
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            
+            def log_message(self, format, *args):
+                pass
+            
+            def do_GET(self):
+                mirror.handle(self)
+        
+        self.server = QuietServer(('127.0.0.1', port), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+    
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+    
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def _take(self, name):
+        """Уменьшить счетчик сбоя; True, если сбой нужно внедрить"""
+        if self.faults.get(name, 0) > 0:
+            self.faults[name] -= 1
+            return True
+        return False
+    
+    @staticmethod
+    def _send_empty(handler, status, headers=()):
+        handler.send_response(status)
+        for name, value in headers:
+            handler.send_header(name, value)
+        handler.send_header('Content-Length', '0')
+        handler.end_headers()
+    
+    def handle(self, handler):
+        """Ответ на GET с учетом текущих сбоев"""
+        faults = self.faults
+        range_header = handler.headers.get('Range')
+        self.requests.append((handler.path, range_header))
+        if faults.get('delay'):
+            time.sleep(faults['delay'])
+        if self._take('fail_503'):
+            self._send_empty(handler, 503)
+            return
+        
+        request_path = urllib.parse.urlsplit(handler.path).path
+        if faults.get('redirect'):
+            self._send_empty(handler, 301, [('Location', faults['redirect'] + request_path)])
+            return
+        
+        path = os.path.join(self.root, request_path.lstrip('/'))
+        if not os.path.isfile(path):
+            self._send_empty(handler, 404)
+            return
+        with open(path, 'rb') as file:
+            data = file.read()
+        etag = f'"{os.path.getmtime(path):.0f}-{len(data)}"'
+        last_modified = email.utils.formatdate(os.path.getmtime(path), usegmt=True)
+        validators = (('ETag', etag), ('Last-Modified', last_modified))
+        
+        if handler.headers.get('If-None-Match') == etag:
+            self._send_empty(handler, 304, validators)
+            return
+        
+        start = 0
+        if (range_header and faults['ranges'] and
+                handler.headers.get('If-Range') in (None, etag, last_modified)):
+            start = int(range_header.partition('=')[2].partition('-')[0])
+            handler.send_response(206)
+            handler.send_header('Content-Range', f"bytes {start}-{len(data) - 1}/{len(data)}")
+        else:
+            handler.send_response(200)
+        handler.send_header('Content-Length', str(len(data) - start))
+        for name, value in validators:
+            handler.send_header(name, value)
+        handler.end_headers()
+        
+        body = data[start:]
+        cut_after = faults.get('cut_after')
+        if cut_after and len(body) > cut_after and self._take('cuts'):
+            handler.wfile.write(body[:cut_after])
+            handler.wfile.flush()
+            if faults.get('stall'):
+                time.sleep(faults['stall'])
+            handler.close_connection = True
+            with contextlib.suppress(OSError):
+                handler.connection.shutdown(socket.SHUT_RDWR)
+            if faults.get('down_after_cut'):
+                threading.Thread(target=self.stop, daemon=True).start()
+            return
+        with contextlib.suppress(OSError):
+            handler.wfile.write(body)
+
+
+class StalledMirror:
+    """Зеркало, которое принимает соединения и никогда не отвечает"""
+    
+    def __init__(self):
+        self.socket = socket.socket()
+        self.socket.bind(('127.0.0.1', 0))
+        self.socket.listen(64)
+        self.url = f"http://127.0.0.1:{self.socket.getsockname()[1]}"
+    
+    def start(self):
+        return self
+    
+    def stop(self):
+        self.socket.close()
+
+
+def unused_url():
+    """URL порта, на котором никто не слушает"""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return f"http://127.0.0.1:{probe.getsockname()[1]}"
+
+
+class ScenarioContext:
+    """Каталог зеркала с APKINDEX и запуск загрузки индекса"""
+    
+    def __init__(self, directory, packages):
+        self.directory = directory
+        self.root = os.path.join(directory, 'mirror')
+        os.makedirs(os.path.join(self.root, ARCH))
+        repository = SyntheticRepository(packages).generate()
+        repository.write_apkindex(os.path.join(self.root, ARCH, 'APKINDEX.tar.gz'))
+        self.package_count = len(repository.names)
+        self.mirrors = []
+    
+    def mirror(self, **faults):
+        mirror = FaultyMirror(self.root, **faults).start()
+        self.mirrors.append(mirror)
+        return mirror
+    
+    def stalled(self):
+        mirror = StalledMirror().start()
+        self.mirrors.append(mirror)
+        return mirror
+    
+    def close(self):
+        for mirror in self.mirrors:
+            mirror.stop()
+        self.mirrors = []
+    
+    def load(self, *urls, **options):
+        """Загрузить индекс с зеркал; возвращает (записей или исключение, секунд, счетчики, вывод)"""
+        options.setdefault('arch', ARCH)
+        options.setdefault('retries', 2)
+        profiler.enable()
+        output = io.StringIO()
+        started = time.perf_counter()
+        manager = None
+        try:
+            with contextlib.redirect_stdout(output):
+                manager = RepositoryManager(repository_urls=['|'.join(urls)], **options)
+                result = len(manager.load_apk_index())
+        except RepositoryError as e:
+            result = e
+            manager = None
+        elapsed = time.perf_counter() - started
+        counters = {name.partition('.')[2]: value for name, value in profiler.report()['counters'].items()
+                    if name.startswith('network.')}
+        profiler.disable()
+        self.manager = manager
+        return result, elapsed, counters, output.getvalue()
+
+
+# Сценарии: функция получает ScenarioContext и возвращает список нарушенных ожиданий
+
+def scenario_failover(context):
+    """Основное зеркало недоступно - индекс берется со второго"""
+    mirror = context.mirror()
+    result, elapsed, counters, output = context.load(unused_url(), mirror.url)
+    return expect(result == context.package_count, f"записей {result}") + \
+        expect(counters.get('failed_requests', 0) >= 1, "нет отказа основного зеркала")
+
+
+def scenario_race(context):
+    """Медленное зеркало не дождалось ответа - побеждает подключенное следом"""
+    slow = context.mirror(delay=MirrorPool.RACE_DELAY * 8)
+    fast = context.mirror()
+    result, elapsed, counters, output = context.load(slow.url, fast.url)
+    # Загрузка не ждет медленное зеркало: RACE_DELAY и разбор индекса
+    return expect(result == context.package_count, f"записей {result}") + \
+        expect(counters.get('hedged_requests') == 1, f"дублирующих запросов {counters.get('hedged_requests')}") + \
+        expect(elapsed < MirrorPool.RACE_DELAY * 8, f"гонка заняла {elapsed:.2f} с")
+
+
+def scenario_retry_503(context):
+    """Два ответа 503 подряд - повторы с паузой, затем успех"""
+    mirror = context.mirror(fail_503=2)
+    result, elapsed, counters, output = context.load(mirror.url)
+    return expect(result == context.package_count, f"записей {result}") + \
+        expect(counters.get('retries') == 2, f"повторов {counters.get('retries')}")
+
+
+def scenario_resume_same_mirror(context):
+    """Обрыв передачи - докачка с того же зеркала запросом Range"""
+    mirror = context.mirror(cut_after=200000, cuts=1)
+    result, elapsed, counters, output = context.load(mirror.url)
+    ranges = [range_header for path, range_header in mirror.requests if range_header]
+    return expect(result == context.package_count, f"записей {result}") + \
+        expect(counters.get('resumes') == 1, f"докачек {counters.get('resumes')}") + \
+        expect(ranges == ['bytes=200000-'], f"запросы Range {ranges}")
+
+
+def scenario_resume_without_ranges(context):
+    """Сервер без Range отдает файл целиком - полученная часть пропускается"""
+    mirror = context.mirror(cut_after=200000, cuts=1, ranges=False)
+    result, elapsed, counters, output = context.load(mirror.url)
+    return expect(result == context.package_count, f"записей {result}") + \
+        expect(counters.get('resumes') == 1, f"докачек {counters.get('resumes')}")
+
+
+def scenario_resume_other_mirror(context):
+    """Первое зеркало обрывает передачу и выключается - докачка со второго"""
+    broken = context.mirror(cut_after=200000, cuts=1, down_after_cut=True)
+    healthy = context.mirror()
+    result, elapsed, counters, output = context.load(broken.url, healthy.url)
+    ranges = [range_header for path, range_header in healthy.requests if range_header]
+    return expect(result == context.package_count, f"записей {result}") + \
+        expect(bool(ranges), "второе зеркало не получило запрос Range")
+
+
+def scenario_stall_timeout(context):
+    """Передача зависла - обрыв по таймауту и докачка"""
+    mirror = context.mirror(cut_after=200000, cuts=1, stall=5)
+    result, elapsed, counters, output = context.load(mirror.url, timeout=1)
+    return expect(result == context.package_count, f"записей {result}") + \
+        expect(counters.get('resumes') == 1, f"докачек {counters.get('resumes')}") + \
+        expect(elapsed < 4, f"загрузка заняла {elapsed:.2f} с")
+
+
+def scenario_not_found(context):
+    """404 на всех зеркалах - окончательный отказ без повторов"""
+    first = context.mirror()
+    second = context.mirror()
+    result, elapsed, counters, output = context.load(f"{first.url}/missing", f"{second.url}/missing")
+    return expect(isinstance(result, RepositoryError), f"результат {result}") + \
+        expect(not counters.get('retries'), f"повторов {counters.get('retries')}")
+
+
+def scenario_revalidate(context):
+    """Истекшая запись кэша ревалидируется: сервер отвечает 304"""
+    mirror = context.mirror()
+    cache_dir = os.path.join(context.directory, 'cache')
+    first, elapsed, counters, output = context.load(mirror.url, cache_dir=cache_dir, cache_ttl=0)
+    result, elapsed, counters, output = context.load(mirror.url, cache_dir=cache_dir, cache_ttl=0)
+    source = context.manager.get_cache_stats()['index_source'] if context.manager else None
+    return expect(first == context.package_count and result == context.package_count, f"записей {first}, {result}") + \
+        expect(counters.get('not_modified') == 1, f"ответов 304 {counters.get('not_modified')}") + \
+        expect(source == 'revalidated-cache', f"источник {source}")
+
+
+def scenario_stalled_probe(context):
+    """Зависшее зеркало при переборе архитектур стоит одного таймаута, без повторов"""
+    mirror = context.stalled()
+    result, elapsed, counters, output = context.load(mirror.url, arch=None, timeout=1)
+    return expect(isinstance(result, RepositoryError), f"результат {result}") + \
+        expect(not counters.get('retries'), f"повторов {counters.get('retries')}") + \
+        expect(elapsed < 2, f"перебор занял {elapsed:.2f} с")
+
+
+def scenario_redirect(context):
+    """Зеркало переадресует (301) на другое - индекс берется по новому адресу"""
+    target = context.mirror()
+    moved = context.mirror(redirect=target.url)
+    result, elapsed, counters, output = context.load(moved.url)
+    return expect(result == context.package_count, f"записей {result}") + \
+        expect(counters.get('redirects') == 1, f"переадресаций {counters.get('redirects')}") + \
+        expect(bool(target.requests), "запрос не дошел до зеркала назначения")
+
+
+def scenario_redirect_loop(context):
+    """Зеркало переадресует само на себя - отказ после MirrorPool.MAX_REDIRECTS переходов"""
+    mirror = context.mirror()
+    mirror.faults['redirect'] = mirror.url
+    result, elapsed, counters, output = context.load(mirror.url)
+    return expect(isinstance(result, RepositoryError), f"результат {result}") + \
+        expect(counters.get('redirects') == MirrorPool.MAX_REDIRECTS, f"переадресаций {counters.get('redirects')}")
+
+
+def scenario_proxy(context):
+    """Задан HTTP_PROXY - запрос к недоступному зеркалу идет через прокси"""
+    proxy = context.mirror()
+    with proxy_environment(proxy.url):
+        result, elapsed, counters, output = context.load(unused_url())
+    absolute = [path for path, range_header in proxy.requests if path.startswith('http://')]
+    return expect(result == context.package_count, f"записей {result}") + \
+        expect(bool(absolute), f"запросы к прокси {proxy.requests}")
+
+
+@contextlib.contextmanager
+def proxy_environment(url=None):
+    """Переменные прокси на время блока: только http_proxy=url (None - без прокси)"""
+    saved = {name: value for name, value in os.environ.items() if name.lower().endswith('_proxy')}
+    for name in saved:
+        del os.environ[name]
+    if url:
+        os.environ['http_proxy'] = url
+    try:
+        yield
+    finally:
+        for name in list(os.environ):
+            if name.lower().endswith('_proxy'):
+                del os.environ[name]
+        os.environ.update(saved)
+
+
+def expect(condition, message):
+    return [] if condition else [message]
+
+
+SCENARIOS = {
+    name[len('scenario_'):]: function
+    for name, function in globals().items() if name.startswith('scenario_')
+}
+
+
+def serve(args):
+    """Одно зеркало со сбоями для ручной проверки (до Ctrl+C)"""
+    with tempfile.TemporaryDirectory() as directory:
+        context = ScenarioContext(directory, args.packages)
+        faults = {'cut_after': args.cut_after, 'cuts': args.cuts, 'stall': args.stall,
+                  'delay': args.delay, 'fail_503': args.fail_503, 'ranges': not args.no_ranges}
+        mirror = FaultyMirror(context.root, args.serve, **faults)
+        print(f"Зеркало {mirror.url} ({context.package_count} пакетов, {ARCH}), сбои: {faults}")
+        try:
+            mirror.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            mirror.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Проверка зеркал на локальных серверах с внедрением сбоев')
+    parser.add_argument('scenarios', nargs='*', help=f"Сценарии (по умолчанию все: {', '.join(SCENARIOS)})")
+    parser.add_argument('--packages', '-n', type=int, default=20000,
+                        help='Пакетов в APKINDEX зеркала (по умолчанию: 20000, около 1,4 МБ)')
+    parser.add_argument('--race-delay', type=float, default=0.5,
+                        help='MirrorPool.RACE_DELAY на время проверки в секундах (по умолчанию: 0.5)')
+    parser.add_argument('--serve', type=int, metavar='PORT', help='Только запустить одно зеркало на порту PORT')
+    parser.add_argument('--cut-after', type=int, default=0, help='Для --serve: обрывать передачу после N байт')
+    parser.add_argument('--cuts', type=int, default=1, help='Для --serve: сколько раз обрывать (по умолчанию: 1)')
+    parser.add_argument('--stall', type=float, default=0, help='Для --serve: секунд молчания перед обрывом')
+    parser.add_argument('--delay', type=float, default=0, help='Для --serve: задержка перед каждым ответом')
+    parser.add_argument('--fail-503', type=int, default=0, help='Для --serve: сколько первых ответов 503 отдать')
+    parser.add_argument('--no-ranges', action='store_true', help='Для --serve: не поддерживать Range')
+    args = parser.parse_args()
+    
+    if args.serve is not None:
+        serve(args)
+        return
+    
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"неизвестные сценарии: {', '.join(unknown)}")
+    
+    MirrorPool.RACE_DELAY = args.race_delay
+    failures = 0
+    # Зеркала локальные: прокси из окружения задает только сценарий proxy
+    with tempfile.TemporaryDirectory() as directory, proxy_environment():
+        context = ScenarioContext(directory, args.packages)
+        for name in names:
+            started = time.perf_counter()
+            try:
+                problems = SCENARIOS[name](context)
+            finally:
+                context.close()
+            elapsed = time.perf_counter() - started
+            failures += bool(problems)
+            status = '✓' if not problems else '✗'
+            print(f"  {status} {name:<24} {elapsed:>6.2f} с  {SCENARIOS[name].__doc__}")
+            for problem in problems:
+                print(f"      {problem}")
+    
+    print(f"\nСценариев: {len(names)}, с ошибками: {failures}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""Замеры времени и пиковой памяти основных операций на синтетических репозиториях
+
+Пример:
+    python benchmarks/run_benchmarks.py --sizes 1000,10000,100000
+    python benchmarks/run_benchmarks.py --sizes 1000,10000 --save-baseline
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Добавляем корень проекта в путь для импорта
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.generate_repo import SyntheticRepository
+from src.utils.apk_parser import APKParser
+from src.utils.repository import RepositoryManager
+from src.utils.dependency_graph import DependencyGraph
+from src.utils.visualizer import PlantUMLVisualizer
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+class BenchmarkContext:
+    """Сгенерированный репозиторий одного размера в двух форматах"""
+    
+    def __init__(self, repository, directory):
+        self.repository = repository
+        self.root = repository.top_package()
+        self.test_path = os.path.join(directory, f"repo_{len(repository.names)}.txt")
+        self.apkindex_path = os.path.join(directory, f"APKINDEX_{len(repository.names)}.tar.gz")
+        repository.write_test_file(self.test_path)
+        repository.write_apkindex(self.apkindex_path)
+        self.apkindex_text = repository.apkindex_text()
+    
+    def test_manager(self):
+        return RepositoryManager(test_mode=True, test_repo_path=self.test_path)
+    
+    def built_graph(self, full=False):
+        """Граф тестового репозитория без ограничения глубины"""
+        graph = DependencyGraph(self.test_manager(), max_depth=len(self.repository.names) + 1)
+        if full:
+            graph.build_full_graph()
+        else:
+            graph.build_graph(self.root)
+        return graph
+
+
+def _count_archive_records(path):
+    with open(path, 'rb') as f:
+        return sum(1 for _ in APKParser.iter_apkindex_archive(f))
+
+
+def _fresh_condensation(context):
+    """Граф, у которого компоненты сильной связности еще не посчитаны"""
+    graph = context.built_graph()
+    graph._condensation = None
+    graph._closure_index = None
+    return graph
+
+
+# Операция -> (подготовка, замеряемое действие); подготовка в замер не входит
+OPERATIONS = {
+    'parse_apkindex_content': (
+        lambda context: context.apkindex_text,
+        lambda text: APKParser.parse_apkindex_content(text),
+    ),
+    'iter_apkindex_archive': (
+        lambda context: context.apkindex_path,
+        _count_archive_records,
+    ),
+    'load_apk_index': (
+        lambda context: RepositoryManager(repository_url=context.apkindex_path),
+        lambda manager: manager.load_apk_index(),
+    ),
+    'build_graph': (
+        lambda context: (context.root, DependencyGraph(
+            context.test_manager(), max_depth=len(context.repository.names) + 1)),
+        lambda state: state[1].build_graph(state[0]),
+    ),
+    'build_full_graph': (
+        lambda context: DependencyGraph(context.test_manager()),
+        lambda graph: graph.build_full_graph(),
+    ),
+    'build_full_graph_apkindex': (
+        lambda context: DependencyGraph(RepositoryManager(repository_url=context.apkindex_path)),
+        lambda graph: graph.build_full_graph(),
+    ),
+    'has_cycles': (
+        _fresh_condensation,
+        lambda graph: graph.has_cycles(),
+    ),
+    'get_install_order': (
+        lambda context: (context.root, _fresh_condensation(context)),
+        lambda state: state[1].get_install_order(state[0]),
+    ),
+    'print_ascii_tree': (
+        lambda context: (context.root, context.built_graph()),
+        lambda state: state[1].print_ascii_tree(state[0], stream=io.StringIO()),
+    ),
+    'generate_plantuml': (
+        lambda context: (context.root, PlantUMLVisualizer(context.built_graph())),
+        lambda state: state[1].generate_plantuml(state[0]),
+    ),
+    'generate_simple_plantuml': (
+        lambda context: (context.root, PlantUMLVisualizer(context.built_graph())),
+        lambda state: state[1].generate_simple_plantuml(state[0]),
+    ),
+}
+
+
+def measure(context, operation, repeat):
+    """Лучшее время из repeat запусков и пиковая память отдельного запуска
+    
+    Память считается через tracemalloc, который замедляет выполнение,
+    поэтому время и память замеряются в разных запусках. Диагностический
+    вывод операций подавляется.
+    """
+    prepare, action = OPERATIONS[operation]
+    best = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            state = prepare(context)
+            gc.collect()
+            start_time = time.perf_counter()
+            action(state)
+            elapsed = time.perf_counter() - start_time
+            best = elapsed if best is None else min(best, elapsed)
+        
+        state = prepare(context)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            action(state)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return {'time': round(best, 6), 'peak_kb': peak // 1024}
+
+
+def compare(results, baseline, thresholds):
+    """Сравнить с базовой линией; возвращает список регрессий
+    
+    thresholds - допустимое отношение к базовой линии по метрикам.
+    """
+    regressions = []
+    for size, operations in results.items():
+        for operation, result in operations.items():
+            reference = baseline.get(size, {}).get(operation)
+            if not reference or 'error' in result or 'error' in reference:
+                continue
+            for metric in ('time', 'peak_kb'):
+                # Слишком малые значения шумят - сравниваем с порогом снизу
+                floor = 0.005 if metric == 'time' else 64
+                ratio = max(result[metric], floor) / max(reference[metric], floor)
+                result[f"{metric}_ratio"] = round(ratio, 2)
+                if ratio > thresholds[metric]:
+                    regressions.append(f"{operation} ({size} пакетов): {metric} {reference[metric]} -> {result[metric]} (x{ratio:.2f})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Замеры производительности на синтетических репозиториях')
+    parser.add_argument('--sizes', default='1000,10000',
+                        help='Размеры репозиториев через запятую, от 1000 до 200000 (по умолчанию: 1000,10000)')
+    parser.add_argument('--fanout', type=int, default=4, help='Среднее число прямых зависимостей (по умолчанию: 4)')
+    parser.add_argument('--cycle-density', type=float, default=0.01, help='Доля пакетов в циклах (по умолчанию: 0.01)')
+    parser.add_argument('--depth', type=int, default=12, help='Количество уровней (по умолчанию: 12)')
+    parser.add_argument('--seed', type=int, default=1, help='Начальное значение генератора (по умолчанию: 1)')
+    parser.add_argument('--operations', help=f"Операции через запятую (по умолчанию все: {', '.join(OPERATIONS)})")
+    parser.add_argument('--repeat', type=int, default=5, help='Запусков на замер времени (по умолчанию: 5)')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Файл базовой линии (по умолчанию: benchmarks/baseline.json)')
+    parser.add_argument('--save-baseline', action='store_true', help='Записать результаты как новую базовую линию')
+    parser.add_argument('--threshold', type=float, default=2.0,
+                        help='Во сколько раз время может превысить базовую линию до регрессии (по умолчанию: 2.0)')
+    parser.add_argument('--memory-threshold', type=float, default=1.2,
+                        help='То же для пиковой памяти, которая от запуска к запуску почти не меняется (по умолчанию: 1.2)')
+    parser.add_argument('--output', help='Записать результаты в JSON-файл')
+    args = parser.parse_args()
+    
+    sizes = [int(size) for size in args.sizes.split(',')]
+    operations = args.operations.split(',') if args.operations else list(OPERATIONS)
+    unknown = [operation for operation in operations if operation not in OPERATIONS]
+    if unknown:
+        parser.error(f"неизвестные операции: {', '.join(unknown)}")
+    
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            repository = SyntheticRepository(size, args.fanout, args.cycle_density, args.depth, args.seed).generate()
+            context = BenchmarkContext(repository, directory)
+            print(f"\n{size} пакетов (корень: {context.root})")
+            results[str(size)] = {}
+            for operation in operations:
+                try:
+                    result = measure(context, operation, args.repeat)
+                except (RecursionError, MemoryError) as e:
+                    result = {'error': type(e).__name__}
+                results[str(size)][operation] = result
+                if 'error' in result:
+                    print(f"  {operation:<28} ошибка: {result['error']}")
+                else:
+                    print(f"  {operation:<28} {result['time']:>10.4f} с {result['peak_kb']:>10} КБ")
+    
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {'fanout': args.fanout, 'cycle_density': args.cycle_density,
+                       'depth': args.depth, 'seed': args.seed},
+        'results': results,
+    }
+    
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"\nБазовая линия сохранена в {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('parameters') != report['parameters']:
+            print(f"\nПредупреждение: параметры генерации отличаются от базовой линии {baseline.get('parameters')}")
+        thresholds = {'time': args.threshold, 'peak_kb': args.memory_threshold}
+        regressions = compare(results, baseline['results'], thresholds)
+        print(f"\nСравнение с {args.baseline} (порог: время x{args.threshold}, память x{args.memory_threshold}):")
+        for regression in regressions:
+            print(f"  ⚠️  {regression}")
+        if not regressions:
+            print("  ✓ Регрессий нет")
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+    
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
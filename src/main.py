@@ -9,93 +9,112 @@ from src.utils.config import Config
 from src.utils.errors import ConfigurationError
 from src.utils.repository import RepositoryManager
 from src.utils.dependency_graph import DependencyGraph
-from src.utils.visualizer import PlantUMLVisualizer
+from src.utils.report_writer import ReportWriter
+from src.utils.profiler import profiler
+
+# Модули отдельных режимов (сервер, экспорт, PlantUML, сравнение версий)
+# импортируются при первом использовании, чтобы не замедлять запуск
 
 def main():
     """Основная функция приложения"""
+    config = Config()
     try:
         # Инициализация и загрузка конфигурации
-        config = Config()
         config.load_from_args()
+        if config.profile_path:
+            profiler.enable()
+        
+        # В пакетном и машиночитаемом режимах stdout содержит только результаты,
+        # остальной вывод - в stderr
+        quiet = config.output_format != 'text'
+        output = sys.stdout
+        if config.batch_path or quiet:
+            sys.stdout = sys.stderr
         
         # Вывод конфигурации (требование этапа 1)
-        config.display_config()
+        if not quiet:
+            config.display_config()
         
         # Создаем менеджер репозитория
-        repo_manager = RepositoryManager(
-            repository_url=config.repository_url,
-            test_mode=config.test_mode,
-            test_repo_path=config.test_repo_path
-        )
+        def create_repository_manager(repository_urls=None):
+            repository_urls = repository_urls or config.repository_urls
+            return RepositoryManager(
+                repository_urls=[] if config.test_mode else repository_urls,
+                test_mode=config.test_mode,
+                test_repo_path=repository_urls[0] if config.test_mode else None,
+                cache_dir=config.cache_dir,
+                cache_ttl=config.cache_ttl,
+                offline=config.offline,
+                arch=config.arch,
+                retries=config.retries,
+                timeout=config.timeout
+            )
+        
+        if config.serve:
+            run_server(config, create_repository_manager)
+            return
+        
+        if config.diff_from:
+            run_release_diff(config, create_repository_manager, output)
+            return
+        
+        repo_manager = create_repository_manager()
         
         # Создаем граф зависимостей
-        dependency_graph = DependencyGraph(repo_manager, config.max_depth)
+        dependency_graph = DependencyGraph(
+            repo_manager, config.max_depth, closure_memory_limit=config.closure_memory_limit
+        )
         
-        print(f"\nПостроение графа зависимостей для пакета: {config.package_name}")
-        print(f"Максимальная глубина: {config.max_depth}")
+        if config.batch_path:
+            from src.utils.batch import BatchAnalyzer
+            packages = BatchAnalyzer.read_package_names(config.batch_path)
+            print(f"\nПакетный анализ: {len(packages)} пакетов, максимальная глубина: {config.max_depth}")
+            BatchAnalyzer(dependency_graph).run(packages, output)
+            print(f"  Узлов в общем графе: {len(dependency_graph.graph)}")
+            print_index_stats(config, repo_manager)
+            return
         
         # Строим граф
-        cycles = dependency_graph.build_graph(config.package_name)
+        if config.all_packages:
+            if not quiet:
+                print("\nПостроение графа всех пакетов репозитория")
+            cycles = dependency_graph.build_full_graph()
+        else:
+            if not quiet:
+                print(f"\nПостроение графа зависимостей для пакета: {config.package_name}")
+                print(f"Максимальная глубина: {config.max_depth}")
+            cycles = dependency_graph.build_graph(config.package_name)
+        
+        if quiet:
+            write_machine_report(config, repo_manager, dependency_graph, cycles, output)
+            if config.export_path:
+                export_graph(config, dependency_graph)
+            return
         
         # Выводим информацию о циклических зависимостях
-        if cycles:
+        if cycles and config.all_packages:
+            print(f"\n⚠️  Обнаружены циклические зависимости ({len(cycles)}):")
+            for i, cycle in enumerate(cycles, 1):
+                print(f"  {i}. {' -> '.join(cycle)}")
+        elif cycles:
             print(f"\n⚠️  Обнаружены циклические зависимости: {cycles}")
         else:
             print("✓ Циклические зависимости не обнаружены")
         
-        # Выводим все зависимости
-        all_deps = dependency_graph.get_all_dependencies(config.package_name)
-        print(f"\nВсе зависимости пакета '{config.package_name}' (транзитивные):")
-        if all_deps:
-            for i, dep in enumerate(all_deps, 1):
-                depth = dependency_graph.depth_map.get(dep, 0)
-                print(f"  {i}. {dep} (глубина: {depth})")
-        else:
-            print("  (нет зависимостей)")
+        if config.all_packages:
+            print_repository_summary(dependency_graph)
         
-        # Выводим дерево зависимостей если включен режим ASCII-дерева
-        if config.ascii_tree:
-            print(f"\nДерево зависимостей '{config.package_name}':")
-            dependency_graph.print_ascii_tree(config.package_name)
-        
-        # Вывод порядка установки если включен режим
-        if config.install_order:
-            install_order = dependency_graph.get_install_order(config.package_name)
-            print(f"\n📦 Порядок установки зависимостей для '{config.package_name}':")
-            if install_order:
-                for i, pkg in enumerate(install_order, 1):
-                    depth = dependency_graph.depth_map.get(pkg, 0)
-                    marker = "🎯" if pkg == config.package_name else "📌"
-                    print(f"  {i}. {marker} {pkg} (глубина: {depth})")
-            else:
-                print("  (нет зависимостей)")
-            
-            # Сравнение с реальным менеджером
-            dependency_graph.compare_with_apk(config.package_name)
+        if config.package_name:
+            print_package_report(config, repo_manager, dependency_graph)
+        elif config.who_depends:
+            print_reverse_dependencies(config, dependency_graph)
         
-        # Генерация PlantUML диаграммы если включен режим
-        if config.plantuml:
-            print(f"\n🎨 Генерация PlantUML диаграммы для '{config.package_name}'...")
-            visualizer = PlantUMLVisualizer(dependency_graph)
-            
-            # Генерируем упрощенную версию для лучшей читаемости
-            plantuml_code = visualizer.generate_simple_plantuml(config.package_name)
-            
-            # Выводим информацию о PlantUML коде
-            visualizer.display_plantuml_info()
-            
-            # Сохраняем в файл
-            filename = f"{config.package_name}_dependencies.puml"
-            visualizer.save_plantuml_to_file(filename)
-            
-            # Сравнение с штатными инструментами
-            visualizer.compare_with_apk_tools(config.package_name)
+        if config.export_path:
+            exporter, node_count, edge_count = export_graph(config, dependency_graph)
+            if config.export_path != '-':
+                print(f"\n💾 Граф выгружен в {config.export_path} ({exporter.FORMAT}): узлов {node_count}, ребер {edge_count}")
         
-        # Выводим статистику
-        print(f"\n📊 Статистика графа:")
-        print(f"  Всего узлов: {len(dependency_graph.graph)}")
-        print(f"  Прямые зависимости: {len(dependency_graph.graph.get(config.package_name, []))}")
-        print(f"  Всего транзитивных зависимостей: {len(all_deps)}")
+        print_index_stats(config, repo_manager)
         
     except ConfigurationError as e:
         print(f"Ошибка конфигурации: {e}", file=sys.stderr)
@@ -106,6 +125,250 @@ def main():
     except Exception as e:
         print(f"Неожиданная ошибка: {e}", file=sys.stderr)
         sys.exit(1)
+    finally:
+        # Отчет выводится и при ошибке: он показывает, на какой фазе она случилась
+        if profiler.enabled:
+            profiler.write_report(config.profile_path)
+
+def export_graph(config, dependency_graph):
+    """Выгрузка графа в файл; возвращает (экспортер, узлов, ребер)"""
+    from src.utils.exporters import GraphExporter
+    exporter = GraphExporter.for_format(dependency_graph, config.export_format, config.export_path)
+    node_count, edge_count = exporter.export_to_file(config.export_path, config.package_name)
+    return exporter, node_count, edge_count
+
+def write_machine_report(config, repo_manager, dependency_graph, cycles, output):
+    """Результаты в JSON или TSV одной записью в поток, без пояснений"""
+    from src.utils.batch import BatchAnalyzer
+    writer = ReportWriter(output, config.output_format)
+    
+    if config.all_packages:
+        closure_sizes = dependency_graph.get_closure_sizes()
+        writer.write({
+            'packages': len(dependency_graph.graph),
+            'edges': dependency_graph.edge_count,
+            'levels': dependency_graph.get_level_count(),
+            'cycles': cycles,
+            'unresolved': dependency_graph.get_unresolved_packages(),
+            'largest_closures': dict(sorted(closure_sizes.items(), key=lambda item: (-item[1], item[0]))[:10]),
+        })
+    
+    if config.package_name:
+        record = BatchAnalyzer(dependency_graph).analyze(config.package_name)
+        if record['found']:
+            record['dependency_depths'] = {
+                name: dependency_graph.depth_map.get(name, 0) for name in record['dependencies']
+            }
+            if len(repo_manager.repository_urls) > 1:
+                record['repositories'] = {
+                    name: repo_manager.get_package_repository(name) for name in record['dependencies']
+                }
+            if config.paths_to:
+                record['path_count'] = dependency_graph.count_dependency_paths(config.package_name, config.paths_to)
+                record['shortest_paths'] = dependency_graph.get_shortest_paths(
+                    config.package_name, config.paths_to, config.path_limit
+                )
+        if config.who_depends:
+            record['dependents'] = dependency_graph.get_reverse_closure(config.who_depends, config.reverse_depth)
+        writer.write(record)
+    elif config.who_depends:
+        writer.write({
+            'packages': config.who_depends,
+            'dependents': dependency_graph.get_reverse_closure(config.who_depends, config.reverse_depth),
+        })
+    
+    writer.flush()
+
+def run_server(config, create_repository_manager):
+    """Режим сервера: граф всего репозитория в памяти, запросы по HTTP"""
+    from src.utils.server import DependencyServer
+    print("\nПостроение графа всех пакетов репозитория для сервера...")
+    server = DependencyServer(create_repository_manager, config.refresh_interval, config.closure_memory_limit)
+    snapshot = server.snapshot
+    print(f"  Пакетов: {len(snapshot.dependency_graph.graph)}, построение: {snapshot.build_time:.3f} с")
+    
+    print("  Запросы: /closure, /reverse, /install-order, /cycles, /status; POST /refresh")
+    if config.socket_path:
+        print(f"🛰  Сервер слушает Unix-сокет {config.socket_path}", flush=True)
+        server.serve(socket_path=config.socket_path)
+    else:
+        host, _, port = config.listen.rpartition(':')
+        print(f"🛰  Сервер слушает http://{host}:{port}", flush=True)
+        server.serve(host=host, port=int(port))
+
+def run_release_diff(config, create_repository_manager, output):
+    """Сравнение замыканий пакетов двух версий репозитория"""
+    from src.utils.release_diff import ReleaseDiff
+    old_manager = create_repository_manager(config.diff_from)
+    new_manager = create_repository_manager()
+    release_diff = ReleaseDiff(old_manager, new_manager, config.closure_memory_limit)
+    if config.output_format != 'text':
+        writer = ReportWriter(output, config.output_format)
+        for record in release_diff.compare([config.package_name] if config.package_name else None):
+            writer.write(record)
+        writer.write({'stats': release_diff.stats})
+        writer.flush()
+        return
+    
+    print(f"\nСравнение версий репозитория: {', '.join(config.diff_from)} -> {', '.join(config.repository_urls)}")
+    records = release_diff.compare([config.package_name] if config.package_name else None)
+    
+    print(f"\n📑 Изменения транзитивных замыканий:")
+    for record in records:
+        package = record['package']
+        if record['status'] == 'added':
+            print(f"  + {package} (новый пакет, зависимостей: {len(record['added'])})")
+        elif record['status'] == 'removed':
+            print(f"  - {package} (удален, было зависимостей: {len(record['removed'])})")
+        else:
+            parts = [f"+{name}" for name in record['added']] + [f"-{name}" for name in record['removed']]
+            print(f"  ~ {package}: {' '.join(parts) or 'состав не изменился'}")
+        for cycle in record['new_cycles']:
+            print(f"      ↺ новый цикл: {' + '.join(cycle)}")
+    if not records:
+        print("  (изменений нет)")
+    
+    stats = release_diff.stats
+    print(f"\n📊 Пакетов: {stats['old_packages']} -> {stats['new_packages']}")
+    print(f"  Добавлено: {stats['added']}, удалено: {stats['removed']}, с измененным замыканием: {stats['changed']}")
+    print(f"  Пропущено по отпечатку замыкания: {stats['skipped_by_fingerprint']} из {stats['compared']}")
+    print(f"  Новых циклов: {stats['new_cycles']}, исчезло циклов: {stats['resolved_cycles']}")
+    print_index_stats(config, new_manager)
+
+def print_index_stats(config, repo_manager):
+    """Статистика загрузки APKINDEX"""
+    if not config.test_mode:
+        stats = repo_manager.get_cache_stats()
+        print(f"  Загрузок индекса: {stats['index_loads']} ({stats['index_load_time']:.3f} с, источник: {stats['index_source']}, архитектура: {stats['arch']})")
+        print(f"  Обращений к индексу: {stats['hits']} из памяти, {stats['misses']} с загрузкой")
+        mirrors = [repository['mirror'] for repository in stats['repositories'] if repository['mirror']]
+        if mirrors:
+            print(f"  Загружено с зеркал: {', '.join(mirrors)}")
+
+def print_repository_summary(dependency_graph, top=10):
+    """Сводка по графу всего репозитория"""
+    packages = dependency_graph.graph
+    unresolved = dependency_graph.get_unresolved_packages()
+    
+    print(f"\n📚 Граф репозитория:")
+    print(f"  Пакетов: {len(packages)}")
+    print(f"  Ребер зависимостей: {dependency_graph.edge_count}")
+    print(f"  Компонент с циклами: {len(dependency_graph.get_cyclic_components())}")
+    print(f"  Уровней зависимостей: {dependency_graph.get_level_count()}")
+    if unresolved:
+        shown = ", ".join(unresolved[:top])
+        more = f" и еще {len(unresolved) - top}" if len(unresolved) > top else ""
+        print(f"  Не найдены в репозитории ({len(unresolved)}): {shown}{more}")
+    
+    closure_sizes = dependency_graph.get_closure_sizes()
+    largest = sorted(closure_sizes.items(), key=lambda item: (-item[1], item[0]))[:top]
+    if largest:
+        print(f"\n  Пакеты с наибольшим числом транзитивных зависимостей:")
+        for i, (package, size) in enumerate(largest, 1):
+            print(f"    {i}. {package} ({size})")
+
+def print_reverse_dependencies(config, dependency_graph):
+    """Обратные зависимости ("кто зависит от X")"""
+    dependents = dependency_graph.get_reverse_closure(config.who_depends, config.reverse_depth)
+    targets = ", ".join(f"'{name}'" for name in config.who_depends)
+    print(f"\n🔁 Пакеты, зависящие от {targets} (транзитивно):")
+    if dependents:
+        ordered = sorted(dependents.items(), key=lambda item: (item[1], item[0]))
+        for i, (dependent, distance) in enumerate(ordered, 1):
+            print(f"  {i}. {dependent} (расстояние: {distance})")
+    else:
+        print("  (нет зависимых пакетов)")
+
+def print_package_report(config, repo_manager, dependency_graph):
+    """Анализ зависимостей одного пакета по построенному графу"""
+    # Выводим все зависимости
+    all_deps = dependency_graph.get_all_dependencies(config.package_name)
+    print(f"\nВсе зависимости пакета '{config.package_name}' (транзитивные):")
+    if all_deps:
+        # Список выводится одной записью: построчный вывод большого замыкания медленный
+        depth_map = dependency_graph.depth_map
+        if len(repo_manager.repository_urls) > 1:
+            lines = [
+                f"  {i}. {dep} (глубина: {depth_map.get(dep, 0)}, "
+                f"репозиторий: {repo_manager.get_package_repository(dep) or 'не найден'})"
+                for i, dep in enumerate(all_deps, 1)
+            ]
+        else:
+            lines = [f"  {i}. {dep} (глубина: {depth_map.get(dep, 0)})" for i, dep in enumerate(all_deps, 1)]
+        print("\n".join(lines))
+    else:
+        print("  (нет зависимостей)")
+    
+    if config.who_depends:
+        print_reverse_dependencies(config, dependency_graph)
+    
+    # Пути зависимостей до указанного пакета
+    if config.paths_to:
+        path_count = dependency_graph.count_dependency_paths(config.package_name, config.paths_to)
+        print(f"\n🛤  Путей от '{config.package_name}' до '{config.paths_to}': {path_count}")
+        shortest = dependency_graph.get_shortest_paths(config.package_name, config.paths_to, config.path_limit)
+        for i, path in enumerate(shortest, 1):
+            print(f"  {i}. {' -> '.join(path)}")
+    
+    # Выводим дерево зависимостей если включен режим ASCII-дерева
+    if config.ascii_tree:
+        print(f"\nДерево зависимостей '{config.package_name}':")
+        dependency_graph.print_ascii_tree(
+            config.package_name, max_depth=config.tree_depth, max_width=config.tree_width
+        )
+    
+    # Вывод порядка установки если включен режим
+    if config.install_order:
+        install_waves = dependency_graph.get_install_waves(config.package_name)
+        print(f"\n📦 Порядок установки зависимостей для '{config.package_name}':")
+        if install_waves:
+            lines = []
+            for wave_number, wave in enumerate(install_waves, 1):
+                for group in wave:
+                    for pkg in group:
+                        depth = dependency_graph.depth_map.get(pkg, 0)
+                        marker = "🎯" if pkg == config.package_name else "📌"
+                        cycle = ", цикл" if len(group) > 1 else ""
+                        lines.append(f"  {len(lines) + 1}. {marker} {pkg} (волна: {wave_number}, глубина: {depth}{cycle})")
+            print("\n".join(lines))
+            
+            # Пакеты одной волны можно устанавливать параллельно
+            print(f"\n🌊 Волны установки ({len(install_waves)}):")
+            for wave_number, wave in enumerate(install_waves, 1):
+                packages = ", ".join(
+                    f"[{' + '.join(group)}]" if len(group) > 1 else group[0] for group in wave
+                )
+                print(f"  {wave_number}. {packages}")
+        else:
+            print("  (нет зависимостей)")
+        
+        # Сравнение с реальным менеджером
+        dependency_graph.compare_with_apk(config.package_name)
+    
+    # Генерация PlantUML диаграммы если включен режим
+    if config.plantuml:
+        from src.utils.visualizer import PlantUMLVisualizer
+        print(f"\n🎨 Генерация PlantUML диаграммы для '{config.package_name}'...")
+        visualizer = PlantUMLVisualizer(dependency_graph)
+        
+        # Генерируем упрощенную версию для лучшей читаемости
+        plantuml_code = visualizer.generate_simple_plantuml(config.package_name)
+        
+        # Выводим информацию о PlantUML коде
+        visualizer.display_plantuml_info()
+        
+        # Сохраняем в файл
+        filename = f"{config.package_name}_dependencies.puml"
+        visualizer.save_plantuml_to_file(filename)
+        
+        # Сравнение с штатными инструментами
+        visualizer.compare_with_apk_tools(config.package_name)
+    
+    # Выводим статистику
+    print(f"\n📊 Статистика графа:")
+    print(f"  Всего узлов: {len(dependency_graph.graph)}")
+    print(f"  Прямые зависимости: {len(dependency_graph.graph.get(config.package_name, []))}")
+    print(f"  Всего транзитивных зависимостей: {len(all_deps)}")
 
 if __name__ == "__main__":
     main()
@@ -1,66 +1,264 @@
-import urllib.request
-import urllib.error
-import gzip
 import io
 from .errors import RepositoryError, PackageNotFoundError
+from .profiler import profiler
+from .mirrors import MirrorPool
+from .package_record import PackageRecord, RecordTable
 
 class APKParser:
+    # Поля записи APKINDEX, которые сохраняются при разборе
+    # (p - предоставляемые виртуальные имена, k - приоритет провайдера)
+    RECORD_FIELDS = frozenset(('P', 'D', 'o', 'p', 'k'))
+    
+    # Размер блока при чтении архива
+    CHUNK_SIZE = 64 * 1024
+    
     @staticmethod
-    def parse_apkindex_content(content):
-        """Парсинг содержимого APKINDEX"""
-        packages = {}
-        current_pkg = {}
+    def iter_apkindex_records(lines):
+        """Потоковый разбор строк APKINDEX: записи пакетов (PackageRecord) выдаются по одной"""
+        record_fields = APKParser.RECORD_FIELDS
+        fields = {}
+        table = RecordTable()
         
-        for line in content.split('\n'):
+        for line in lines:
             line = line.strip()
             
             if not line:
-                # Сохраняем предыдущий пакет
-                if current_pkg and 'P' in current_pkg:
-                    packages[current_pkg['P']] = current_pkg.copy()
-                current_pkg = {}
+                # Запись пакета закончилась
+                if 'P' in fields:
+                    yield PackageRecord.from_fields(fields, table)
+                fields.clear()
                 continue
             
-            if ':' in line:
+            # Ключи полей APKINDEX однобуквенные: 'P:имя'
+            if line[1:2] == ':':
+                key = line[0]
+                if key in record_fields:
+                    fields[key] = line[2:].strip()
+            elif ':' in line:
                 key, value = line.split(':', 1)
                 key = key.strip()
-                value = value.strip()
-                
-                if key in ['P', 'D', 'o']:
-                    current_pkg[key] = value
+                if key in record_fields:
+                    fields[key] = value.strip()
         
+        # Последняя запись может не заканчиваться пустой строкой
+        if 'P' in fields:
+            yield PackageRecord.from_fields(fields, table)
+    
+    @staticmethod
+    def parse_apkindex_content(content):
+        """Парсинг содержимого APKINDEX"""
+        packages = {}
+        with profiler.span('apkindex.parse'):
+            for record in APKParser.iter_apkindex_records(io.StringIO(content)):
+                packages[record.name] = record
         return packages
     
     @staticmethod
-    def download_apkindex(repository_url):
-        """Скачивание APKINDEX с различными вариантами URL"""
-        architectures = ['x86_64', 'aarch64', 'x86', 'armv7']
-        urls_to_try = []
+    def iter_apkindex_archive(fileobj):
+        """Потоковый разбор APKINDEX прямо из потока tar.gz без загрузки архива в память"""
+        import tarfile
+        # Чтение источника (сеть или диск) и распаковка замеряются отдельно от разбора
+        fileobj = profiler.wrap_stream(fileobj, 'apkindex.read', 'apkindex.bytes_read')
+        try:
+            with tarfile.open(fileobj=fileobj, mode='r|gz') as tar:
+                for member in tar:
+                    if member.name.endswith('APKINDEX') or member.name == 'APKINDEX':
+                        index_file = profiler.wrap_stream(
+                            tar.extractfile(member), 'apkindex.decompress', 'apkindex.bytes_unpacked'
+                        )
+                        lines = (line.decode('utf-8') for line in index_file)
+                        yield from APKParser.iter_apkindex_records(lines)
+                        return
+        except (tarfile.TarError, OSError, EOFError, UnicodeDecodeError) as e:
+            raise RepositoryError(f"Ошибка распаковки архива: {e}")
+        raise RepositoryError("APKINDEX не найден в архиве")
+    
+    ARCHITECTURES = ['x86_64', 'aarch64', 'x86', 'armv7']
+    
+    @staticmethod
+    def get_candidate_urls(repository_url, arch=None):
+        """Получить возможные URL APKINDEX в виде пар (архитектура, URL)
+        
+        Если архитектура задана явно, перебор вариантов не выполняется.
+        """
+        # Локальный путь обрабатывается как URL file://
+        if '://' not in repository_url:
+            import pathlib
+            repository_url = pathlib.Path(repository_url).resolve().as_uri()
+        
+        # Ссылка прямо на архив
+        if repository_url.endswith('.tar.gz'):
+            return [(None, repository_url)]
         
-        # Генерируем возможные URL
         base_url = repository_url.rstrip('/')
-        for arch in architectures:
-            urls_to_try.append(f"{base_url}/{arch}/APKINDEX.tar.gz")
+        if arch:
+            return [(arch, f"{base_url}/{arch}/APKINDEX.tar.gz")]
         
-        urls_to_try.append(f"{base_url}/APKINDEX.tar.gz")
+        candidates = []
+        for arch in APKParser.ARCHITECTURES:
+            candidates.append((arch, f"{base_url}/{arch}/APKINDEX.tar.gz"))
         
-        for url in urls_to_try:
-            try:
-                print(f"Попытка: {url}")
-                response = urllib.request.urlopen(url, timeout=10)
-                return APKParser.extract_apkindex_from_tar_gz(response.read())
-            except Exception as e:
-                continue
+        candidates.append((None, f"{base_url}/APKINDEX.tar.gz"))
+        return candidates
+        
+    @staticmethod
+    def open_apkindex_archive(repository_url, url=None, etag=None, last_modified=None,
+                              arch=None, preferred_arch=None, mirrors=None):
+        """Открытие архива APKINDEX с условной ревалидацией (ETag/If-Modified-Since)
+        
+        Возвращает словарь с ключами url, arch, mirror, response, etag,
+        last_modified и not_modified (True, если сервер ответил 304 и response
+        равно None). url - адрес на основном зеркале, mirror - фактический.
+        Поток response читается вызывающим кодом и должен быть закрыт им же.
+        
+        arch - явно заданная архитектура (без перебора), preferred_arch -
+        архитектура, сработавшая в прошлый раз: она проверяется первой,
+        остальные варианты опрашиваются только при ее недоступности.
+        mirrors - MirrorPool зеркал репозитория (по умолчанию только repository_url).
+        """
+        if mirrors is None:
+            mirrors = MirrorPool([repository_url])
+        if url:
+            candidates = [(candidate_arch, candidate_url)
+                          for candidate_arch, candidate_url in APKParser.get_candidate_urls(repository_url)
+                          if candidate_url == url] or [(arch, url)]
+        else:
+            candidates = APKParser.get_candidate_urls(repository_url, arch)
+        
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        
+        with profiler.span('network.open'):
+            if preferred_arch and len(candidates) > 1:
+                preferred = [candidate for candidate in candidates if candidate[0] == preferred_arch]
+                if preferred:
+                    result = APKParser._probe_candidates(preferred, headers, mirrors)
+                    if result is not None:
+                        return result
+                    candidates = [candidate for candidate in candidates if candidate[0] != preferred_arch]
+        
+            result = APKParser._probe_candidates(candidates, headers, mirrors)
+            if result is not None:
+                return result
         
         raise RepositoryError("Не удалось скачать APKINDEX ни по одному из URL")
     
+    @staticmethod
+    def _probe_candidate(arch, url, headers, mirrors, retry_timeouts=True):
+        """Открыть один вариант URL на зеркалах; при неудаче возвращается None"""
+        try:
+            result = mirrors.open(url, headers, retry_timeouts=retry_timeouts)
+        except Exception:
+            return None
+        if result is not None:
+            result['url'] = url
+            result['arch'] = arch
+        return result
+    
+    @staticmethod
+    def _probe_candidates(candidates, headers, mirrors):
+        """Параллельный опрос вариантов URL
+        
+        Все варианты запрашиваются одновременно. Побеждает первый успешный
+        ответ в порядке приоритета: как только он получен и все более
+        приоритетные варианты завершились неудачей, остальные запросы
+        отменяются (их ответы закрываются по мере поступления).
+        """
+        if len(candidates) == 1:
+            return APKParser._probe_candidate(candidates[0][0], candidates[0][1], headers, mirrors)
+        
+        import queue
+        import threading
+        
+        results_queue = queue.Queue()
+        finished = threading.Event()
+        lock = threading.Lock()
+        
+        def probe(position, arch, url):
+            # Таймаут при переборе не повторяется: иначе зависшее зеркало стоило бы
+            # (1 + retries) таймаутов на каждый вариант. Ошибки соединения и 5xx повторяются
+            result = APKParser._probe_candidate(arch, url, headers, mirrors, retry_timeouts=False)
+            with lock:
+                if not finished.is_set():
+                    results_queue.put((position, result))
+                    return
+            # Победитель уже выбран - ответ больше не нужен
+            if result is not None and result['response'] is not None:
+                result['response'].close()
+        
+        for position, (arch, url) in enumerate(candidates):
+            thread = threading.Thread(target=probe, args=(position, arch, url), daemon=True)
+            thread.start()
+        
+        results = {}
+        next_position = 0
+        winner = None
+        while winner is None and next_position < len(candidates):
+            position, result = results_queue.get()
+            results[position] = result
+            
+            # Продвигаемся по приоритетам, пока ответы уже известны
+            while next_position in results:
+                if results[next_position] is not None:
+                    winner = results[next_position]
+                    break
+                next_position += 1
+        
+        # Закрываем ответы, пришедшие раньше, но проигравшие по приоритету
+        with lock:
+            finished.set()
+            while not results_queue.empty():
+                position, result = results_queue.get_nowait()
+                results[position] = result
+        for result in results.values():
+            if result is not None and result is not winner and result['response'] is not None:
+                result['response'].close()
+        
+        return winner
+    
+    @staticmethod
+    def fetch_apkindex_archive(repository_url, url=None, etag=None, last_modified=None, arch=None, mirrors=None):
+        """Скачивание архива APKINDEX целиком (data равно None при ответе 304)"""
+        result = APKParser.open_apkindex_archive(repository_url, url, etag, last_modified, arch=arch, mirrors=mirrors)
+        response = result.pop('response')
+        result['data'] = None
+        if response is not None:
+            with response, profiler.span('apkindex.read'):
+                result['data'] = response.read()
+            profiler.count('apkindex.bytes_read', len(result['data']))
+        return result
+    
+    @staticmethod
+    def iter_apkindex(repository_url, arch=None, preferred_arch=None, on_open=None, mirrors=None):
+        """Потоковый разбор APKINDEX репозитория (сеть, file:// или локальный путь)
+        
+        on_open вызывается с результатом open_apkindex_archive до чтения записей.
+        """
+        result = APKParser.open_apkindex_archive(
+            repository_url, arch=arch, preferred_arch=preferred_arch, mirrors=mirrors
+        )
+        if on_open:
+            on_open(result)
+        with result['response'] as response:
+            yield from APKParser.iter_apkindex_archive(response)
+    
+    @staticmethod
+    def download_apkindex(repository_url):
+        """Скачивание APKINDEX с различными вариантами URL (зеркала - через 'URL1|URL2')"""
+        urls = MirrorPool.parse(repository_url)
+        result = APKParser.fetch_apkindex_archive(urls[0], mirrors=MirrorPool(urls))
+        return APKParser.extract_apkindex_from_tar_gz(result['data'])
+    
     @staticmethod
     def extract_apkindex_from_tar_gz(data):
         """Извлечение APKINDEX из tar.gz архива"""
         try:
             import tarfile
             tar_data = io.BytesIO(data)
-            with tarfile.open(fileobj=tar_data, mode='r:gz') as tar:
+            with profiler.span('apkindex.decompress'), tarfile.open(fileobj=tar_data, mode='r:gz') as tar:
                 for member in tar.getmembers():
                     if member.name.endswith('APKINDEX') or member.name == 'APKINDEX':
                         index_file = tar.extractfile(member)
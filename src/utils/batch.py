@@ -0,0 +1,104 @@
+import json
+import sys
+from .errors import ConfigurationError
+from .dependency_graph import DependencyGraph
+
+class BatchAnalyzer:
+    """Анализ списка пакетов по одному общему графу с выводом JSON Lines
+    
+    Граф строится один раз по объединению замыканий всех пакетов, после
+    чего для каждого пакета выводится отдельная запись: замыкание, глубина,
+    циклы, порядок установки и статистика. Пакеты, чье замыкание в общем
+    графе шире ограничения max_depth, анализируются по собственному графу.
+    """
+    
+    def __init__(self, dependency_graph):
+        self.dependency_graph = dependency_graph
+    
+    @staticmethod
+    def read_package_names(path):
+        """Имена пакетов из файла или stdin ('-'): по одному в строке, '#' - комментарий"""
+        try:
+            if path == '-':
+                lines = sys.stdin.read().splitlines()
+            else:
+                with open(path, 'r', encoding='utf-8') as f:
+                    lines = f.read().splitlines()
+        except OSError as e:
+            raise ConfigurationError(f"Не удалось прочитать список пакетов '{path}': {e}")
+        
+        packages = []
+        seen = set()
+        for line in lines:
+            name = line.split('#', 1)[0].strip()
+            # Повторы в списке анализируются один раз
+            if name and name not in seen:
+                seen.add(name)
+                packages.append(name)
+        return packages
+    
+    def run(self, packages, stream):
+        """Построить общий граф и записать по одной JSON-строке на пакет
+        
+        Возвращает список найденных в общем графе циклов.
+        """
+        graph = self.dependency_graph
+        cycles = graph.build_graph_for(packages)
+        records = {}
+        separate = []
+        for package in packages:
+            if graph.within_depth_limit(package):
+                records[package] = self.analyze(package)
+            else:
+                separate.append(package)
+        
+        # Глубина от другого корня расширила замыкание - строим граф пакета
+        # отдельно, общий граф остается нетронутым
+        if separate:
+            own_graph = DependencyGraph(
+                graph.repository_manager, graph.max_depth, names=graph.names,
+                closure_memory_limit=graph.closure_memory_limit
+            )
+            for package in separate:
+                own_graph.build_graph(package)
+                records[package] = self.analyze(package, own_graph)
+        
+        for package in packages:
+            stream.write(json.dumps(records[package], ensure_ascii=False))
+            stream.write("\n")
+        stream.flush()
+        return cycles
+    
+    def analyze(self, package, graph=None):
+        """Запись анализа одного пакета по уже построенному графу"""
+        if graph is None:
+            graph = self.dependency_graph
+        error = graph.errors.get(package)
+        if error is not None or package not in graph.graph:
+            return {'package': package, 'found': False, 'error': error or "Пакет не найден в графе"}
+        
+        waves = graph.get_install_waves(package)
+        install_order = [name for wave in waves for group in wave for name in group]
+        cycles = [
+            group for wave in waves for group in wave
+            if len(group) > 1 or group[0] in graph.graph.get(group[0], ())
+        ]
+        dependencies = sorted(install_order[:-1])
+        direct = graph.graph[package]
+        
+        return {
+            'package': package,
+            'found': True,
+            'dependencies': dependencies,
+            'direct_dependencies': direct,
+            'depth': len(waves) - 1,
+            'cycles': cycles,
+            'install_order': install_order,
+            'install_waves': [[name for group in wave for name in group] for wave in waves],
+            'stats': {
+                'direct': len(direct),
+                'transitive': len(dependencies),
+                'waves': len(waves),
+                'cycles': len(cycles),
+            },
+        }
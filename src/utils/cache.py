@@ -0,0 +1,188 @@
+import json
+import os
+import time
+from .errors import RepositoryError
+from .package_record import PackageRecord, RecordTable
+from .profiler import profiler
+
+# Версия формата сохраненного индекса (увеличивается при изменении парсера)
+INDEX_FORMAT_VERSION = 3
+
+class IndexCache:
+    """Локальный кэш APKINDEX на диске, ключ - URL репозитория и архитектура"""
+    
+    ARCHIVE_FILE = 'APKINDEX.tar.gz'
+    INDEX_FILE = 'index.json'
+    META_FILE = 'meta.json'
+    ARCHITECTURES_FILE = 'architectures.json'
+    
+    def __init__(self, cache_dir, ttl=3600):
+        import threading
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        # Индексы загружаются параллельно, а файл архитектур общий для всех
+        self._architectures_lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(repository_url, arch):
+        """Сформировать ключ записи кэша"""
+        import hashlib
+        raw_key = f"{repository_url.rstrip('/')}|{arch or ''}"
+        return hashlib.sha256(raw_key.encode('utf-8')).hexdigest()[:24]
+    
+    def _entry_dir(self, repository_url, arch):
+        """Каталог записи кэша"""
+        return os.path.join(self.cache_dir, self.make_key(repository_url, arch))
+    
+    def find_entry(self, repository_url, architectures):
+        """Найти запись кэша для репозитория (архитектуры перебираются по порядку)"""
+        for arch in architectures:
+            meta = self.load_meta(repository_url, arch)
+            if meta is not None:
+                return meta
+        return None
+    
+    def load_meta(self, repository_url, arch):
+        """Прочитать метаданные записи кэша"""
+        meta_path = os.path.join(self._entry_dir(repository_url, arch), self.META_FILE)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            return None
+        
+        if meta.get('format_version') != INDEX_FORMAT_VERSION:
+            return None
+        return meta
+    
+    def recall_arch(self, repository_url):
+        """Архитектура, сработавшая для репозитория в прошлый раз"""
+        return self._load_architectures().get(repository_url.rstrip('/'))
+    
+    def remember_arch(self, repository_url, arch):
+        """Запомнить сработавшую архитектуру репозитория для следующих запусков"""
+        with self._architectures_lock:
+            architectures = self._load_architectures()
+            if architectures.get(repository_url.rstrip('/')) == arch:
+                return
+            architectures[repository_url.rstrip('/')] = arch
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._write_atomic(os.path.join(self.cache_dir, self.ARCHITECTURES_FILE),
+                               json.dumps(architectures, ensure_ascii=False, indent=2).encode('utf-8'))
+    
+    def _load_architectures(self):
+        """Прочитать файл с запомненными архитектурами"""
+        try:
+            with open(os.path.join(self.cache_dir, self.ARCHITECTURES_FILE), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+    
+    def is_fresh(self, meta):
+        """Проверить, не истек ли срок жизни записи"""
+        return time.time() - meta.get('fetched_at', 0) < self.ttl
+    
+    def load_index(self, meta):
+        """Загрузить уже разобранный индекс из кэша (имя пакета -> PackageRecord)"""
+        index_path = os.path.join(self._entry_dir(meta['repository_url'], meta['arch']), self.INDEX_FILE)
+        try:
+            with profiler.span('cache.load'), open(index_path, 'r', encoding='utf-8') as file:
+                table = RecordTable()
+                records = (PackageRecord.from_list(data, table) for data in json.load(file))
+                return {record.name: record for record in records}
+        except (OSError, ValueError, TypeError) as e:
+            raise RepositoryError(f"Поврежден кэш APKINDEX '{index_path}': {e}")
+    
+    def open_archive_file(self, repository_url, arch):
+        """Открыть временный файл для архива, который записывается по мере загрузки"""
+        entry_dir = self._entry_dir(repository_url, arch)
+        os.makedirs(entry_dir, exist_ok=True)
+        return open(self._temp_path(os.path.join(entry_dir, self.ARCHIVE_FILE)), 'xb')
+        
+    def store(self, repository_url, arch, url, archive_file, packages, etag=None, last_modified=None):
+        """Сохранить записанный архив, разобранный индекс и метаданные"""
+        entry_dir = self._entry_dir(repository_url, arch)
+        
+        with profiler.span('cache.store'):
+            archive_file.close()
+            os.replace(archive_file.name, os.path.join(entry_dir, self.ARCHIVE_FILE))
+            records = [record.to_list() for record in packages.values()]
+            self._write_atomic(os.path.join(entry_dir, self.INDEX_FILE),
+                               json.dumps(records, ensure_ascii=False).encode('utf-8'))
+        
+        meta = {
+            'format_version': INDEX_FORMAT_VERSION,
+            'repository_url': repository_url,
+            'arch': arch,
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': time.time()
+        }
+        self._write_meta(entry_dir, meta)
+        return meta
+    
+    @staticmethod
+    def discard_archive_file(archive_file):
+        """Удалить недописанный временный архив"""
+        archive_file.close()
+        try:
+            os.remove(archive_file.name)
+        except OSError:
+            pass
+    
+    def touch(self, meta, etag=None, last_modified=None):
+        """Продлить срок жизни записи после ответа 304 Not Modified"""
+        meta = dict(meta)
+        meta['fetched_at'] = time.time()
+        if etag:
+            meta['etag'] = etag
+        if last_modified:
+            meta['last_modified'] = last_modified
+        self._write_meta(self._entry_dir(meta['repository_url'], meta['arch']), meta)
+        return meta
+    
+    def _write_meta(self, entry_dir, meta):
+        """Сохранить метаданные записи"""
+        self._write_atomic(os.path.join(entry_dir, self.META_FILE),
+                           json.dumps(meta, ensure_ascii=False, indent=2).encode('utf-8'))
+    
+    @staticmethod
+    def _temp_path(path):
+        """Имя временного файла рядом с path, уникальное для каждой записи (не только для процесса)"""
+        return f"{path}.{os.urandom(16).hex()}.tmp"
+    
+    @classmethod
+    def _write_atomic(cls, path, data):
+        """Запись через временный файл, чтобы параллельные запуски не видели неполных данных"""
+        tmp_path = cls._temp_path(path)
+        try:
+            with open(tmp_path, 'xb') as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+
+class TeeReader:
+    """Поток-обертка: прочитанные байты одновременно записываются в файл"""
+    
+    def __init__(self, source, sink):
+        self.source = source
+        self.sink = sink
+    
+    def read(self, size=-1):
+        """Прочитать данные из источника с копированием в файл"""
+        data = self.source.read(size)
+        if data:
+            self.sink.write(data)
+        return data
+    
+    def drain(self, chunk_size=64 * 1024):
+        """Дочитать остаток источника (например, конец tar-архива)"""
+        while self.read(chunk_size):
+            pass
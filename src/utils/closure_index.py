@@ -0,0 +1,201 @@
+from array import array
+from .errors import ClosureMemoryError
+from .profiler import profiler
+
+class ClosureIndex:
+    """Транзитивные замыкания всех узлов графа в виде битовых множеств
+    
+    Замыкания считаются один раз по DAG компонент сильной связности в
+    обратном топологическом порядке: замыкание компоненты - это ее узлы
+    плюс объединение замыканий ее зависимостей. Биты нумеруются в том же
+    порядке, поэтому множество компоненты занимает не больше бит, чем
+    номер ее последнего узла.
+    """
+    
+    # Лимит памяти по умолчанию для всех битовых множеств
+    DEFAULT_MEMORY_LIMIT = 512 * 1024 * 1024
+    
+    def __init__(self, dependency_graph, memory_limit=None):
+        self.dependency_graph = dependency_graph
+        self.memory_limit = memory_limit if memory_limit is not None else self.DEFAULT_MEMORY_LIMIT
+        self.condensation = dependency_graph.get_condensation()
+        
+        node_count = len(self.condensation.component_of)
+        self.bit_of = array('l', [-1]) * node_count  # ID узла -> номер бита
+        self.node_at = array('l')                     # номер бита -> ID узла
+        self.reach = []                               # компонента -> битовое множество
+        self.memory_bytes = 0
+        
+        self._compute()
+    
+    def _compute(self):
+        """Вычислить замыкания всех компонент"""
+        condensation = self.condensation
+        dag = condensation.dag
+        
+        for component_id, members in enumerate(condensation.components):
+            bits = 0
+            for node_id in members:
+                self.bit_of[node_id] = len(self.node_at)
+                bits |= 1 << len(self.node_at)
+                self.node_at.append(node_id)
+            
+            # Зависимости компоненты имеют меньшие номера и уже посчитаны
+            for dependency in dag.successors(component_id):
+                bits |= self.reach[dependency]
+            
+            self.reach.append(bits)
+            self.memory_bytes += (bits.bit_length() + 7) // 8
+            if self.memory_bytes > self.memory_limit:
+                raise ClosureMemoryError(
+                    f"Замыкания превышают лимит памяти {self.memory_limit} байт "
+                    f"(обработано компонент: {component_id + 1} из {condensation.component_count})"
+                )
+    
+    def update(self, condensation, affected, previous_condensation=None):
+        """Пересчитать замыкания только у компонент с затронутыми узлами
+        
+        affected - множество ID узлов, чьи замыкания могли измениться (узлы,
+        из которых достижимы измененные, и новые узлы). Остальные компоненты
+        сохраняют битовые множества. Если граф компонент построен заново,
+        прежние множества переносятся по узлу-представителю компоненты.
+        """
+        node_count = len(condensation.component_of)
+        if len(self.bit_of) < node_count:
+            self.bit_of.extend(array('l', [-1]) * (node_count - len(self.bit_of)))
+        
+        # Новым узлам выделяются биты в конце, номера старых не меняются
+        for node_id in sorted(affected):
+            if self.bit_of[node_id] < 0 and condensation.component_of[node_id] >= 0:
+                self.bit_of[node_id] = len(self.node_at)
+                self.node_at.append(node_id)
+        
+        self.condensation = condensation
+        if previous_condensation is None:
+            self.reach.extend([0] * (condensation.component_count - len(self.reach)))
+            components = sorted({condensation.component_of[node_id] for node_id in affected} - {-1})
+            for component_id in components:
+                self.memory_bytes -= (self.reach[component_id].bit_length() + 7) // 8
+                self.reach[component_id] = self._component_bits(component_id)
+                self.memory_bytes += (self.reach[component_id].bit_length() + 7) // 8
+        else:
+            previous_of = previous_condensation.component_of
+            previous_reach = self.reach
+            self.reach = []
+            self.memory_bytes = 0
+            for component_id, members in enumerate(condensation.components):
+                representative = members[0]
+                if representative not in affected and representative < len(previous_of) and previous_of[representative] >= 0:
+                    self.reach.append(previous_reach[previous_of[representative]])
+                else:
+                    self.reach.append(self._component_bits(component_id))
+                self.memory_bytes += (self.reach[-1].bit_length() + 7) // 8
+        
+        if self.memory_bytes > self.memory_limit:
+            raise ClosureMemoryError(f"Замыкания превышают лимит памяти {self.memory_limit} байт")
+    
+    def _component_bits(self, component_id):
+        """Замыкание компоненты по уже посчитанным замыканиям ее зависимостей"""
+        bits = 0
+        for node_id in self.condensation.components[component_id]:
+            bits |= 1 << self.bit_of[node_id]
+        for dependency in self.condensation.dag.successors(component_id):
+            bits |= self.reach[dependency]
+        return bits
+    
+    @classmethod
+    def component_sizes(cls, condensation, memory_limit=None):
+        """Размеры замыканий всех компонент (вместе с их узлами) без хранения полных множеств
+        
+        Используется, когда замыкания целиком не помещаются в лимит памяти.
+        Биты нумеруются так же, как в _compute, но за один проход по DAG
+        хранится только полоса из width бит каждого множества; размеры
+        полос суммируются. Проходов тем больше, чем меньше лимит.
+        """
+        memory_limit = memory_limit if memory_limit is not None else cls.DEFAULT_MEMORY_LIMIT
+        dag = condensation.dag
+        components = condensation.components
+        
+        # Номер бита, следующего за узлами компоненты
+        ends = []
+        total_bits = 0
+        for members in components:
+            total_bits += len(members)
+            ends.append(total_bits)
+        
+        width = max(64, memory_limit * 8 // max(1, condensation.component_count))
+        sizes = [0] * condensation.component_count
+        for low in range(0, total_bits, width):
+            high = low + width
+            reach = []
+            for component_id, end in enumerate(ends):
+                # Все биты компоненты и ее зависимостей меньше end
+                if end <= low:
+                    reach.append(0)
+                    continue
+                start = end - len(components[component_id])
+                bits = 0
+                if start < high:
+                    bits = ((1 << (min(end, high) - max(start, low))) - 1) << (max(start, low) - low)
+                for dependency in dag.successors(component_id):
+                    bits |= reach[dependency]
+                reach.append(bits)
+                sizes[component_id] += bits.bit_count()
+            profiler.count('graph.closure_bands')
+        return sizes
+    
+    def copy(self):
+        """Копия для независимого обновления (битовые множества неизменяемы и не копируются)"""
+        duplicate = ClosureIndex.__new__(ClosureIndex)
+        duplicate.dependency_graph = self.dependency_graph
+        duplicate.memory_limit = self.memory_limit
+        duplicate.condensation = self.condensation
+        duplicate.bit_of = self.bit_of[:]
+        duplicate.node_at = self.node_at[:]
+        duplicate.reach = list(self.reach)
+        duplicate.memory_bytes = self.memory_bytes
+        return duplicate
+    
+    def closure_bits(self, node_id):
+        """Битовое множество транзитивных зависимостей узла (без самого узла)"""
+        component_id = self.condensation.component_of[node_id]
+        if component_id < 0:
+            return 0
+        return self.reach[component_id] & ~(1 << self.bit_of[node_id])
+    
+    def closure_size(self, node_id):
+        """Размер транзитивного замыкания узла"""
+        return self.closure_bits(node_id).bit_count()
+    
+    def decode(self, bits):
+        """Перевести битовое множество в список ID узлов"""
+        node_at = self.node_at
+        result = []
+        data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+        for byte_index, byte in enumerate(data):
+            # Нулевые байты пропускаются целиком
+            if byte:
+                position = byte_index * 8
+                for offset in range(8):
+                    if byte >> offset & 1:
+                        result.append(node_at[position + offset])
+        return result
+    
+    def closure(self, node_id):
+        """Транзитивные зависимости узла в виде списка ID"""
+        return self.decode(self.closure_bits(node_id))
+    
+    def common(self, first_id, second_id):
+        """Общие транзитивные зависимости двух узлов"""
+        return self.decode(self.closure_bits(first_id) & self.closure_bits(second_id))
+    
+    def difference(self, first_id, second_id):
+        """Зависимости первого узла, которых нет у второго"""
+        return self.decode(self.closure_bits(first_id) & ~self.closure_bits(second_id))
+    
+    def depends_on(self, node_id, dependency_id):
+        """Проверить, входит ли dependency_id в замыкание node_id (O(1) по биту)"""
+        position = self.bit_of[dependency_id]
+        if position < 0:
+            return False
+        return bool(self.closure_bits(node_id) >> position & 1)
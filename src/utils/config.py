@@ -6,13 +6,38 @@ class Config:
     def __init__(self):
         self.package_name = None
         self.repository_url = None
+        self.repository_urls = []
         self.test_mode = False
         self.test_repo_path = None
         self.ascii_tree = False
         self.install_order = False
         self.plantuml = False
         self.max_depth = None
-        
+        self.cache_dir = None
+        self.cache_ttl = 3600
+        self.offline = False
+        self.arch = None
+        self.retries = 3
+        self.timeout = 10
+        self.who_depends = []
+        self.reverse_depth = None
+        self.all_packages = False
+        self.paths_to = None
+        self.tree_depth = None
+        self.export_path = None
+        self.batch_path = None
+        self.serve = False
+        self.listen = '127.0.0.1:8080'
+        self.socket_path = None
+        self.refresh_interval = 300
+        self.export_format = None
+        self.tree_width = None
+        self.path_limit = 10
+        self.diff_from = []
+        self.profile_path = None
+        self.output_format = 'text'
+        self.closure_memory_limit = 512 * 1024 * 1024
+    
     def parse_arguments(self):
         """Парсинг аргументов командной строки"""
         parser = argparse.ArgumentParser(
@@ -20,9 +45,10 @@ class Config:
             formatter_class=argparse.RawDescriptionHelpFormatter
         )
         
-        # Обязательные параметры
+        # Обязательные параметры (в режиме --all имя пакета необязательно)
         parser.add_argument(
             'package',
+            nargs='?',
             help='Имя анализируемого пакета'
         )
         
@@ -30,7 +56,10 @@ class Config:
         parser.add_argument(
             '--repository',
             '-r',
-            help='URL репозитория или путь к файлу тестового репозитория'
+            action='append',
+            help="URL репозитория или путь к файлу тестового репозитория; "
+                 "можно указать несколько раз (порядок задает приоритет). "
+                 "Зеркала одного репозитория перечисляются через '|': 'URL1|URL2'"
         )
         
         parser.add_argument(
@@ -47,6 +76,18 @@ class Config:
             help='Вывод зависимостей в формате ASCII-дерева'
         )
         
+        parser.add_argument(
+            '--tree-depth',
+            type=int,
+            help='Ограничение глубины вывода ASCII-дерева (по умолчанию без ограничения)'
+        )
+        
+        parser.add_argument(
+            '--tree-width',
+            type=int,
+            help='Сколько зависимостей узла выводить в ASCII-дереве (остальные сворачиваются)'
+        )
+        
         parser.add_argument(
             '--install-order',
             '-i',
@@ -61,6 +102,18 @@ class Config:
             help='Сгенерировать PlantUML диаграмму зависимостей'
         )
         
+        parser.add_argument(
+            '--export',
+            metavar='FILE',
+            help="Выгрузить граф в файл ('-' - стандартный вывод) без сборки документа в памяти"
+        )
+        
+        parser.add_argument(
+            '--export-format',
+            choices=['plantuml', 'dot', 'graphml', 'json'],
+            help='Формат выгрузки (по умолчанию определяется по расширению файла, иначе plantuml)'
+        )
+        
         parser.add_argument(
             '--max-depth',
             '-d',
@@ -69,24 +122,225 @@ class Config:
             help='Максимальная глубина анализа зависимостей (по умолчанию: 10)'
         )
         
+        parser.add_argument(
+            '--cache-dir',
+            help='Каталог локального кэша APKINDEX (по умолчанию кэш отключен)'
+        )
+        
+        parser.add_argument(
+            '--cache-ttl',
+            type=int,
+            default=3600,
+            help='Время жизни записи кэша в секундах до ревалидации (по умолчанию: 3600)'
+        )
+        
+        parser.add_argument(
+            '--offline',
+            action='store_true',
+            help='Использовать только кэш APKINDEX, без обращения к сети'
+        )
+        
+        parser.add_argument(
+            '--arch',
+            help='Архитектура репозитория (например, x86_64); отключает автоматический перебор'
+        )
+        
+        parser.add_argument(
+            '--retries',
+            type=int,
+            default=3,
+            help='Повторов запроса к зеркалам и докачки с нарастающей паузой (по умолчанию: 3)'
+        )
+        
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=10,
+            help='Таймаут подключения и ожидания данных от зеркала в секундах (по умолчанию: 10)'
+        )
+        
+        parser.add_argument(
+            '--who-depends',
+            '-w',
+            action='append',
+            metavar='PACKAGE',
+            help='Вывести пакеты графа, транзитивно зависящие от PACKAGE; можно указать несколько раз'
+        )
+        
+        parser.add_argument(
+            '--reverse-depth',
+            type=int,
+            help='Ограничение глубины для --who-depends (по умолчанию без ограничения)'
+        )
+        
+        parser.add_argument(
+            '--paths-to',
+            metavar='PACKAGE',
+            help='Вывести количество путей зависимостей до PACKAGE и кратчайшие из них'
+        )
+        
+        parser.add_argument(
+            '--path-limit',
+            type=int,
+            default=10,
+            help='Сколько кратчайших путей выводить для --paths-to (по умолчанию: 10)'
+        )
+        
+        parser.add_argument(
+            '--batch',
+            metavar='FILE',
+            help="Пакетный режим: имена пакетов из файла ('-' - stdin), "
+                 "по одной записи JSON Lines на пакет в stdout"
+        )
+        
+        parser.add_argument(
+            '--serve',
+            action='store_true',
+            help='Режим сервера: граф всего репозитория в памяти и ответы на запросы по HTTP'
+        )
+        
+        parser.add_argument(
+            '--listen',
+            default='127.0.0.1:8080',
+            metavar='HOST:PORT',
+            help='Адрес сервера (по умолчанию: 127.0.0.1:8080)'
+        )
+        
+        parser.add_argument(
+            '--socket',
+            metavar='PATH',
+            help='Слушать Unix-сокет вместо TCP-порта'
+        )
+        
+        parser.add_argument(
+            '--refresh-interval',
+            type=int,
+            default=300,
+            help='Интервал фонового обновления индекса в секундах, 0 - только по POST /refresh (по умолчанию: 300)'
+        )
+        
+        parser.add_argument(
+            '--diff-from',
+            action='append',
+            metavar='REPOSITORY',
+            help='Сравнить замыкания всех пакетов с предыдущей версией репозитория '
+                 '(URL или путь к тестовому файлу); можно указать несколько раз'
+        )
+        
+        parser.add_argument(
+            '--format',
+            choices=['text', 'json', 'tsv'],
+            default='text',
+            help='Формат вывода: text - отчет для человека, json/tsv - только результаты '
+                 'одной записью в stdout (по умолчанию: text)'
+        )
+        
+        parser.add_argument(
+            '--profile',
+            nargs='?',
+            const='-',
+            metavar='FILE',
+            help="Вывести в JSON время фаз, счетчики и пиковую память (в stderr или в FILE)"
+        )
+        
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Построить граф всех пакетов репозитория (без ограничения глубины)'
+        )
+        
+        parser.add_argument(
+            '--closure-memory-limit',
+            type=int,
+            default=512,
+            metavar='MB',
+            help='Лимит памяти для битовых множеств транзитивных замыканий в МБ (по умолчанию: 512)'
+        )
+        
         return parser.parse_args()
     
     def validate_config(self):
         """Валидация конфигурации"""
         errors = []
         
-        if not self.package_name:
-            errors.append("Не указано имя пакета")
-            
+        if (not self.package_name and not self.all_packages and not self.batch_path and
+                not self.serve and not self.diff_from):
+            errors.append("Не указано имя пакета (или режим --all, --batch, --serve, --diff-from)")
+        
+        if self.serve and (self.package_name or self.batch_path):
+            errors.append("Режим сервера несовместим с именем пакета и пакетным режимом")
+        
+        if self.serve and not self.socket_path:
+            host, _, port = self.listen.rpartition(':')
+            if not host or not port.isdigit():
+                errors.append(f"Некорректный адрес сервера '{self.listen}' (ожидается HOST:PORT)")
+        
+        if self.output_format != 'text' and self.serve:
+            errors.append("Режим сервера отвечает в JSON и не поддерживает --format")
+        
+        if self.output_format == 'tsv' and self.batch_path:
+            errors.append("Пакетный режим выводит JSON Lines и не поддерживает --format tsv")
+        
+        if self.output_format != 'text' and self.export_path == '-':
+            errors.append("При --format json/tsv граф нельзя выгружать в стандартный вывод")
+        
+        if self.refresh_interval < 0:
+            errors.append("Интервал обновления не может быть отрицательным")
+        
+        if self.diff_from and (self.serve or self.batch_path or self.all_packages):
+            errors.append("Сравнение версий несовместимо с режимами --serve, --batch и --all")
+        
+        if self.test_mode and len(self.diff_from) > 1:
+            errors.append("В тестовом режиме для сравнения указывается только один тестовый репозиторий")
+        
+        if self.batch_path and (self.package_name or self.all_packages):
+            errors.append("Пакетный режим несовместим с именем пакета и режимом --all")
+        
+        if self.test_mode and len(self.repository_urls) > 1:
+            errors.append("В тестовом режиме указывается только один тестовый репозиторий")
+        
         if self.test_mode and not self.test_repo_path:
             errors.append("В тестовом режиме должен быть указан путь к тестовому репозиторию")
-            
+        
         if not self.test_mode and not self.repository_url:
             errors.append("Должен быть указан URL репозитория")
-            
+        
         if self.max_depth <= 0:
             errors.append("Максимальная глубина должна быть положительным числом")
-            
+        
+        if self.cache_ttl < 0:
+            errors.append("Время жизни кэша не может быть отрицательным")
+        
+        if self.retries < 0:
+            errors.append("Количество повторов не может быть отрицательным")
+        
+        if self.timeout <= 0:
+            errors.append("Таймаут должен быть положительным числом")
+        
+        if self.closure_memory_limit <= 0:
+            errors.append("Лимит памяти замыканий должен быть положительным числом")
+        
+        if self.test_mode and '|' in (self.test_repo_path or ''):
+            errors.append("В тестовом режиме зеркала не поддерживаются")
+        
+        if self.offline and not self.test_mode and not self.cache_dir:
+            errors.append("Офлайн-режим требует указания каталога кэша (--cache-dir)")
+        
+        if self.reverse_depth is not None and self.reverse_depth <= 0:
+            errors.append("Глубина обратных зависимостей должна быть положительным числом")
+        
+        if self.tree_depth is not None and self.tree_depth <= 0:
+            errors.append("Глубина вывода дерева должна быть положительным числом")
+        
+        if self.tree_width is not None and self.tree_width <= 0:
+            errors.append("Ширина вывода дерева должна быть положительным числом")
+        
+        if self.path_limit <= 0:
+            errors.append("Количество выводимых путей должно быть положительным числом")
+        
+        if self.paths_to and not self.package_name:
+            errors.append("Для --paths-to необходимо указать имя пакета")
+        
         if errors:
             raise ConfigurationError("\n".join(errors))
     
@@ -96,12 +350,37 @@ class Config:
             args = self.parse_arguments()
             
             self.package_name = args.package
-            self.repository_url = args.repository
+            self.repository_urls = args.repository or []
+            self.repository_url = self.repository_urls[0] if self.repository_urls else None
             self.test_mode = args.test_mode
             self.ascii_tree = args.ascii_tree
             self.install_order = args.install_order
             self.plantuml = args.plantuml
             self.max_depth = args.max_depth
+            self.cache_dir = args.cache_dir
+            self.cache_ttl = args.cache_ttl
+            self.offline = args.offline
+            self.arch = args.arch
+            self.retries = args.retries
+            self.timeout = args.timeout
+            self.who_depends = args.who_depends or []
+            self.reverse_depth = args.reverse_depth
+            self.all_packages = args.all
+            self.paths_to = args.paths_to
+            self.tree_depth = args.tree_depth
+            self.export_path = args.export
+            self.export_format = args.export_format
+            self.batch_path = args.batch
+            self.serve = args.serve
+            self.listen = args.listen
+            self.socket_path = args.socket
+            self.refresh_interval = args.refresh_interval
+            self.tree_width = args.tree_width
+            self.path_limit = args.path_limit
+            self.diff_from = args.diff_from or []
+            self.profile_path = args.profile
+            self.output_format = args.format
+            self.closure_memory_limit = args.closure_memory_limit * 1024 * 1024
             
             # Если включен тестовый режим, repository_url становится путем к файлу
             if self.test_mode and self.repository_url:
@@ -109,7 +388,7 @@ class Config:
                 self.repository_url = None
             
             self.validate_config()
-            
+        
         except argparse.ArgumentError as e:
             raise ConfigurationError(f"Ошибка в аргументах командной строки: {e}")
         except Exception as e:
@@ -119,10 +398,25 @@ class Config:
         """Вывод конфигурации в формате ключ-значение"""
         print("Текущая конфигурация:")
         print(f"  Имя пакета: {self.package_name}")
-        print(f"  URL репозитория: {self.repository_url}")
+        print(f"  URL репозитория: {', '.join(self.repository_urls) if not self.test_mode else None}")
         print(f"  Режим тестирования: {self.test_mode}")
         print(f"  Путь к тестовому репозиторию: {self.test_repo_path}")
         print(f"  Вывод ASCII-дерева: {self.ascii_tree}")
         print(f"  Вывод порядка установки: {self.install_order}")
         print(f"  Генерация PlantUML: {self.plantuml}")
+        print(f"  Выгрузка графа: {self.export_path or None}{f' ({self.export_format})' if self.export_format else ''}")
         print(f"  Максимальная глубина: {self.max_depth}")
+        print(f"  Каталог кэша: {self.cache_dir}")
+        print(f"  Время жизни кэша: {self.cache_ttl}")
+        print(f"  Офлайн-режим: {self.offline}")
+        print(f"  Архитектура: {self.arch or 'автоопределение'}")
+        print(f"  Повторов / таймаут: {self.retries} / {self.timeout} с")
+        print(f"  Обратные зависимости для: {', '.join(self.who_depends) or None}")
+        print(f"  Пути до пакета: {self.paths_to}")
+        print(f"  Граф всего репозитория: {self.all_packages}")
+        print(f"  Пакетный режим: {self.batch_path or None}")
+        print(f"  Режим сервера: {f'{self.socket_path or self.listen}' if self.serve else False}")
+        print(f"  Сравнение с версией: {', '.join(self.diff_from) or None}")
+        print(f"  Формат вывода: {self.output_format}")
+        print(f"  Лимит памяти замыканий: {self.closure_memory_limit // (1024 * 1024)} МБ")
+        print(f"  Профилирование: {('stderr' if self.profile_path == '-' else self.profile_path) if self.profile_path else False}")
@@ -1,69 +1,556 @@
+from array import array
 from collections import deque
-from .errors import DepthLimitError
+from itertools import islice
+from .errors import DepthLimitError, ClosureMemoryError
+from .closure_index import ClosureIndex
+from .tree_renderer import AsciiTreeRenderer
+from .graph_storage import NameTable, CSRAdjacency, AdjacencyView, DepthView, ExpandedSetView
+from .graph_algorithms import GraphAlgorithms, Condensation
+from .profiler import profiler
 
 class DependencyGraph:
-    def __init__(self, repository_manager, max_depth=10):
+    # Сколько путей get_dependency_paths возвращает по умолчанию
+    DEFAULT_PATH_LIMIT = 1000
+    
+    def __init__(self, repository_manager, max_depth=10, names=None, closure_memory_limit=None):
         self.repository_manager = repository_manager
         self.max_depth = max_depth
-        self.graph = {}
-        self.visited = set()
-        self.depth_map = {}
+        self.closure_memory_limit = closure_memory_limit
+        
+        # Имена пакетов интернируются, граф хранится на целочисленных ID
+        self.names = names if names is not None else NameTable()
+        self.adjacency = CSRAdjacency()
+        self.reverse_adjacency = CSRAdjacency()
+        self.expanded = bytearray()
+        self.present = bytearray()
+        self.expanded_count = 0
+        self.depths = array('l')
+        self._condensation = None
+        self._closure_index = None
+        
+        # Пакет -> текст ошибки получения его зависимостей при последнем построении
+        self.errors = {}
+        self._last_recomputed = 0
+        
+        # Представления по именам для внешнего кода
+        self.graph = AdjacencyView(self)
+        self.visited = ExpandedSetView(self)
+        self.depth_map = DepthView(self)
         
     def build_graph(self, root_package):
         """Построение графа зависимостей с помощью BFS"""
+        return self.build_graph_for([root_package])
+    
+    @profiler.timed('graph.build')
+    def build_graph_for(self, root_packages):
+        """Построение одного графа для нескольких корней (общий BFS)
+        
+        Каждый пакет раскрывается один раз, поэтому время растет с размером
+        объединенного графа. Глубина и ограничение max_depth считаются от
+        ближайшего корня; совпадает ли замыкание корня с графом, построенным
+        от него одного, проверяет within_depth_limit.
+        """
+        names = self.names
+        root_ids = [names.intern(package) for package in root_packages]
+        self.errors = {}
+        
         queue = deque()
-        queue.append((root_package, 0, []))  # (package, depth, path)
-        self.graph = {}
-        self.visited = set()
-        self.depth_map = {root_package: 0}
-        cycles = []
+        adjacency_lists = {}
+        expanded = bytearray(len(names))
+        depths = array('l', [-1]) * len(names)
+        for root_id in root_ids:
+            queue.append((root_id, 0))  # (package, depth)
+            depths[root_id] = 0
         
         while queue:
-            current_package, depth, path = queue.popleft()
+            current_id, depth = queue.popleft()
             
             # Проверка максимальной глубины
             if depth >= self.max_depth:
                 continue
                 
-            # Проверяем на циклические зависимости
-            if current_package in path:
-                cycle = path[path.index(current_package):] + [current_package]
-                if cycle not in cycles:
-                    cycles.append(cycle)
-                continue
-                
             # Если пакет уже посещен, пропускаем
-            if current_package in self.visited:
+            if expanded[current_id]:
                 continue
                 
-            self.visited.add(current_package)
-            current_path = path + [current_package]
+            expanded[current_id] = 1
             
             try:
                 # Получаем зависимости текущего пакета
-                dependencies = self.repository_manager.get_package_dependencies(current_package)
-                self.graph[current_package] = dependencies
+                dependencies = self.repository_manager.get_package_dependencies(names.name(current_id))
+                dependency_ids = array('l', [names.intern(dep) for dep in dependencies])
+                adjacency_lists[current_id] = dependency_ids
+                
+                # Новые имена расширяют массивы состояния
+                if len(names) > len(expanded):
+                    grow = len(names) - len(expanded)
+                    expanded.extend(bytes(grow))
+                    depths.extend(array('l', [-1]) * grow)
                 
                 # Добавляем зависимости в очередь
-                for dep in dependencies:
-                    if dep not in self.depth_map or self.depth_map[dep] > depth + 1:
-                        self.depth_map[dep] = depth + 1
-                    queue.append((dep, depth + 1, current_path))
+                for dep_id in dependency_ids:
+                    if depths[dep_id] < 0 or depths[dep_id] > depth + 1:
+                        depths[dep_id] = depth + 1
+                    if not expanded[dep_id]:
+                        queue.append((dep_id, depth + 1))
                     
             except Exception as e:
                 # Если не удалось получить зависимости, отмечаем как пустой список
-                self.graph[current_package] = []
-                print(f"Предупреждение: не удалось получить зависимости для '{current_package}': {e}")
+                adjacency_lists[current_id] = array('l')
+                self.errors[names.name(current_id)] = str(e)
+                print(f"Предупреждение: не удалось получить зависимости для '{names.name(current_id)}': {e}")
         
-        return cycles
+        profiler.count('graph.nodes_visited', len(adjacency_lists))
+        profiler.count('graph.edges_visited', sum(map(len, adjacency_lists.values())))
+        self._load_adjacency(adjacency_lists, expanded, depths)
+        
+        # Циклы находятся по компонентам сильной связности за O(V+E)
+        return [cycle + cycle[:1] for cycle in self.has_cycles()]
+    
+    def within_depth_limit(self, package):
+        """Замыкание пакета в текущем графе совпадает с построенным от него одного
+        
+        При общем BFS узел раскрывается, если он ближе max_depth хотя бы к
+        одному корню. От другого корня тот же узел может лежать на глубине
+        max_depth и дальше, и тогда его зависимости в отдельном графе этого
+        корня отсутствуют. Проверка - BFS от пакета за время его замыкания.
+        """
+        root_id = self.names.get_id(package)
+        if root_id is None:
+            return True
+        
+        distances = {root_id: 0}
+        queue = deque([root_id])
+        while queue:
+            current = queue.popleft()
+            distance = distances[current]
+            successors = self.successors(current)
+            if distance >= self.max_depth:
+                if len(successors):
+                    return False
+                continue
+            for dependency in successors:
+                if dependency not in distances:
+                    distances[dependency] = distance + 1
+                    queue.append(dependency)
+        return True
+    
+    @profiler.timed('graph.build_full')
+    def build_full_graph(self):
+        """Построение графа всех пакетов репозитория за один проход по индексу
+        
+        Время линейно по размеру индекса. Глубина узла - расстояние от
+        ближайшего пакета, от которого никто не зависит.
+        """
+        names = self.names
+        adjacency_lists = {}
+        
+        for package, dependencies in self.repository_manager.iter_package_dependencies():
+            node_id = names.intern(package)
+            adjacency_lists[node_id] = array('l', [names.intern(dep) for dep in dependencies])
+        
+        profiler.count('graph.nodes_visited', len(adjacency_lists))
+        profiler.count('graph.edges_visited', sum(map(len, adjacency_lists.values())))
+        expanded = bytearray(len(names))
+        for node_id in adjacency_lists:
+            expanded[node_id] = 1
+        self._load_adjacency(adjacency_lists, expanded, array('l'))
+        self._compute_depths_from_top()
+        
+        return [cycle + cycle[:1] for cycle in self.has_cycles()]
+    
+    def _compute_depths_from_top(self):
+        """Глубины BFS от пакетов без обратных зависимостей"""
+        depths = self.depths
+        queue = deque()
+        for node_id in self.node_ids():
+            if self.reverse_adjacency.degree(node_id) == 0:
+                depths[node_id] = 0
+                queue.append(node_id)
+        
+        while queue:
+            current = queue.popleft()
+            for dep in self.successors(current):
+                if depths[dep] < 0:
+                    depths[dep] = depths[current] + 1
+                    queue.append(dep)
+        
+        # Узлы, достижимые только внутри циклов, считаются верхним уровнем
+        for node_id in self.node_ids():
+            if depths[node_id] < 0:
+                depths[node_id] = 0
+    
+    def get_unresolved_packages(self):
+        """Имена, на которые есть ссылки, но которых нет в репозитории"""
+        return sorted(
+            self.names.name(node_id) for node_id in self.node_ids() if not self.is_expanded(node_id)
+        )
+    
+    @property
+    def edge_count(self):
+        """Количество ребер графа"""
+        return self.adjacency.edge_count
+    
+    @profiler.timed('graph.csr')
+    def _load_adjacency(self, adjacency_lists, expanded, depths):
+        """Упаковать списки смежности в CSR и обновить состояние узлов"""
+        node_count = len(self.names)
+        self.adjacency = CSRAdjacency.from_lists(
+            adjacency_lists.get(node_id) for node_id in range(node_count)
+        )
+        self.reverse_adjacency = self.adjacency.reversed(node_count)
+        
+        self.expanded = bytearray(expanded) + bytes(node_count - len(expanded))
+        self.expanded_count = sum(self.expanded)
+        self.depths = array('l', depths)
+        if len(self.depths) < node_count:
+            self.depths.extend(array('l', [-1]) * (node_count - len(self.depths)))
+        
+        # Узлы графа: раскрытые и те, на которые ведут ребра
+        self.present = bytearray(self.expanded)
+        for target in self.adjacency.targets:
+            self.present[target] = 1
+        
+        self._condensation = None
+        self._closure_index = None
+    
+    # --- Инкрементальное обновление ---
+    
+    def copy(self):
+        """Копия графа для независимого обновления (таблица имен общая)"""
+        duplicate = DependencyGraph(
+            self.repository_manager, self.max_depth, names=self.names,
+            closure_memory_limit=self.closure_memory_limit
+        )
+        duplicate.adjacency = self.adjacency.copy()
+        duplicate.reverse_adjacency = self.reverse_adjacency.copy()
+        duplicate.expanded = bytearray(self.expanded)
+        duplicate.present = bytearray(self.present)
+        duplicate.expanded_count = self.expanded_count
+        duplicate.depths = self.depths[:]
+        duplicate.errors = dict(self.errors)
+        
+        # Граф компонент при обновлении не изменяется на месте, его можно разделять
+        duplicate._condensation = self._condensation
+        if self._closure_index is not None:
+            duplicate._closure_index = self._closure_index.copy()
+            duplicate._closure_index.dependency_graph = duplicate
+        return duplicate
+    
+    @profiler.timed('graph.apply_changes')
+    def apply_changes(self, changes):
+        """Применить изменения прямых зависимостей пакетов к построенному графу
+        
+        changes - словарь имя -> новый список зависимостей (None - пакет удален
+        из репозитория). Меняются только списки соседей затронутых узлов.
+        Компоненты сильной связности обновляются на месте, если изменения не
+        создают и не разрывают циклов (иначе пересчитываются при обращении),
+        а замыкания пересчитываются только у пакетов, из которых достижимы
+        измененные. Глубины по новым ребрам только уменьшаются; после
+        удаления ребер они могут остаться меньше точных до полного построения.
+        
+        Возвращает статистику обновления.
+        """
+        names = self.names
+        changed = []
+        added_edges = []
+        removed_edges = []
+        
+        for package, dependencies in changes.items():
+            node_id = names.intern(package)
+            old_targets = list(self.successors(node_id))
+            new_targets = [] if dependencies is None else list(dict.fromkeys(map(names.intern, dependencies)))
+            was_expanded = node_id < len(self.expanded) and self.expanded[node_id]
+            if old_targets == new_targets and was_expanded == (dependencies is not None):
+                continue
+            
+            old_set = set(old_targets)
+            new_set = set(new_targets)
+            added_edges.extend((node_id, target) for target in new_targets if target not in old_set)
+            removed_edges.extend((node_id, target) for target in old_targets if target not in new_set)
+            self.adjacency.replace(node_id, new_targets)
+            changed.append((node_id, dependencies is not None))
+        
+        # Новые имена расширяют массивы состояния
+        grow = len(names) - len(self.present)
+        if grow > 0:
+            self.expanded.extend(bytes(grow))
+            self.present.extend(bytes(grow))
+            self.depths.extend(array('l', [-1]) * grow)
+        
+        for node_id, is_expanded in changed:
+            self.expanded_count += is_expanded - self.expanded[node_id]
+            self.expanded[node_id] = is_expanded
+        
+        # Обратные списки меняются только у узлов с измененными входящими ребрами
+        incoming_added = {}
+        incoming_removed = {}
+        for source, target in added_edges:
+            incoming_added.setdefault(target, []).append(source)
+        for source, target in removed_edges:
+            incoming_removed.setdefault(target, set()).add(source)
+        for target in incoming_added.keys() | incoming_removed.keys():
+            removed = incoming_removed.get(target, ())
+            predecessors = [source for source in self.predecessors(target) if source not in removed]
+            predecessors.extend(incoming_added.get(target, ()))
+            self.reverse_adjacency.replace(target, predecessors)
+        
+        newly_present = []
+        for node_id in [target for target in incoming_added] + [node_id for node_id, _ in changed]:
+            if not self.present[node_id] and (self.expanded[node_id] or self.reverse_adjacency.degree(node_id)):
+                self.present[node_id] = 1
+                newly_present.append(node_id)
+        vanished = []
+        for node_id in [target for target in incoming_removed] + [node_id for node_id, _ in changed]:
+            if self.present[node_id] and not self.expanded[node_id] and not self.reverse_adjacency.degree(node_id):
+                self.present[node_id] = 0
+                self.depths[node_id] = -1
+                vanished.append(node_id)
+        
+        self._update_depths(added_edges, newly_present)
+        self._compact_if_needed()
+        
+        condensation_mode = self._update_condensation(
+            [node_id for node_id, _ in changed], added_edges, removed_edges, newly_present, vanished
+        )
+        
+        return {
+            'changed_packages': len(changed),
+            'added_edges': len(added_edges),
+            'removed_edges': len(removed_edges),
+            'added_nodes': len(newly_present),
+            'removed_nodes': len(vanished),
+            'condensation': condensation_mode,
+            'recomputed_closures': self._last_recomputed,
+        }
+    
+    def _update_depths(self, added_edges, newly_present):
+        """Уменьшить глубины по новым ребрам (BFS только по улучшенным узлам)"""
+        depths = self.depths
+        queue = deque()
+        for node_id in newly_present:
+            if depths[node_id] < 0 and not self.reverse_adjacency.degree(node_id):
+                depths[node_id] = 0
+                queue.append(node_id)
+        for source, target in added_edges:
+            if depths[source] >= 0 and (depths[target] < 0 or depths[target] > depths[source] + 1):
+                depths[target] = depths[source] + 1
+                queue.append(target)
+        
+        while queue:
+            current = queue.popleft()
+            for dep in self.successors(current):
+                if depths[dep] < 0 or depths[dep] > depths[current] + 1:
+                    depths[dep] = depths[current] + 1
+                    queue.append(dep)
+    
+    def _compact_if_needed(self):
+        """Слить точечные изменения в CSR, когда их накопилось много"""
+        limit = max(64, len(self.present) // 8)
+        if len(self.adjacency.overrides) > limit:
+            self.adjacency = self.adjacency.compacted()
+        if len(self.reverse_adjacency.overrides) > limit:
+            self.reverse_adjacency = self.reverse_adjacency.compacted()
+    
+    def _update_condensation(self, changed, added_edges, removed_edges, newly_present, vanished):
+        """Обновить граф компонент и затронутые замыкания; возвращает режим обновления"""
+        self._last_recomputed = 0
+        previous = self._condensation
+        if previous is None:
+            return 'lazy'
+        
+        component_of = previous.component_of
+        components = previous.components
+        
+        # Новые пакеты, от которых никто не зависит, получают компоненты с
+        # наибольшими номерами - порядок "зависимости раньше" сохраняется
+        in_place = not vanished and not any(self.reverse_adjacency.degree(node_id) for node_id in newly_present)
+        if in_place and (newly_present or len(component_of) < len(self.present)):
+            component_of = component_of[:]
+            component_of.extend(array('l', [-1]) * (len(self.present) - len(component_of)))
+            components = list(components)
+            for node_id in newly_present:
+                component_of[node_id] = len(components)
+                components.append(array('l', [node_id]))
+        
+        # Ребра не должны создавать и разрывать циклы
+        in_place = in_place and (
+            all(component_of[source] != component_of[target] for source, target in removed_edges) and
+            all(component_of[target] <= component_of[source] for source, target in added_edges)
+        )
+        
+        if in_place:
+            # Состав старых компонент не меняется - пересчитываем ребра DAG у измененных
+            dag = previous.dag.copy()
+            for component_id in {component_of[node_id] for node_id in changed}:
+                neighbours = []
+                for node_id in components[component_id]:
+                    for target in self.successors(node_id):
+                        target_component = component_of[target]
+                        if target_component != component_id and target_component not in neighbours:
+                            neighbours.append(target_component)
+                dag.replace(component_id, neighbours)
+            self._condensation = Condensation(component_of, components, dag)
+            mode = 'updated'
+        else:
+            self._condensation = None
+            mode = 'rebuilt'
+        
+        if self._closure_index is not None:
+            # Замыкания меняются только у узлов, из которых достижимы измененные
+            affected = set(changed) | set(newly_present)
+            queue = deque(affected)
+            while queue:
+                for source in self.predecessors(queue.popleft()):
+                    if source not in affected:
+                        affected.add(source)
+                        queue.append(source)
+            try:
+                self._closure_index.update(
+                    self.get_condensation(), affected, None if in_place else previous
+                )
+                self._last_recomputed = len(affected)
+            except ClosureMemoryError:
+                self._closure_index = None
+        
+        return mode
+    
+    # --- Работа с ID (имена переводятся только на границе API) ---
+    
+    def node_id(self, package):
+        """ID пакета или None, если его нет в графе"""
+        node_id = self.names.get_id(package)
+        if node_id is None or node_id >= len(self.present) or not self.present[node_id]:
+            return None
+        return node_id
+    
+    def node_ids(self):
+        """ID всех узлов графа"""
+        return (node_id for node_id, flag in enumerate(self.present) if flag)
+    
+    def expanded_ids(self):
+        """ID раскрытых узлов (тех, для которых получены зависимости)"""
+        return (node_id for node_id, flag in enumerate(self.expanded) if flag)
+    
+    def is_expanded(self, node_id):
+        """Узел раскрыт (является ключом graph)"""
+        return node_id < len(self.expanded) and self.expanded[node_id] == 1
+    
+    def successors(self, node_id):
+        """Прямые зависимости узла в виде ID"""
+        return self.adjacency.successors(node_id)
+    
+    def names_of(self, node_ids):
+        """Перевести последовательность ID в список имен"""
+        names = self.names.names
+        return [names[node_id] for node_id in node_ids]
+    
+    def _expanded_id(self, package):
+        """ID пакета, если он является ключом graph, иначе None"""
+        node_id = self.names.get_id(package)
+        if node_id is None or not self.is_expanded(node_id):
+            return None
+        return node_id
+    
+    def memory_usage(self):
+        """Оценка памяти структуры графа в байтах (без таблицы имен)"""
+        return (self.adjacency.memory_bytes() + self.reverse_adjacency.memory_bytes() +
+                len(self.expanded) + len(self.present) +
+                len(self.depths) * self.depths.itemsize)
+    
+    def get_condensation(self):
+        """DAG компонент сильной связности (вычисляется один раз и переиспользуется)"""
+        if self._condensation is None:
+            with profiler.span('graph.scc'):
+                component_of, components = GraphAlgorithms.strongly_connected_components(
+                    self.adjacency, self.node_ids(), len(self.names)
+                )
+                self._condensation = GraphAlgorithms.condense(self.adjacency, component_of, components)
+        return self._condensation
+    
+    def get_closure_index(self):
+        """Битовые замыкания всех узлов (вычисляются один раз за O(V+E) операций над множествами)"""
+        if self._closure_index is None:
+            condensation = self.get_condensation()
+            with profiler.span('graph.closures'):
+                self._closure_index = ClosureIndex(self, self.closure_memory_limit)
+            profiler.count('graph.closure_components', condensation.component_count)
+        return self._closure_index
+    
+    def get_closure_sizes(self):
+        """Размеры транзитивных замыканий всех раскрытых пакетов"""
+        names = self.names.names
+        try:
+            closure_index = self.get_closure_index()
+        except ClosureMemoryError:
+            # Замыкания не помещаются в лимит - считаем размеры полосами бит
+            condensation = self.get_condensation()
+            with profiler.span('graph.closure_sizes'):
+                sizes = ClosureIndex.component_sizes(condensation, self.closure_memory_limit)
+            component_of = condensation.component_of
+            return {
+                names[node_id]: sizes[component_of[node_id]] - 1 if component_of[node_id] >= 0 else 0
+                for node_id in self.expanded_ids()
+            }
+        
+        return {names[node_id]: closure_index.closure_size(node_id) for node_id in self.expanded_ids()}
+    
+    def get_strongly_connected_components(self):
+        """Все компоненты сильной связности (списки имен)"""
+        condensation = self.get_condensation()
+        return [sorted(self.names_of(members)) for members in condensation.components]
+    
+    def get_cyclic_components(self):
+        """Компоненты, содержащие циклы (списки имен)"""
+        condensation = self.get_condensation()
+        return [
+            sorted(self.names_of(members))
+            for component_id, members in enumerate(condensation.components)
+            if condensation.is_cyclic(component_id, self.adjacency)
+        ]
+    
+    def predecessors(self, node_id):
+        """Прямые обратные зависимости узла в виде ID"""
+        return self.reverse_adjacency.successors(node_id)
     
     def get_ancestors(self, package):
         """Получить всех предков пакета (обратные зависимости)"""
-        ancestors = set()
-        for pkg, deps in self.graph.items():
-            if package in deps:
-                ancestors.add(pkg)
-        return ancestors
+        target_id = self.names.get_id(package)
+        if target_id is None:
+            return set()
+        return set(self.names_of(self.predecessors(target_id)))
+    
+    @profiler.timed('graph.reverse_closure')
+    def get_reverse_closure(self, packages, max_depth=None):
+        """Транзитивные обратные зависимости (что придется пересобрать)
+        
+        Принимает один пакет или список пакетов; возвращает словарь
+        имя -> расстояние до ближайшего из исходных пакетов. Время работы
+        пропорционально размеру ответа. Исходные пакеты в ответ не входят.
+        """
+        if isinstance(packages, str):
+            packages = [packages]
+        
+        sources = [node_id for node_id in map(self.names.get_id, packages) if node_id is not None]
+        distances = {node_id: 0 for node_id in sources}
+        queue = deque(sources)
+        
+        while queue:
+            current = queue.popleft()
+            distance = distances[current]
+            if max_depth is not None and distance >= max_depth:
+                continue
+            for dependent in self.predecessors(current):
+                if dependent not in distances:
+                    distances[dependent] = distance + 1
+                    queue.append(dependent)
+        
+        names = self.names.names
+        return {names[node_id]: distance for node_id, distance in distances.items() if distance > 0}
+    
+    def get_all_dependents(self, package, max_depth=None):
+        """Получить все пакеты, транзитивно зависящие от пакета"""
+        return sorted(self.get_reverse_closure(package, max_depth))
     
     def get_all_dependencies(self, package=None):
         """Получить все зависимости (транзитивное замыкание)"""
@@ -76,182 +563,192 @@ class DependencyGraph:
     
     def _get_transitive_dependencies(self, package):
         """Получить транзитивные зависимости пакета"""
-        if package not in self.graph:
+        root_id = self._expanded_id(package)
+        if root_id is None:
             return []
+        return sorted(self.names_of(self.closure_ids(root_id)))
+    
+    def closure_ids(self, root_id):
+        """Транзитивные зависимости узла в виде списка ID (без самого узла)"""
+        # Если замыкания уже посчитаны, обход графа не нужен
+        if self._closure_index is not None:
+            return self._closure_index.closure(root_id)
             
-        result = set()
-        stack = [package]
+        seen = bytearray(len(self.names))
+        result = []
+        stack = [root_id]
         
         while stack:
             current = stack.pop()
-            if current in result:
+            if seen[current]:
                 continue
-            result.add(current)
+            seen[current] = 1
+            result.append(current)
             
             # Добавляем зависимости текущего пакета
-            for dep in self.graph.get(current, []):
-                if dep not in result:
+            for dep in self.successors(current):
+                if not seen[dep]:
                     stack.append(dep)
         
-        result.discard(package)  # Убираем сам пакет из результата
-        return sorted(list(result))
+        result.remove(root_id)  # Убираем сам пакет из результата
+        return result
     
     def get_dependency_tree(self, package):
-        """Получить дерево зависимостей в виде словаря"""
-        if package not in self.graph:
+        """Получить дерево зависимостей в виде словаря
+    
+        Общее поддерево строится один раз, и все его вхождения ссылаются на
+        один и тот же словарь. Ребро назад по циклу дает пустой словарь,
+        поэтому структура конечна и не содержит ссылок на саму себя.
+        """
+        root_id = self._expanded_id(package)
+        if root_id is None:
             return {}
             
-        tree = {}
-        dependencies = self.graph[package]
-        
-        for dep in dependencies:
-            tree[dep] = self.get_dependency_tree(dep)
+        names = self.names.names
+        subtrees = {root_id: {}}
+        on_path = {root_id}
+        stack = [(root_id, iter(self.successors(root_id)))]
             
-        return tree
+        while stack:
+            node_id, dependencies = stack[-1]
+            tree = subtrees[node_id]
+            for dep in dependencies:
+                if dep in on_path:
+                    tree[names[dep]] = {}
+                elif dep in subtrees:
+                    tree[names[dep]] = subtrees[dep]
+                else:
+                    subtrees[dep] = tree[names[dep]] = {}
+                    if self.is_expanded(dep):
+                        on_path.add(dep)
+                        stack.append((dep, iter(self.successors(dep))))
+                        break
+            else:
+                stack.pop()
+                on_path.discard(node_id)
+        
+        return subtrees[root_id]
+    
+    def get_level_count(self):
+        """Длина самой длинной цепочки зависимостей по DAG компонент (циклы - один уровень)"""
+        condensation = self.get_condensation()
+        dag = condensation.dag
+        heights = array('l', [0]) * condensation.component_count
+        
+        # Зависимости компоненты имеют меньшие номера и уже посчитаны
+        for component_id in range(condensation.component_count):
+            for dependency in dag.successors(component_id):
+                if heights[dependency] + 1 > heights[component_id]:
+                    heights[component_id] = heights[dependency] + 1
+        
+        return max(heights) + 1 if heights else 0
     
     def get_dependency_levels(self):
         """Получить зависимости по уровням (топологическая сортировка)"""
         in_degree = {}
         
         # Инициализируем степени входа
-        for package in self.graph:
-            in_degree[package] = 0
+        for node_id in self.node_ids():
+            in_degree[node_id] = 0
             
-        for package, dependencies in self.graph.items():
-            for dep in dependencies:
-                if dep in in_degree:
-                    in_degree[dep] += 1
-                else:
-                    in_degree[dep] = 1
+        for node_id in self.expanded_ids():
+            for dep in self.successors(node_id):
+                in_degree[dep] += 1
         
         # Находим пакеты с нулевой степенью входа (корневые)
-        queue = deque([pkg for pkg in in_degree if in_degree[pkg] == 0])
+        queue = deque([node_id for node_id in in_degree if in_degree[node_id] == 0])
         levels = []
-        visited = set()
+        visited = bytearray(len(self.names))
         
         while queue:
             level_size = len(queue)
             current_level = []
             
             for _ in range(level_size):
-                package = queue.popleft()
-                if package in visited:
+                node_id = queue.popleft()
+                if visited[node_id]:
                     continue
                     
-                visited.add(package)
-                current_level.append(package)
+                visited[node_id] = 1
+                current_level.append(node_id)
                 
                 # Уменьшаем степени входа зависимостей
-                for dep in self.graph.get(package, []):
-                    if dep in in_degree:
-                        in_degree[dep] -= 1
-                        if in_degree[dep] == 0 and dep not in visited:
-                            queue.append(dep)
+                for dep in self.successors(node_id):
+                    in_degree[dep] -= 1
+                    if in_degree[dep] == 0 and not visited[dep]:
+                        queue.append(dep)
             
             if current_level:
-                levels.append(current_level)
+                levels.append(self.names_of(current_level))
         
         return levels
     
+    @profiler.timed('graph.cycles')
     def has_cycles(self):
-        """Проверить наличие циклов в графе"""
-        visited = set()
-        recursion_stack = set()
-        cycles = []
+        """Проверить наличие циклов в графе
         
-        def dfs(package, path):
-            if package in recursion_stack:
-                # Найден цикл
-                cycle_start = path.index(package)
-                cycle = path[cycle_start:]
-                cycles.append(cycle)
-                return True
-                
-            if package in visited:
-                return False
-                
-            visited.add(package)
-            recursion_stack.add(package)
-            path.append(package)
-            
-            for dep in self.graph.get(package, []):
-                dfs(dep, path.copy())
-                
-            recursion_stack.remove(package)
-            path.pop()
-            return False
+        Для каждой циклической компоненты сильной связности возвращается
+        один цикл, начинающийся с ближайшего к корню узла компоненты.
+        """
+        condensation = self.get_condensation()
+        cycles = []
         
-        for package in self.graph:
-            if package not in visited:
-                dfs(package, [])
+        for component_id, members in enumerate(condensation.components):
+            if not condensation.is_cyclic(component_id, self.adjacency):
+                continue
+            start = min(members, key=lambda node_id: (self._depth_key(node_id), node_id))
+            cycle = GraphAlgorithms.find_cycle(self.adjacency, condensation.component_of, start)
+            cycles.append(self.names_of(cycle))
                 
+        # Порядок вывода не зависит от нумерации компонент
+        cycles.sort(key=lambda cycle: (self._depth_key(self.names.get_id(cycle[0])), cycle))
         return cycles
+                
+    def _depth_key(self, node_id):
+        """Глубина узла для сортировки (узлы без глубины - в конце)"""
+        depth = self.depths[node_id] if node_id < len(self.depths) else -1
+        return depth if depth >= 0 else len(self.depths)
     
-    def print_ascii_tree(self, package, prefix="", is_last=True):
-        """Вывод ASCII-дерева зависимостей"""
-        if package not in self.graph:
-            print(f"{prefix}{'└── ' if is_last else '├── '}{package}")
-            return
-            
-        print(f"{prefix}{'└── ' if is_last else '├── '}{package}")
-        
-        dependencies = self.graph[package]
-        new_prefix = prefix + ("    " if is_last else "│   ")
-        
-        for i, dep in enumerate(dependencies):
-            is_last_dep = i == len(dependencies) - 1
-            self.print_ascii_tree(dep, new_prefix, is_last_dep)
+    @profiler.timed('render.ascii_tree')
+    def print_ascii_tree(self, package, max_depth=None, max_width=None, stream=None):
+        """Вывод ASCII-дерева зависимостей (общие поддеревья выводятся один раз)"""
+        renderer = AsciiTreeRenderer(self, max_depth=max_depth, max_width=max_width, stream=stream)
+        line_count = renderer.render(package)
+        profiler.count('render.tree_lines', line_count)
+        return line_count
     def get_install_order(self, package):
-        """Получить порядок установки зависимостей (топологическая сортировка)"""
-        if package not in self.graph:
-            return []
-            
-        # Создаем копию графа для работы
-        graph_copy = {pkg: deps[:] for pkg, deps in self.graph.items()}
-        
-        # Добавляем корневой пакет если его нет в графе
-        if package not in graph_copy:
-            graph_copy[package] = []
-        
-        # Вычисляем степени входа
-        in_degree = {}
-        for pkg in graph_copy:
-            in_degree[pkg] = 0
-            
-        for pkg, dependencies in graph_copy.items():
-            for dep in dependencies:
-                if dep in in_degree:
-                    in_degree[dep] += 1
-                else:
-                    in_degree[dep] = 1
-                    graph_copy[dep] = []  # Добавляем пакет без зависимостей
+        """Получить порядок установки: зависимости раньше зависящих, корень последним"""
+        return [name for wave in self.get_install_waves(package) for group in wave for name in group]
+    
+    @profiler.timed('graph.install_order')
+    def get_install_waves(self, package):
+        """Волны установки по подграфу, достижимому из пакета
         
-        # Находим пакеты с нулевой степенью входа
-        queue = deque([pkg for pkg in in_degree if in_degree[pkg] == 0])
-        install_order = []
-        visited = set()
+        Каждая волна - список групп установки (компонент сильной связности),
+        которые можно ставить параллельно после всех предыдущих волн. Пакеты
+        одного цикла образуют одну группу. Группы и пакеты внутри них
+        упорядочены по имени, корень стоит последним в своей группе.
+        """
+        root_id = self._expanded_id(package)
+        if root_id is None:
+            return []
         
-        while queue:
-            current = queue.popleft()
-            if current in visited:
-                continue
-                
-            visited.add(current)
-            install_order.append(current)
+        condensation = self.get_condensation()
+        names = self.names.names
+        waves = []
             
-            # Уменьшаем степени входа зависимостей
-            for dep in graph_copy.get(current, []):
-                if dep in in_degree:
-                    in_degree[dep] -= 1
-                    if in_degree[dep] == 0 and dep not in visited:
-                        queue.append(dep)
+        for wave in GraphAlgorithms.install_waves(condensation, condensation.component_of[root_id]):
+            groups = []
+            for component_id in wave:
+                members = condensation.components[component_id]
+                group = sorted(names[node_id] for node_id in members if node_id != root_id)
+                if root_id in members:
+                    group.append(names[root_id])
+                groups.append(group)
+            groups.sort()
+            waves.append(groups)
         
-        # Убедимся что корневой пакет в конце (устанавливается последним)
-        if package in install_order:
-            install_order.remove(package)
-            install_order.append(package)
-        
-        return install_order
+        return waves
     
     def compare_with_apk(self, package):
         """Сравнить порядок установки с реальным менеджером пакетов"""
@@ -274,36 +771,105 @@ class DependencyGraph:
         print(f"  2. Реальный apk обрабатывает конфликтующие зависимости")
         print(f"  3. Реальный apk учитывает архитектуру системы")
         print(f"  4. Реальный apk может пропускать виртуальные пакеты")
-        print(f"  5. Наш алгоритм использует простую топологическую сортировку")
+        print(f"  5. Наш алгоритм объединяет циклы в группы и не учитывает скрипты установки")
         
         return our_order
     
-    def get_dependency_paths(self, package):
-        """Получить все пути зависимостей"""
-        if package not in self.graph:
-            return []
-            
-        paths = []
+    def get_dependency_paths(self, package, limit=DEFAULT_PATH_LIMIT):
+        """Получить пути зависимостей от пакета до листьев (не больше limit)"""
+        return list(islice(self.iter_dependency_paths(package, limit=limit), limit))
+    
+    def iter_dependency_paths(self, package, target=None, limit=None):
+        """Ленивый перебор простых путей от package до target (или до листьев)"""
+        root_id = self._expanded_id(package)
+        if root_id is None:
+            return
         
-        def dfs(current, path):
-            path.append(current)
-            
-            # Если нет зависимостей - это конечный путь
-            if not self.graph.get(current):
-                paths.append(path.copy())
-            else:
-                for dep in self.graph.get(current, []):
-                    dfs(dep, path.copy())
+        allowed = None
+        if target is not None:
+            target_id = self.node_id(target)
+            if target_id is None:
+                return
+            # Отсекаем ветви, из которых target недостижим
+            allowed = GraphAlgorithms.reaching_marks(self.reverse_adjacency, target_id, len(self.present))
+            if not allowed[root_id]:
+                return
+        else:
+            target_id = None
+        
+        paths = GraphAlgorithms.iter_paths(self.adjacency, root_id, target_id, allowed)
+        for path in islice(paths, limit):
+            yield self.names_of(path)
+    
+    @profiler.timed('graph.paths')
+    def count_dependency_paths(self, package, target=None):
+        """Количество путей от package до target (или до листьев) за O(V+E)
+        
+        Считается по DAG компонент сильной связности: цикл учитывается как
+        один узел, поэтому для ациклического графа результат точный.
+        """
+        root_id = self._expanded_id(package)
+        if root_id is None:
+            return 0
+        
+        condensation = self.get_condensation()
+        target_component = None
+        if target is not None:
+            target_id = self.node_id(target)
+            if target_id is None:
+                return 0
+            target_component = condensation.component_of[target_id]
+            if target_component > condensation.component_of[root_id]:
+                return 0
+        
+        return GraphAlgorithms.count_paths(condensation, condensation.component_of[root_id], target_component)
+    
+    @profiler.timed('graph.paths')
+    def get_shortest_paths(self, package, target, k=1):
+        """k кратчайших простых путей от package до target"""
+        root_id = self._expanded_id(package)
+        target_id = self.node_id(target)
+        if root_id is None or target_id is None:
+            return []
             
-            path.pop()
+        allowed = GraphAlgorithms.reaching_marks(self.reverse_adjacency, target_id, len(self.present))
+        if not allowed[root_id]:
+            return []
         
-        dfs(package, [])
-        return paths
+        paths = GraphAlgorithms.k_shortest_paths(self.adjacency, root_id, target_id, k, allowed)
+        return [self.names_of(path) for path in paths]
     
     def find_common_dependencies(self, package1, package2):
         """Найти общие зависимости двух пакетов"""
-        deps1 = set(self.get_all_dependencies(package1))
-        deps2 = set(self.get_all_dependencies(package2))
+        first_id = self._expanded_id(package1)
+        second_id = self._expanded_id(package2)
+        if first_id is None or second_id is None:
+            return []
+        
+        try:
+            closure_index = self.get_closure_index()
+        except ClosureMemoryError:
+            # Замыкания не помещаются в лимит - считаем обходом графа
+            deps1 = set(self.get_all_dependencies(package1))
+            deps2 = set(self.get_all_dependencies(package2))
+            return sorted(deps1.intersection(deps2))
+
+        return sorted(self.names_of(closure_index.common(first_id, second_id)))
+    
+    def find_different_dependencies(self, package1, package2):
+        """Найти различающиеся зависимости: (только у первого, только у второго)"""
+        first_id = self._expanded_id(package1)
+        second_id = self._expanded_id(package2)
+        if first_id is None or second_id is None:
+            return (self.get_all_dependencies(package1) if first_id is not None else [],
+                    self.get_all_dependencies(package2) if second_id is not None else [])
+        
+        try:
+            closure_index = self.get_closure_index()
+        except ClosureMemoryError:
+            deps1 = set(self.get_all_dependencies(package1))
+            deps2 = set(self.get_all_dependencies(package2))
+            return sorted(deps1 - deps2), sorted(deps2 - deps1)
         
-        common = deps1.intersection(deps2)
-        return sorted(list(common))
+        return (sorted(self.names_of(closure_index.difference(first_id, second_id))),
+                sorted(self.names_of(closure_index.difference(second_id, first_id))))
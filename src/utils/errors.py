@@ -20,3 +20,7 @@ class NetworkError(RepositoryError):
 class APKIndexParseError(RepositoryError):
     """Ошибка парсинга APKINDEX"""
     pass
+
+class ClosureMemoryError(ConfigurationError):
+    """Ошибка: превышен лимит памяти для транзитивных замыканий"""
+    pass
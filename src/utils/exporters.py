@@ -0,0 +1,290 @@
+import json
+import re
+import sys
+from collections import deque
+from xml.sax.saxutils import escape, quoteattr
+from .errors import ConfigurationError
+from .profiler import profiler
+
+def quote_name(name):
+    """Имя пакета в двойных кавычках с экранированием '\\' и '"' (DOT, PlantUML)"""
+    return '"' + name.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+class GraphExporter:
+    """Потоковая выгрузка графа зависимостей в текстовый формат
+    
+    Узлы и ребра пишутся в поток по мере обхода CSR, без сборки всего
+    документа в памяти. Идентификатор узла для целевого формата
+    вычисляется один раз на узел и хранится в списке по ID.
+    """
+    
+    FORMAT = None
+    EXTENSION = None
+    
+    def __init__(self, dependency_graph):
+        self.dependency_graph = dependency_graph
+    
+    @profiler.timed('render.export')
+    def export(self, stream, root_package=None):
+        """Записать граф (или подграф, достижимый из root_package) в поток
+        
+        Возвращает (количество узлов, количество ребер).
+        """
+        graph = self.dependency_graph
+        node_ids = self._select_nodes(root_package)
+        root_id = graph.node_id(root_package) if root_package else None
+        
+        labels = [None] * len(graph.present)
+        used = set()
+        for node_id in node_ids:
+            labels[node_id] = self.make_id(graph.names.name(node_id), used)
+        
+        self.write_header(stream)
+        for node_id in node_ids:
+            self.write_node(stream, node_id, graph.names.name(node_id), labels[node_id], node_id == root_id)
+        self.write_separator(stream)
+        
+        edge_count = 0
+        marker = [-1] * len(graph.present)
+        for node_id in node_ids:
+            for target in graph.successors(node_id):
+                # Повторные ребра из одного узла отбрасываются без множества строк
+                if marker[target] == node_id:
+                    continue
+                marker[target] = node_id
+                self.write_edge(stream, labels[node_id], labels[target], edge_count)
+                edge_count += 1
+        self.write_footer(stream)
+        
+        profiler.count('render.exported_nodes', len(node_ids))
+        profiler.count('render.exported_edges', edge_count)
+        return len(node_ids), edge_count
+    
+    @staticmethod
+    def for_format(dependency_graph, export_format=None, filename=None):
+        """Экспортер по имени формата или по расширению файла (по умолчанию PlantUML)"""
+        if export_format is None:
+            export_format = PlantUMLExporter.FORMAT
+            for exporter in EXPORTERS.values():
+                if filename and filename.endswith(exporter.EXTENSION):
+                    export_format = exporter.FORMAT
+                    break
+        
+        exporter = EXPORTERS.get(export_format)
+        if exporter is None:
+            raise ConfigurationError(
+                f"Неизвестный формат экспорта '{export_format}' (доступны: {', '.join(EXPORTERS)})"
+            )
+        return exporter(dependency_graph)
+    
+    def export_to_file(self, filename, root_package=None):
+        """Записать граф в файл ('-' - стандартный вывод)"""
+        if filename == '-':
+            return self.export(sys.stdout, root_package)
+        with open(filename, 'w', encoding='utf-8') as stream:
+            return self.export(stream, root_package)
+    
+    def _select_nodes(self, root_package):
+        """ID выгружаемых узлов: BFS от корня или все узлы графа по порядку"""
+        graph = self.dependency_graph
+        if root_package is None:
+            return list(graph.node_ids())
+        
+        root_id = graph.node_id(root_package)
+        if root_id is None:
+            raise ConfigurationError(f"Пакет '{root_package}' не найден в графе")
+        
+        seen = bytearray(len(graph.present))
+        seen[root_id] = 1
+        order = [root_id]
+        queue = deque(order)
+        while queue:
+            for target in graph.successors(queue.popleft()):
+                if not seen[target]:
+                    seen[target] = 1
+                    order.append(target)
+                    queue.append(target)
+        return order
+    
+    def _depth(self, node_id):
+        """Глубина узла (-1, если она неизвестна)"""
+        depths = self.dependency_graph.depths
+        return depths[node_id] if node_id < len(depths) else -1
+    
+    def make_id(self, name, used):
+        """Идентификатор узла в целевом формате"""
+        return name
+    
+    def write_header(self, stream):
+        """Начало документа"""
+        pass
+    
+    def write_node(self, stream, node_id, name, label, is_root):
+        """Описание узла"""
+        pass
+    
+    def write_separator(self, stream):
+        """Граница между узлами и ребрами"""
+        pass
+    
+    def write_edge(self, stream, source_label, target_label, index):
+        """Описание ребра"""
+        pass
+    
+    def write_footer(self, stream):
+        """Конец документа"""
+        pass
+
+
+class PlantUMLExporter(GraphExporter):
+    """PlantUML: прямоугольники с алиасами и связи между ними"""
+    
+    FORMAT = 'plantuml'
+    EXTENSION = '.puml'
+    
+    def make_id(self, name, used):
+        """Алиас из букв, цифр и '_'; при совпадении добавляется номер"""
+        alias = re.sub(r'\W', '_', name)
+        if alias in used:
+            suffix = 2
+            while f"{alias}_{suffix}" in used:
+                suffix += 1
+            alias = f"{alias}_{suffix}"
+        used.add(alias)
+        return alias
+    
+    def write_header(self, stream):
+        stream.write(
+            "@startuml\n"
+            "left to right direction\n"
+            "skinparam nodesep 10\n"
+            "skinparam ranksep 50\n"
+            "skinparam packageStyle rect\n"
+            "skinparam shadowing false\n"
+            "\n"
+        )
+    
+    def write_node(self, stream, node_id, name, label, is_root):
+        style = " #LightBlue" if is_root else ""
+        stream.write(f'rectangle {quote_name(name)} as {label}{style}\n')
+    
+    def write_separator(self, stream):
+        stream.write("\n")
+    
+    def write_edge(self, stream, source_label, target_label, index):
+        stream.write(f"{source_label} --> {target_label}\n")
+    
+    def write_footer(self, stream):
+        stream.write("@enduml\n")
+
+
+class CompactPlantUMLExporter(PlantUMLExporter):
+    """PlantUML без объявлений узлов: только связи между именами в кавычках"""
+    
+    def make_id(self, name, used):
+        return quote_name(name)
+    
+    def write_header(self, stream):
+        stream.write("@startuml\nhide empty description\nskinparam monochrome true\n")
+    
+    def write_node(self, stream, node_id, name, label, is_root):
+        if is_root:
+            stream.write(f"{label} #LightBlue\n")
+    
+    def write_separator(self, stream):
+        pass
+
+
+class DotExporter(GraphExporter):
+    """Graphviz DOT: идентификаторы - строки в кавычках"""
+    
+    FORMAT = 'dot'
+    EXTENSION = '.dot'
+    
+    def make_id(self, name, used):
+        return quote_name(name)
+    
+    def write_header(self, stream):
+        stream.write("digraph dependencies {\n    rankdir=LR;\n    node [shape=box];\n")
+    
+    def write_node(self, stream, node_id, name, label, is_root):
+        style = " [style=filled, fillcolor=lightblue]" if is_root else ""
+        stream.write(f"    {label}{style};\n")
+    
+    def write_edge(self, stream, source_label, target_label, index):
+        stream.write(f"    {source_label} -> {target_label};\n")
+    
+    def write_footer(self, stream):
+        stream.write("}\n")
+
+
+class GraphMLExporter(GraphExporter):
+    """GraphML: имя пакета и глубина как атрибуты узла"""
+    
+    FORMAT = 'graphml'
+    EXTENSION = '.graphml'
+    
+    def make_id(self, name, used):
+        return quoteattr(name)
+    
+    def write_header(self, stream):
+        stream.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+            '  <key id="name" for="node" attr.name="name" attr.type="string"/>\n'
+            '  <key id="depth" for="node" attr.name="depth" attr.type="int"/>\n'
+            '  <key id="root" for="node" attr.name="root" attr.type="boolean"/>\n'
+            '  <graph id="dependencies" edgedefault="directed">\n'
+        )
+    
+    def write_node(self, stream, node_id, name, label, is_root):
+        stream.write(
+            f'    <node id={label}><data key="name">{escape(name)}</data>'
+            f'<data key="depth">{self._depth(node_id)}</data>'
+            f'<data key="root">{"true" if is_root else "false"}</data></node>\n'
+        )
+    
+    def write_edge(self, stream, source_label, target_label, index):
+        stream.write(f'    <edge id="e{index}" source={source_label} target={target_label}/>\n')
+    
+    def write_footer(self, stream):
+        stream.write("  </graph>\n</graphml>\n")
+
+
+class JSONExporter(GraphExporter):
+    """JSON node-link (совместим с networkx.node_link_graph)"""
+    
+    FORMAT = 'json'
+    EXTENSION = '.json'
+    
+    def make_id(self, name, used):
+        return json.dumps(name, ensure_ascii=False)
+    
+    def write_header(self, stream):
+        stream.write('{"directed": true, "multigraph": false, "graph": {}, "nodes": [')
+        self._first = True
+    
+    def write_node(self, stream, node_id, name, label, is_root):
+        separator = "" if self._first else ","
+        self._first = False
+        depth = self._depth(node_id)
+        stream.write(f'{separator}\n{{"id": {label}, "depth": {depth}, "root": {"true" if is_root else "false"}}}')
+    
+    def write_separator(self, stream):
+        stream.write('\n], "links": [')
+    
+    def write_edge(self, stream, source_label, target_label, index):
+        separator = "," if index else ""
+        stream.write(f'{separator}\n{{"source": {source_label}, "target": {target_label}}}')
+    
+    def write_footer(self, stream):
+        stream.write("\n]}\n")
+
+
+# Формат -> класс экспортера
+EXPORTERS = {
+    exporter.FORMAT: exporter
+    for exporter in (PlantUMLExporter, DotExporter, GraphMLExporter, JSONExporter)
+}
+
@@ -0,0 +1,362 @@
+import heapq
+from array import array
+from collections import deque
+from .graph_storage import CSRAdjacency
+
+class Condensation:
+    """Граф компонент сильной связности (DAG)
+
+    Компоненты пронумерованы в обратном топологическом порядке: все
+    зависимости компоненты имеют меньшие номера, чем она сама.
+    """
+
+    def __init__(self, component_of, components, dag):
+        self.component_of = component_of  # ID узла -> номер компоненты (-1 вне графа)
+        self.components = components      # номер компоненты -> массив ID узлов
+        self.dag = dag                    # CSR на номерах компонент
+
+    @property
+    def component_count(self):
+        return len(self.components)
+
+    def is_cyclic(self, component_id, adjacency):
+        """Компонента содержит цикл (более одного узла или петля)"""
+        members = self.components[component_id]
+        if len(members) > 1:
+            return True
+        node_id = members[0]
+        return node_id in adjacency.successors(node_id)
+
+
+class GraphAlgorithms:
+    @staticmethod
+    def strongly_connected_components(adjacency, node_ids, node_count):
+        """Итеративный алгоритм Тарьяна за O(V+E) без рекурсии
+
+        Возвращает (component_of, components): компоненты выдаются в
+        обратном топологическом порядке (сначала те, от которых зависят).
+        """
+        # Обход идет по плоским массивам, поэтому точечные изменения сливаются
+        adjacency = adjacency.compacted()
+        offsets = adjacency.offsets
+        targets = adjacency.targets
+        csr_nodes = len(offsets) - 1
+
+        index = array('l', [-1]) * node_count
+        lowlink = array('l', [0]) * node_count
+        on_stack = bytearray(node_count)
+        component_of = array('l', [-1]) * node_count
+        components = []
+        stack = []
+        counter = 0
+
+        for start in node_ids:
+            if index[start] != -1:
+                continue
+
+            # Стек обхода: узел и позиция следующего ребра
+            work_nodes = [start]
+            work_edges = [offsets[start] if start < csr_nodes else 0]
+            index[start] = lowlink[start] = counter
+            counter += 1
+            stack.append(start)
+            on_stack[start] = 1
+
+            while work_nodes:
+                node = work_nodes[-1]
+                edge = work_edges[-1]
+                edge_end = offsets[node + 1] if node < csr_nodes else 0
+
+                if edge < edge_end:
+                    work_edges[-1] = edge + 1
+                    target = targets[edge]
+                    if index[target] == -1:
+                        index[target] = lowlink[target] = counter
+                        counter += 1
+                        stack.append(target)
+                        on_stack[target] = 1
+                        work_nodes.append(target)
+                        work_edges.append(offsets[target] if target < csr_nodes else 0)
+                    elif on_stack[target] and index[target] < lowlink[node]:
+                        lowlink[node] = index[target]
+                    continue
+
+                # Все ребра узла просмотрены - возвращаемся
+                work_nodes.pop()
+                work_edges.pop()
+                if work_nodes:
+                    parent = work_nodes[-1]
+                    if lowlink[node] < lowlink[parent]:
+                        lowlink[parent] = lowlink[node]
+
+                if lowlink[node] == index[node]:
+                    component_id = len(components)
+                    members = array('l')
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = 0
+                        component_of[member] = component_id
+                        members.append(member)
+                        if member == node:
+                            break
+                    components.append(members)
+
+        return component_of, components
+
+    @staticmethod
+    def condense(adjacency, component_of, components):
+        """Построить DAG компонент (ребра между компонентами без повторов)"""
+        marker = array('l', [-1]) * len(components)
+        dag_lists = []
+
+        for component_id, members in enumerate(components):
+            neighbours = array('l')
+            for node_id in members:
+                for target in adjacency.successors(node_id):
+                    target_component = component_of[target]
+                    if target_component != component_id and marker[target_component] != component_id:
+                        marker[target_component] = component_id
+                        neighbours.append(target_component)
+            dag_lists.append(neighbours)
+
+        return Condensation(component_of, components, CSRAdjacency.from_lists(dag_lists))
+
+    @staticmethod
+    def find_cycle(adjacency, component_of, start):
+        """Кратчайший цикл через start внутри его компоненты (BFS)"""
+        component_id = component_of[start]
+        parents = {}
+        queue = deque([start])
+
+        while queue:
+            node = queue.popleft()
+            for target in adjacency.successors(node):
+                if component_of[target] != component_id:
+                    continue
+                if target == start:
+                    # Восстанавливаем путь start -> ... -> node -> start
+                    path = [node]
+                    while path[-1] != start:
+                        path.append(parents[path[-1]])
+                    path.reverse()
+                    return path
+                if target not in parents:
+                    parents[target] = node
+                    queue.append(target)
+
+        return []
+
+    @staticmethod
+    def count_paths(condensation, source_component, target_component=None):
+        """Количество путей по DAG компонент динамическим программированием
+
+        Цикл (компонента сильной связности) считается одним узлом. Без
+        target_component считаются пути до компонент без зависимостей.
+        Обрабатываются только компоненты, достижимые из source_component.
+        """
+        dag = condensation.dag
+        reachable = bytearray(condensation.component_count)
+        reachable[source_component] = 1
+        stack = [source_component]
+        while stack:
+            component_id = stack.pop()
+            for dependency in dag.successors(component_id):
+                if not reachable[dependency]:
+                    reachable[dependency] = 1
+                    stack.append(dependency)
+
+        # Зависимости имеют меньшие номера, поэтому обход по возрастанию
+        counts = {}
+        for component_id in range(source_component + 1):
+            if not reachable[component_id]:
+                continue
+            if component_id == target_component:
+                counts[component_id] = 1
+                continue
+            dependencies = dag.successors(component_id)
+            if not dependencies:
+                counts[component_id] = 1 if target_component is None else 0
+            else:
+                counts[component_id] = sum(counts[dependency] for dependency in dependencies)
+
+        return counts[source_component]
+
+    @staticmethod
+    def iter_paths(adjacency, source, target=None, allowed=None):
+        """Ленивый перебор простых путей из source (итеративный DFS)
+
+        Пути заканчиваются в target, а без него - в узлах без зависимостей.
+        allowed - отметки узлов, через которые имеет смысл идти (например,
+        узлы, из которых достижим target); None - без отсечения.
+        """
+        if source == target or (target is None and adjacency.degree(source) == 0):
+            yield [source]
+            return
+
+        path = [source]
+        on_path = {source}
+        iterators = [iter(adjacency.successors(source))]
+
+        while iterators:
+            for node in iterators[-1]:
+                if node in on_path or (allowed is not None and not allowed[node]):
+                    continue
+                if node == target or (target is None and adjacency.degree(node) == 0):
+                    yield path + [node]
+                    continue
+                path.append(node)
+                on_path.add(node)
+                iterators.append(iter(adjacency.successors(node)))
+                break
+            else:
+                iterators.pop()
+                on_path.discard(path.pop())
+
+    @staticmethod
+    def reaching_marks(reverse_adjacency, target, node_count):
+        """Отметки узлов, из которых достижим target (BFS по обратному графу)"""
+        marks = bytearray(node_count)
+        marks[target] = 1
+        queue = deque([target])
+        while queue:
+            node = queue.popleft()
+            for source in reverse_adjacency.successors(node):
+                if not marks[source]:
+                    marks[source] = 1
+                    queue.append(source)
+        return marks
+
+    @staticmethod
+    def shortest_path(adjacency, source, target, allowed=None, blocked_nodes=(), blocked_edges=()):
+        """Кратчайший путь BFS с исключенными узлами и ребрами (None, если пути нет)"""
+        if source == target:
+            return [source]
+
+        parents = {source: None}
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            for next_node in adjacency.successors(node):
+                if next_node in parents or next_node in blocked_nodes:
+                    continue
+                if allowed is not None and not allowed[next_node]:
+                    continue
+                if (node, next_node) in blocked_edges:
+                    continue
+                parents[next_node] = node
+                if next_node == target:
+                    path = [target]
+                    while parents[path[-1]] is not None:
+                        path.append(parents[path[-1]])
+                    path.reverse()
+                    return path
+                queue.append(next_node)
+
+        return None
+
+    @staticmethod
+    def k_shortest_paths(adjacency, source, target, k, allowed=None):
+        """k кратчайших простых путей (алгоритм Йена поверх BFS)
+
+        Пути одинаковой длины упорядочены по последовательности ID узлов,
+        поэтому результат детерминирован.
+        """
+        first = GraphAlgorithms.shortest_path(adjacency, source, target, allowed)
+        if first is None or k <= 0:
+            return []
+
+        paths = [first]
+        candidates = []
+        seen = {tuple(first)}
+
+        while len(paths) < k:
+            previous = paths[-1]
+            for spur_index in range(len(previous) - 1):
+                spur_node = previous[spur_index]
+                root = previous[:spur_index + 1]
+
+                # Запрещаем ребра, по которым уже найденные пути уходят из корня
+                blocked_edges = {
+                    (path[spur_index], path[spur_index + 1])
+                    for path in paths
+                    if len(path) > spur_index + 1 and path[:spur_index + 1] == root
+                }
+                spur_path = GraphAlgorithms.shortest_path(
+                    adjacency, spur_node, target, allowed,
+                    blocked_nodes=set(root[:-1]), blocked_edges=blocked_edges
+                )
+                if spur_path is None:
+                    continue
+
+                candidate = root[:-1] + spur_path
+                key = tuple(candidate)
+                if key not in seen:
+                    seen.add(key)
+                    heapq.heappush(candidates, (len(candidate), key))
+
+            if not candidates:
+                break
+            paths.append(list(heapq.heappop(candidates)[1]))
+
+        return paths
+    
+    @staticmethod
+    def install_waves(condensation, root_component):
+        """Волны установки компонент, достижимых из root_component, за O(V+E)
+        
+        Волна компоненты - длина самой длинной цепочки ее зависимостей:
+        в волну 0 попадают компоненты без зависимостей, и каждая компонента
+        стоит строго позже всех своих зависимостей. Возвращает список волн
+        (списки номеров компонент в порядке обратного обхода DFS).
+        """
+        dag = condensation.dag
+        wave_of = {root_component: -1}
+        order = []
+        stack = [(root_component, iter(dag.successors(root_component)))]
+        
+        while stack:
+            component_id, dependencies = stack[-1]
+            for dependency in dependencies:
+                if dependency not in wave_of:
+                    wave_of[dependency] = -1
+                    stack.append((dependency, iter(dag.successors(dependency))))
+                    break
+            else:
+                # Все зависимости уже обработаны (граф компонент ацикличен)
+                stack.pop()
+                wave = 0
+                for dependency in dag.successors(component_id):
+                    if wave_of[dependency] + 1 > wave:
+                        wave = wave_of[dependency] + 1
+                wave_of[component_id] = wave
+                order.append(component_id)
+        
+        waves = [[] for _ in range(wave_of[root_component] + 1)]
+        for component_id in order:
+            waves[wave_of[component_id]].append(component_id)
+        return waves
+
+    @staticmethod
+    def closure_fingerprints(condensation):
+        """Отпечатки замыканий всех компонент (дерево Меркла по DAG компонент)
+        
+        Отпечаток компоненты - 128-битный BLAKE2b от ID ее узлов и
+        отпечатков ее зависимостей. У двух графов с общей таблицей имен
+        равные отпечатки означают одинаковый достижимый подграф компонент, а
+        значит и одинаковые замыкания, поэтому такие подграфы можно не
+        сравнивать. В отличие от hash(), дайджест не зависит от запуска, а
+        вероятность случайного совпадения пренебрежимо мала.
+        """
+        import hashlib
+        dag = condensation.dag
+        fingerprints = []
+        for component_id, members in enumerate(condensation.components):
+            digest = hashlib.blake2b(digest_size=16)
+            # Число узлов отделяет ID фиксированной длины от дайджестов зависимостей
+            digest.update(len(members).to_bytes(8, 'little'))
+            digest.update(array('q', sorted(members)).tobytes())
+            # Зависимости компоненты имеют меньшие номера и уже посчитаны
+            for dependency in sorted({fingerprints[dependency] for dependency in dag.successors(component_id)}):
+                digest.update(dependency)
+            fingerprints.append(digest.digest())
+        return fingerprints
@@ -0,0 +1,203 @@
+from array import array
+from collections.abc import Mapping, Set
+
+class NameTable:
+    """Таблица интернированных имен пакетов: имя <-> целочисленный ID"""
+    
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+    
+    def intern(self, name):
+        """Получить ID имени, добавив его в таблицу при необходимости"""
+        node_id = self.ids.get(name)
+        if node_id is None:
+            node_id = len(self.names)
+            self.ids[name] = node_id
+            self.names.append(name)
+        return node_id
+    
+    def get_id(self, name):
+        """ID имени или None, если имя не встречалось"""
+        return self.ids.get(name)
+    
+    def name(self, node_id):
+        """Имя по ID"""
+        return self.names[node_id]
+    
+    def __len__(self):
+        return len(self.names)
+    
+    def __contains__(self, name):
+        return name in self.ids
+
+
+class CSRAdjacency:
+    """Список смежности в формате CSR: смещения и плоский массив целей
+    
+    Соседи узла u - targets[offsets[u]:offsets[u + 1]]. Точечные изменения
+    хранятся в словаре overrides (ID узла -> новый массив соседей) поверх
+    неизменных массивов; compacted() сливает их в новый CSR.
+    """
+    
+    TYPECODE = 'l'
+    
+    def __init__(self, offsets=None, targets=None):
+        self.offsets = offsets if offsets is not None else array(self.TYPECODE, [0])
+        self.targets = targets if targets is not None else array(self.TYPECODE)
+        self.overrides = {}
+        self._edge_delta = 0
+    
+    @classmethod
+    def from_lists(cls, adjacency_lists):
+        """Построить CSR из списков соседей (индекс списка - ID узла)"""
+        offsets = array(cls.TYPECODE, [0])
+        targets = array(cls.TYPECODE)
+        for neighbours in adjacency_lists:
+            if neighbours:
+                targets.extend(neighbours)
+            offsets.append(len(targets))
+        return cls(offsets, targets)
+    
+    @property
+    def node_count(self):
+        if self.overrides:
+            return max(len(self.offsets) - 1, max(self.overrides) + 1)
+        return len(self.offsets) - 1
+    
+    @property
+    def edge_count(self):
+        return len(self.targets) + self._edge_delta
+    
+    def successors(self, node_id):
+        """Соседи узла (срез массива; для узлов вне CSR - пустой)"""
+        if self.overrides and node_id in self.overrides:
+            return self.overrides[node_id]
+        if node_id >= len(self.offsets) - 1:
+            return ()
+        return self.targets[self.offsets[node_id]:self.offsets[node_id + 1]]
+    
+    def degree(self, node_id):
+        """Количество исходящих ребер узла"""
+        if self.overrides and node_id in self.overrides:
+            return len(self.overrides[node_id])
+        if node_id >= len(self.offsets) - 1:
+            return 0
+        return self.offsets[node_id + 1] - self.offsets[node_id]
+    
+    def replace(self, node_id, neighbours):
+        """Заменить соседей узла без перестройки массивов"""
+        self._edge_delta += len(neighbours) - self.degree(node_id)
+        self.overrides[node_id] = array(self.TYPECODE, neighbours)
+    
+    def compacted(self):
+        """Новый CSR с примененными изменениями (без overrides)"""
+        if not self.overrides:
+            return self
+        return CSRAdjacency.from_lists(self.successors(node_id) for node_id in range(self.node_count))
+    
+    def copy(self):
+        """Копия для независимых изменений (массивы копируются целиком)"""
+        duplicate = CSRAdjacency(self.offsets[:], self.targets[:])
+        duplicate.overrides = dict(self.overrides)
+        duplicate._edge_delta = self._edge_delta
+        return duplicate
+    
+    def reversed(self, node_count):
+        """Обратный граф в формате CSR (подсчетом за O(V+E))"""
+        if self.overrides:
+            return self.compacted().reversed(node_count)
+        
+        offsets = array(self.TYPECODE, [0]) * (node_count + 1)
+        for target in self.targets:
+            offsets[target + 1] += 1
+        for node_id in range(node_count):
+            offsets[node_id + 1] += offsets[node_id]
+        
+        targets = array(self.TYPECODE, [0]) * len(self.targets)
+        positions = offsets[:-1]
+        source_offsets = self.offsets
+        for source in range(len(source_offsets) - 1):
+            for edge in range(source_offsets[source], source_offsets[source + 1]):
+                target = self.targets[edge]
+                targets[positions[target]] = source
+                positions[target] += 1
+        
+        return CSRAdjacency(offsets, targets)
+    
+    def memory_bytes(self):
+        """Объем памяти, занимаемый массивами"""
+        return (len(self.offsets) * self.offsets.itemsize +
+                len(self.targets) * self.targets.itemsize +
+                sum(len(neighbours) * neighbours.itemsize for neighbours in self.overrides.values()))
+
+
+class AdjacencyView(Mapping):
+    """Представление графа в виде словаря имя -> список имен зависимостей
+    
+    Ключами являются только раскрытые узлы (как в прежнем словаре graph),
+    имена переводятся из ID только при обращении.
+    """
+    
+    def __init__(self, dependency_graph):
+        self._graph = dependency_graph
+    
+    def __getitem__(self, name):
+        node_id = self._graph.names.get_id(name)
+        if node_id is None or not self._graph.is_expanded(node_id):
+            raise KeyError(name)
+        return self._graph.names_of(self._graph.successors(node_id))
+    
+    def __iter__(self):
+        names = self._graph.names.names
+        for node_id in self._graph.expanded_ids():
+            yield names[node_id]
+    
+    def __len__(self):
+        return self._graph.expanded_count
+    
+    def __contains__(self, name):
+        node_id = self._graph.names.get_id(name)
+        return node_id is not None and self._graph.is_expanded(node_id)
+
+
+class DepthView(Mapping):
+    """Представление глубин узлов в виде словаря имя -> глубина"""
+    
+    def __init__(self, dependency_graph):
+        self._graph = dependency_graph
+    
+    def __getitem__(self, name):
+        node_id = self._graph.names.get_id(name)
+        depths = self._graph.depths
+        if node_id is None or node_id >= len(depths) or depths[node_id] < 0:
+            raise KeyError(name)
+        return depths[node_id]
+    
+    def __iter__(self):
+        names = self._graph.names.names
+        for node_id, depth in enumerate(self._graph.depths):
+            if depth >= 0:
+                yield names[node_id]
+    
+    def __len__(self):
+        return sum(1 for depth in self._graph.depths if depth >= 0)
+
+
+class ExpandedSetView(Set):
+    """Множество имен раскрытых (посещенных) узлов"""
+    
+    def __init__(self, dependency_graph):
+        self._graph = dependency_graph
+    
+    def __contains__(self, name):
+        node_id = self._graph.names.get_id(name)
+        return node_id is not None and self._graph.is_expanded(node_id)
+    
+    def __iter__(self):
+        names = self._graph.names.names
+        for node_id in self._graph.expanded_ids():
+            yield names[node_id]
+    
+    def __len__(self):
+        return self._graph.expanded_count
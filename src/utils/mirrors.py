@@ -0,0 +1,541 @@
+import threading
+import time
+from .errors import NetworkError
+from .profiler import profiler
+
+class ConnectionPool:
+    """Постоянные соединения HTTP/1.1 (keep-alive), общие для всех зеркал процесса
+    
+    Соединение возвращается в пул, когда ответ прочитан до конца и сервер
+    не просил его закрыть. Если сервер закрыл простаивавшее соединение,
+    запрос повторяется на новом.
+    """
+    
+    # Сколько простаивающих соединений хранить на один хост
+    MAX_IDLE = 4
+    
+    def __init__(self):
+        self._idle = {}
+        self._lock = threading.Lock()
+    
+    def request(self, url, headers, timeout):
+        """Отправить GET-запрос; тело ответа читает вызывающий код"""
+        import http.client
+        from urllib.parse import urlsplit
+        
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        while True:
+            connection, reused = self._acquire(key, timeout)
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                connection.close()
+                if reused:
+                    # Сервер закрыл соединение, пока оно простаивало
+                    continue
+                raise
+            except BaseException:
+                connection.close()
+                raise
+            return PooledResponse(response, lambda: self._release(key, connection, response))
+    
+    def _acquire(self, key, timeout):
+        """Свободное соединение с хостом (или новое); возвращает (соединение, взято из пула)"""
+        with self._lock:
+            idle = self._idle.get(key)
+            connection = idle.pop() if idle else None
+        if connection is not None:
+            profiler.count('network.reused_connections')
+            connection.timeout = timeout
+            if connection.sock is not None:
+                connection.sock.settimeout(timeout)
+            return connection, True
+        
+        import http.client
+        profiler.count('network.connections')
+        scheme, host, port = key
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return connection_class(host, port, timeout=timeout), False
+    
+    def _release(self, key, connection, response):
+        """Вернуть соединение в пул, если ответ дочитан и соединение можно использовать снова"""
+        if not response.isclosed() or response.will_close:
+            response.close()
+            connection.close()
+            return
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.MAX_IDLE:
+                idle.append(connection)
+                return
+        connection.close()
+    
+    def close_all(self):
+        """Закрыть все простаивающие соединения"""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+class PooledResponse:
+    """Ответ сервера; при закрытии соединение возвращается в пул"""
+    
+    # Тело ответа с ошибкой дочитывается (чтобы сохранить соединение), если оно не больше
+    DISCARD_LIMIT = 64 * 1024
+    
+    def __init__(self, response, release=None):
+        self.response = response
+        self.status = getattr(response, 'status', None) or 200
+        self.headers = response.headers
+        self._release = release
+    
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return self.response.read()
+        return self.response.read(size)
+    
+    def discard(self):
+        """Пропустить тело ответа (ошибка, 304) и закрыть ответ"""
+        try:
+            # http.client знает длину тела (у 304 она нулевая)
+            length = getattr(self.response, 'length', None)
+            if length is not None and length <= self.DISCARD_LIMIT:
+                self.response.read()
+        except Exception:
+            pass
+        self.close()
+    
+    def close(self):
+        if self._release is not None:
+            release, self._release = self._release, None
+            release()
+        else:
+            self.response.close()
+
+
+# Соединения процесса: переиспользуются запросами всех репозиториев и обновлениями сервера
+connection_pool = ConnectionPool()
+
+
+class MirrorPool:
+    """Зеркала одного репозитория: гонка, переключение, повторы и докачка
+    
+    Запрос сначала отправляется на лучшее зеркало; если оно не ответило
+    за RACE_DELAY или ответило ошибкой, подключается следующее, и
+    побеждает первый успешный ответ. Зеркало, выигравшее гонку, становится
+    первым для следующих запросов, а отказавшие уходят в конец. Когда
+    все зеркала недоступны, попытка повторяется с экспоненциальной
+    задержкой. Ответы 404 и другие ошибки клиента не повторяются, а
+    таймауты - только если вызывающий код об этом просит.
+    """
+    
+    # Через сколько секунд без ответа подключать следующее зеркало
+    RACE_DELAY = 2.0
+    
+    # Коды ответа, при которых запрос стоит повторить позже
+    TRANSIENT_STATUSES = (408, 425, 429, 500, 502, 503, 504)
+    
+    # Переадресации, по которым идет запрос, и наибольшее их число подряд
+    REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+    MAX_REDIRECTS = 5
+    
+    def __init__(self, mirrors, retries=3, timeout=10, backoff=0.5, connections=None):
+        self.mirrors = [self.normalize(mirror) for mirror in mirrors]
+        self.retries = retries
+        self.timeout = timeout
+        self.backoff = backoff
+        self.connections = connections or connection_pool
+        self.failures = {mirror: 0 for mirror in self.mirrors}
+        self.preferred = None
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def parse(spec):
+        """Список зеркал из описания репозитория 'URL1|URL2|...' (первое - основное)"""
+        return [url.strip() for url in spec.split('|') if url.strip()]
+    
+    @staticmethod
+    def normalize(url):
+        """URL зеркала в том же виде, что и варианты URL APKINDEX (локальный путь - file://)"""
+        if '://' not in url:
+            import pathlib
+            url = pathlib.Path(url).resolve().as_uri()
+        return url if url.endswith('.tar.gz') else url.rstrip('/')
+    
+    def mirror_url(self, mirror, url):
+        """URL на зеркале mirror для URL основного зеркала"""
+        primary = self.mirrors[0]
+        if mirror == primary or not url.startswith(primary):
+            return url
+        return mirror + url[len(primary):]
+    
+    def ordered(self):
+        """Зеркала в порядке опроса: победитель прошлой гонки, затем по числу отказов"""
+        with self._lock:
+            return sorted(
+                self.mirrors,
+                key=lambda mirror: (mirror != self.preferred, self.failures[mirror], self.mirrors.index(mirror))
+            )
+    
+    def _record(self, mirror, success):
+        """Учесть результат запроса к зеркалу"""
+        with self._lock:
+            if success:
+                self.failures[mirror] = 0
+                self.preferred = mirror
+            else:
+                self.failures[mirror] += 1
+                if self.preferred == mirror:
+                    self.preferred = None
+    
+    def wait_backoff(self, attempt):
+        """Пауза перед повтором: backoff * 2^attempt со случайным разбросом"""
+        import random
+        delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.0)
+        profiler.count('network.retries')
+        with profiler.span('network.backoff'):
+            time.sleep(delay)
+    
+    def open(self, url, headers=None, retry_timeouts=True):
+        """Открыть url (в виде для основного зеркала) на одном из зеркал
+        
+        Возвращает словарь с ключами mirror (фактический URL), response
+        (ResumableResponse или None при ответе 304), etag, last_modified
+        и not_modified, либо None, если файл недоступен ни на одном зеркале.
+        retry_timeouts=False - не повторять раунд, если зеркала лишь не
+        ответили вовремя (при параллельном переборе вариантов URL каждый
+        повтор стоил бы еще одного таймаута на каждый вариант).
+        """
+        headers = dict(headers or {})
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.wait_backoff(attempt - 1)
+            winner, failures = self._race(url, headers)
+            if winner is not None:
+                return winner
+            if 'missing' in failures:
+                # Хотя бы одно доступное зеркало ответило окончательным отказом (например, 404)
+                return None
+            if not retry_timeouts and 'failed' not in failures:
+                return None
+        return None
+    
+    def _race(self, url, headers):
+        """Один раунд гонки зеркал
+        
+        Возвращает (победитель или None, множество исходов неудачных
+        попыток): повтор нужен, только если среди них нет 'missing'.
+        """
+        mirrors = self.ordered()
+        if len(mirrors) == 1:
+            outcome, result = self._attempt(mirrors[0], url, headers)
+            return (result, set()) if outcome == 'ok' else (None, {outcome})
+        
+        import queue
+        
+        results_queue = queue.Queue()
+        finished = threading.Event()
+        lock = threading.Lock()
+        
+        def attempt(mirror):
+            outcome = self._attempt(mirror, url, headers)
+            with lock:
+                if not finished.is_set():
+                    results_queue.put(outcome)
+                    return
+            # Гонку уже выиграло другое зеркало
+            self._close_result(outcome[1])
+        
+        started = 0
+        pending = 0
+        hedge = False
+        winner = None
+        failures = set()
+        while True:
+            if started < len(mirrors) and (pending == 0 or hedge):
+                if pending:
+                    profiler.count('network.hedged_requests')
+                threading.Thread(target=attempt, args=(mirrors[started],), daemon=True).start()
+                started += 1
+                pending += 1
+                hedge = False
+            
+            try:
+                outcome, result = results_queue.get(timeout=self.RACE_DELAY if started < len(mirrors) else None)
+            except queue.Empty:
+                # Зеркало не ответило вовремя - подключаем следующее, не отменяя первое
+                hedge = True
+                continue
+            
+            pending -= 1
+            if outcome == 'ok':
+                winner = result
+                break
+            failures.add(outcome)
+            if pending == 0 and started == len(mirrors):
+                break
+            # Отказ - следующее зеркало подключается сразу
+            hedge = True
+        
+        with lock:
+            finished.set()
+            while not results_queue.empty():
+                self._close_result(results_queue.get_nowait()[1])
+        return winner, failures
+    
+    @staticmethod
+    def _close_result(result):
+        """Закрыть ответ проигравшего зеркала"""
+        if result is not None and result['response'] is not None:
+            result['response'].close()
+    
+    def request(self, url, headers):
+        """Один запрос без повторов
+        
+        Переадресации 3xx выполняются (не больше MAX_REDIRECTS) на
+        соединениях пула хоста назначения. file:// и адреса, для которых в
+        окружении задан прокси (HTTP_PROXY, HTTPS_PROXY, NO_PROXY), читаются
+        через urllib.
+        """
+        from urllib.parse import urljoin
+        
+        redirects = 0
+        while True:
+            if self._needs_urllib(url):
+                return self._urlopen(url, headers)
+            response = self.connections.request(url, headers, self.timeout)
+            location = response.headers.get('Location')
+            if (response.status not in self.REDIRECT_STATUSES or not location or
+                    redirects >= self.MAX_REDIRECTS):
+                return response
+            response.discard()
+            profiler.count('network.redirects')
+            redirects += 1
+            url = urljoin(url, location)
+    
+    @staticmethod
+    def _needs_urllib(url):
+        """Адрес не для пула соединений: file://, другая схема или прокси из окружения"""
+        from urllib.parse import urlsplit
+        
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            return True
+        import urllib.request
+        return (parts.scheme in urllib.request.getproxies() and
+                not urllib.request.proxy_bypass(parts.hostname or ''))
+    
+    def _urlopen(self, url, headers):
+        """Запрос через urllib (прокси и переадресации обрабатывает он сам)"""
+        import urllib.error
+        import urllib.request
+        
+        try:
+            return PooledResponse(urllib.request.urlopen(
+                urllib.request.Request(url, headers=headers), timeout=self.timeout
+            ))
+        except urllib.error.HTTPError as e:
+            # Код ошибки (в том числе 304) разбирает вызывающий код, как у пула
+            return PooledResponse(e)
+        except urllib.error.URLError as e:
+            if isinstance(e.reason, TimeoutError):
+                raise e.reason
+            raise
+    
+    def _attempt(self, mirror, url, headers):
+        """Запрос к одному зеркалу
+        
+        Возвращает (исход, результат): исход 'ok' (результат - словарь
+        для open), 'missing' (окончательный отказ), 'timeout' (зеркало не
+        ответило за timeout) или 'failed' (временный отказ, стоит повторить).
+        """
+        target = self.mirror_url(mirror, url)
+        # Одна операция записи, чтобы строки параллельных попыток не смешивались
+        print(f"Попытка: {target}\n", end="")
+        profiler.count('network.requests')
+        try:
+            response = self.request(target, headers)
+        except Exception as e:
+            profiler.count('network.failed_requests')
+            if target.startswith('file:'):
+                return 'missing', None
+            self._record(mirror, False)
+            return ('timeout' if isinstance(e, TimeoutError) else 'failed'), None
+        
+        status = response.status
+        if status == 304:
+            profiler.count('network.not_modified')
+            response.discard()
+            self._record(mirror, True)
+            return 'ok', {
+                'mirror': target,
+                'response': None,
+                'etag': response.headers.get('ETag') or headers.get('If-None-Match'),
+                'last_modified': response.headers.get('Last-Modified') or headers.get('If-Modified-Since'),
+                'not_modified': True
+            }
+        if status != 200:
+            profiler.count('network.failed_requests')
+            response.discard()
+            if status in self.TRANSIENT_STATUSES:
+                self._record(mirror, False)
+                return 'failed', None
+            return 'missing', None
+        
+        self._record(mirror, True)
+        return 'ok', {
+            'mirror': target,
+            'response': ResumableResponse(self, mirror, url, response),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'not_modified': False
+        }
+
+
+class ResumableResponse:
+    """Поток тела ответа, который после обрыва докачивается запросами Range
+    
+    Докачка идет сначала с того же зеркала (If-Range с ETag гарантирует, что
+    файл не изменился), затем с остальных, если совпадают размер и
+    Last-Modified. Если сервер не поддерживает Range и отдал файл целиком,
+    уже полученная часть пропускается. Склейку дополнительно проверяет
+    контрольная сумма gzip при распаковке.
+    """
+    
+    CHUNK_SIZE = 64 * 1024
+    
+    def __init__(self, pool, mirror, url, response):
+        self.pool = pool
+        self.mirror = mirror
+        self.url = url
+        self.response = response
+        self.headers = response.headers
+        self.offset = 0
+        length = response.headers.get('Content-Length')
+        self.total = int(length) if length and length.isdigit() else None
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+        self.resumes = 0
+        
+        import http.client
+        self._read_errors = (OSError, http.client.HTTPException)
+    
+    def read(self, size=-1):
+        if size is None or size < 0:
+            chunks = []
+            while True:
+                chunk = self.read(self.CHUNK_SIZE)
+                if not chunk:
+                    return b"".join(chunks)
+                chunks.append(chunk)
+        
+        while True:
+            try:
+                data = self.response.read(size)
+            except self._read_errors as e:
+                self._resume(e)
+                continue
+            if not data and self.total is not None and self.offset < self.total:
+                # Сервер закрыл соединение раньше, чем передал файл целиком
+                self._resume(None)
+                continue
+            self.offset += len(data)
+            return data
+    
+    def _resume(self, error):
+        """Продолжить загрузку с текущего смещения на том же или другом зеркале"""
+        self.response.close()
+        if self.pool.mirror_url(self.mirror, self.url).startswith('file:'):
+            raise NetworkError(f"Ошибка чтения {self.url}: {error}")
+        
+        print(f"Предупреждение: загрузка {self.url} прервана на {self.offset}"
+              f"{f' из {self.total}' if self.total else ''} байт ({error or 'соединение закрыто'}), докачка\n", end="")
+        mirrors = [self.mirror] + [mirror for mirror in self.pool.ordered() if mirror != self.mirror]
+        for attempt in range(self.pool.retries + 1):
+            if attempt:
+                self.pool.wait_backoff(attempt - 1)
+            for mirror in mirrors:
+                if self._reopen(mirror):
+                    self.resumes += 1
+                    profiler.count('network.resumes')
+                    return
+        raise NetworkError(
+            f"Не удалось докачать {self.url} с {self.offset} байт ни с одного зеркала: {error or 'соединение закрыто'}"
+        )
+    
+    def _reopen(self, mirror):
+        """Запрос оставшейся части файла с зеркала; True при успехе"""
+        headers = {'Range': f"bytes={self.offset}-"}
+        validator = self.etag if mirror == self.mirror else None
+        validator = validator or self.last_modified
+        if validator:
+            headers['If-Range'] = validator
+        
+        target = self.pool.mirror_url(mirror, self.url)
+        profiler.count('network.requests')
+        try:
+            response = self.pool.request(target, headers)
+        except Exception:
+            profiler.count('network.failed_requests')
+            self.pool._record(mirror, False)
+            return False
+        
+        if response.status == 206 and self._range_matches(response):
+            self.response = response
+            self.mirror = mirror
+            return True
+        if response.status == 200 and self._same_file(mirror, response):
+            # Range не поддерживается - пропускаем уже полученное
+            try:
+                remaining = self.offset
+                while remaining:
+                    skipped = response.read(min(remaining, self.CHUNK_SIZE))
+                    if not skipped:
+                        raise EOFError
+                    remaining -= len(skipped)
+            except Exception:
+                response.close()
+                return False
+            self.response = response
+            self.mirror = mirror
+            return True
+        
+        profiler.count('network.failed_requests')
+        response.discard()
+        if response.status in MirrorPool.TRANSIENT_STATUSES:
+            self.pool._record(mirror, False)
+        return False
+    
+    def _range_matches(self, response):
+        """Ответ 206 начинается с текущего смещения и относится к файлу того же размера"""
+        content_range = response.headers.get('Content-Range', '')
+        unit, _, spec = content_range.partition(' ')
+        span, _, total = spec.partition('/')
+        start = span.partition('-')[0]
+        if unit != 'bytes' or not start.isdigit() or int(start) != self.offset:
+            return False
+        return self.total is None or not total.isdigit() or int(total) == self.total
+    
+    def _same_file(self, mirror, response):
+        """Полный ответ содержит тот же файл, что и начатая загрузка"""
+        length = response.headers.get('Content-Length')
+        if self.total is not None and length != str(self.total):
+            return False
+        if mirror == self.mirror and self.etag:
+            return response.headers.get('ETag') == self.etag
+        return bool(self.last_modified) and response.headers.get('Last-Modified') == self.last_modified
+    
+    def close(self):
+        self.response.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
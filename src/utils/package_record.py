@@ -0,0 +1,154 @@
+import re
+
+# Имя зависимости, оператор сравнения версий и версия: 'musl>=1.2', 'so:libc.musl-x86_64.so.1'
+_DEPENDENCY_PATTERN = re.compile(r'([^=<>~]*)([=<>~]*)(.*)')
+
+class PackageRecord:
+    """Запись пакета APKINDEX в компактном виде
+    
+    Вместо словаря полей хранятся только нужные графу данные в слотах.
+    Имена интернированы (одно имя - один объект на все записи индекса), а
+    зависимости разобраны при чтении индекса в кортежи (имя, оператор,
+    версия): обращения к записи строк не разбирают. Одинаковые зависимости
+    разных пакетов ссылаются на один кортеж.
+    """
+    
+    __slots__ = ('name', 'origin', 'priority', 'dependencies', 'conflicts', 'provides', 'repository')
+    
+    def __init__(self, name, origin=None, priority=0, dependencies=(), conflicts=(), provides=(), repository=None):
+        self.name = name
+        self.origin = origin
+        self.priority = priority            # k: - приоритет провайдера виртуального имени
+        self.dependencies = dependencies    # D: без конфликтов - кортежи (имя, оператор, версия)
+        self.conflicts = conflicts          # D: с '!' - в том же виде, имя без '!'
+        self.provides = provides            # p: - виртуальные имена без версий
+        self.repository = repository
+    
+    def __repr__(self):
+        return f"PackageRecord({self.name!r})"
+    
+    def fingerprint(self):
+        """Все, что влияет на граф: по отпечатку сравниваются версии индекса"""
+        return (self.dependencies, self.conflicts, self.provides, self.priority)
+    
+    @classmethod
+    def from_fields(cls, fields, table):
+        """Запись из полей APKINDEX (ключ - буква поля); table - RecordTable индекса"""
+        dependencies = ()
+        conflicts = ()
+        dependency_string = fields.get('D')
+        if dependency_string:
+            # Повторная зависимость без версии находится одним обращением к таблице
+            known = table.dependencies
+            dependencies = []
+            for token in dependency_string.split():
+                dependency = known.get(token)
+                if dependency is None:
+                    if token[0] == '!':
+                        dependency = table.dependency(token[1:])
+                        if dependency[0]:
+                            conflicts += (dependency,)
+                        continue
+                    dependency = table.dependency(token)
+                    if not dependency[0]:
+                        continue
+                dependencies.append(dependency)
+            dependencies = tuple(dependencies)
+        
+        intern = table.names.setdefault
+        name = fields['P']
+        origin = fields.get('o')
+        provides = fields.get('p')
+        return cls(
+            intern(name, name),
+            intern(origin, origin) if origin else None,
+            cls.parse_priority(fields.get('k')) if 'k' in fields else 0,
+            dependencies,
+            conflicts,
+            cls.parse_provides(provides, table) if provides else (),
+        )
+    
+    @staticmethod
+    def parse_provides(provides_str, table):
+        """Имена из поля p: (so:, cmd:, pc: и т.д.) без версий"""
+        intern = table.names.setdefault
+        names = []
+        for item in provides_str.split():
+            name = item.partition('=')[0]
+            if name:
+                names.append(intern(name, name))
+        return tuple(names)
+    
+    @staticmethod
+    def parse_priority(value):
+        """Приоритет провайдера из поля k: (0, если поле отсутствует или некорректно)"""
+        if not value:
+            return 0
+        try:
+            return int(value)
+        except ValueError:
+            return 0
+    
+    def to_list(self):
+        """Запись для сохранения в JSON (без репозитория - его задает индекс)"""
+        return [self.name, self.origin, self.priority,
+                self.dependencies, self.conflicts, self.provides]
+    
+    @classmethod
+    def from_list(cls, data, table):
+        """Запись, сохраненная to_list"""
+        name, origin, priority, dependencies, conflicts, provides = data
+        return cls(
+            table.name(name),
+            table.name(origin) if origin else None,
+            priority,
+            tuple(table.dependency_parts(*dependency) for dependency in dependencies),
+            tuple(table.dependency_parts(*dependency) for dependency in conflicts),
+            tuple(map(table.name, provides)),
+        )
+
+
+class RecordTable:
+    """Таблица интернирования на время разбора одного индекса
+    
+    Одинаковые имена и зависимости всех записей становятся общими объектами,
+    а повторяющаяся строка зависимости разбирается один раз. В отличие от
+    sys.intern, таблица освобождается вместе с разбором и не занимает память
+    после загрузки индекса.
+    """
+    
+    def __init__(self):
+        self.names = {}
+        self.dependencies = {}
+    
+    def name(self, value):
+        """Общий объект строки"""
+        return self.names.setdefault(value, value)
+    
+    def dependency(self, token):
+        """Кортеж (имя, оператор, версия) для строки зависимости без '!'"""
+        if '=' in token or '<' in token or '>' in token or '~' in token:
+            return self.dependency_parts(*_DEPENDENCY_PATTERN.match(token).groups())
+        return self.dependency_parts(token, '', '')
+    
+    def dependency_parts(self, name, operator, version):
+        """Общий кортеж зависимости по ее частям
+        
+        Зависимость без версии ищется по имени, с версией - по кортежу.
+        Ключом сохраняется уже общий объект, поэтому таблица не удерживает
+        исходных строк и временных кортежей.
+        """
+        dependencies = self.dependencies
+        if not operator and not version:
+            dependency = dependencies.get(name)
+            if dependency is None:
+                name = self.names.setdefault(name, name)
+                dependency = dependencies[name] = (name, '', '')
+            return dependency
+        
+        dependency = dependencies.get((name, operator, version))
+        if dependency is None:
+            intern = self.names.setdefault
+            dependency = (intern(name, name), intern(operator, operator), intern(version, version))
+            dependencies[dependency] = dependency
+        return dependency
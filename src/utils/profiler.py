@@ -0,0 +1,225 @@
+import functools
+import io
+import json
+import sys
+import threading
+import time
+
+class Profiler:
+    """Замеры фаз выполнения: интервалы времени, счетчики и пиковая память
+    
+    Выключенный профилировщик ничего не измеряет: span возвращает общий
+    пустой контекст, а count сразу выходит, поэтому инструментирование
+    стоит одного вызова метода. Счетчики обходов графа добавляются одним
+    вызовом по итогам фазы, а не на каждый узел.
+    
+    Для каждого интервала считается полное время и собственное (без
+    вложенных интервалов того же потока): так время распаковки не
+    включает время чтения из сети, а разбор - время распаковки.
+    """
+    
+    def __init__(self):
+        self.enabled = False
+        self.spans = {}       # имя -> [вызовов, полное время, собственное время, максимум]
+        self.counters = {}
+        self.listeners = []
+        self.started_at = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+    
+    def enable(self):
+        """Включить сбор (данные предыдущего сбора сбрасываются)"""
+        self.reset()
+        self.started_at = time.perf_counter()
+        self.enabled = True
+    
+    def disable(self):
+        """Выключить сбор; накопленные данные сохраняются до reset"""
+        self.enabled = False
+    
+    def reset(self):
+        """Сбросить накопленные интервалы и счетчики"""
+        with self._lock:
+            self.spans = {}
+            self.counters = {}
+    
+    def add_listener(self, callback):
+        """Подписаться на события: callback(kind, name, value)
+        
+        kind - 'span' (value - длительность в секундах) или 'counter'
+        (value - приращение). Вызывается в потоке, где произошло событие,
+        только пока сбор включен.
+        """
+        self.listeners.append(callback)
+    
+    def remove_listener(self, callback):
+        """Отписаться от событий"""
+        self.listeners.remove(callback)
+    
+    def span(self, name):
+        """Контекст замера времени фазы"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+    
+    def timed(self, name):
+        """Декоратор: каждый вызов функции замеряется как интервал name
+        
+        Подходит для крупных фаз: при выключенном сборе добавляет один
+        вызов функции-обертки.
+        """
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with _Span(self, name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+    
+    def count(self, name, value=1):
+        """Увеличить счетчик"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        for listener in self.listeners:
+            listener('counter', name, value)
+    
+    def wrap_stream(self, stream, span_name, counter=None):
+        """Поток, чтения из которого замеряются как интервал span_name
+        
+        Чтение идет блоками через буфер, поэтому замер делается на блок,
+        а не на строку. Прочитанные байты добавляются к счетчику counter.
+        Выключенный профилировщик возвращает поток без изменений.
+        """
+        if not self.enabled:
+            return stream
+        return io.BufferedReader(_ProfiledStream(self, stream, span_name, counter), 64 * 1024)
+    
+    def _finish_span(self, name, elapsed, own):
+        """Учесть завершенный интервал"""
+        with self._lock:
+            entry = self.spans.get(name)
+            if entry is None:
+                self.spans[name] = [1, elapsed, own, elapsed]
+            else:
+                entry[0] += 1
+                entry[1] += elapsed
+                entry[2] += own
+                if elapsed > entry[3]:
+                    entry[3] = elapsed
+        for listener in self.listeners:
+            listener('span', name, elapsed)
+    
+    def _stack(self):
+        """Стек открытых интервалов текущего потока"""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+    
+    @staticmethod
+    def peak_rss_kb():
+        """Пиковый размер резидентной памяти процесса в КБ (None, если недоступен)"""
+        try:
+            import resource
+        except ImportError:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # В macOS значение в байтах, в Linux - в килобайтах
+        return peak // 1024 if sys.platform == 'darwin' else peak
+    
+    def report(self):
+        """Собранные данные в виде словаря (для JSON)"""
+        with self._lock:
+            spans = {
+                name: {
+                    'calls': calls,
+                    'total': round(total, 6),
+                    'self': round(own, 6),
+                    'max': round(longest, 6),
+                }
+                for name, (calls, total, own, longest) in sorted(self.spans.items())
+            }
+            counters = dict(sorted(self.counters.items()))
+        
+        return {
+            'wall_time': round(time.perf_counter() - self.started_at, 6) if self.started_at else None,
+            'peak_rss_kb': self.peak_rss_kb(),
+            'spans': spans,
+            'counters': counters,
+        }
+    
+    def write_report(self, path='-'):
+        """Записать отчет в JSON ('-' - стандартный поток ошибок)"""
+        data = json.dumps(self.report(), ensure_ascii=False, indent=2)
+        if path == '-':
+            print(data, file=sys.stderr)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(data + "\n")
+
+
+class _Span:
+    """Открытый интервал замера"""
+    
+    __slots__ = ('profiler', 'name', 'started', 'children')
+    
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+    
+    def __enter__(self):
+        self.children = 0.0
+        self.profiler._stack().append(self)
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.perf_counter() - self.started
+        stack = self.profiler._stack()
+        stack.pop()
+        if stack:
+            stack[-1].children += elapsed
+        self.profiler._finish_span(self.name, elapsed, elapsed - self.children)
+        return False
+
+
+class _NullSpan:
+    """Пустой интервал для выключенного профилировщика"""
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _ProfiledStream(io.RawIOBase):
+    """Источник байтов, каждое чтение из которого замеряется"""
+    
+    def __init__(self, profiler, stream, span_name, counter):
+        self.profiler = profiler
+        self.stream = stream
+        self.span_name = span_name
+        self.counter = counter
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        with self.profiler.span(self.span_name):
+            data = self.stream.read(len(buffer))
+        buffer[:len(data)] = data
+        if self.counter:
+            self.profiler.count(self.counter, len(data))
+        return len(data)
+
+
+# Общий профилировщик процесса (по умолчанию выключен)
+profiler = Profiler()
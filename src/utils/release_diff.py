@@ -0,0 +1,124 @@
+from .dependency_graph import DependencyGraph
+from .errors import ClosureMemoryError
+from .graph_algorithms import GraphAlgorithms
+from .graph_storage import NameTable
+
+class ReleaseDiff:
+    """Изменения транзитивных замыканий всех пакетов между двумя версиями репозитория
+    
+    Оба графа строятся по всему индексу с общей таблицей имен, поэтому ID
+    пакетов в них совпадают. Пакеты, у которых совпали отпечатки замыканий
+    (дерево Меркла по DAG компонент), пропускаются без обхода; замыкания
+    сравниваются только у остальных.
+    """
+    
+    def __init__(self, old_manager, new_manager, closure_memory_limit=None):
+        self.names = NameTable()
+        self.old_graph = DependencyGraph(
+            old_manager, names=self.names, closure_memory_limit=closure_memory_limit
+        )
+        self.new_graph = DependencyGraph(
+            new_manager, names=self.names, closure_memory_limit=closure_memory_limit
+        )
+        self.stats = {}
+    
+    def compare(self, packages=None):
+        """Построить оба графа и сравнить замыкания пакетов
+        
+        packages - ограничить отчет этими пакетами (по умолчанию все пакеты
+        обеих версий). Возвращает записи об изменившихся пакетах по имени:
+        {'package', 'status' ('added', 'removed', 'changed'), 'added',
+        'removed', 'new_cycles'}; статистика сохраняется в self.stats.
+        """
+        old_graph, new_graph = self.old_graph, self.new_graph
+        old_graph.build_full_graph()
+        new_graph.build_full_graph()
+        for graph in (old_graph, new_graph):
+            try:
+                graph.get_closure_index()
+            except ClosureMemoryError:
+                # Замыкания не помещаются в лимит - считаются обходом графа
+                pass
+        
+        old_condensation = old_graph.get_condensation()
+        new_condensation = new_graph.get_condensation()
+        old_fingerprints = GraphAlgorithms.closure_fingerprints(old_condensation)
+        new_fingerprints = GraphAlgorithms.closure_fingerprints(new_condensation)
+        new_cycles, cycle_of, resolved_cycles = self._compare_cycles()
+        
+        if packages is None:
+            candidates = set(old_graph.expanded_ids()) | set(new_graph.expanded_ids())
+        else:
+            candidates = {node_id for node_id in map(self.names.get_id, packages) if node_id is not None}
+        
+        records = []
+        skipped = 0
+        for node_id in sorted(candidates, key=self.names.name):
+            in_old = old_graph.is_expanded(node_id)
+            in_new = new_graph.is_expanded(node_id)
+            if not in_old and not in_new:
+                continue
+            if in_old and in_new and (old_fingerprints[old_condensation.component_of[node_id]] ==
+                                      new_fingerprints[new_condensation.component_of[node_id]]):
+                skipped += 1
+                continue
+            
+            old_closure = set(old_graph.closure_ids(node_id)) if in_old else set()
+            new_closure = set(new_graph.closure_ids(node_id)) if in_new else set()
+            cycles = sorted({cycle_of[member] for member in new_closure | {node_id} if member in cycle_of})
+            added = new_closure - old_closure
+            removed = old_closure - new_closure
+            if in_old and in_new and not added and not removed and not cycles:
+                # Изменилась только структура ребер внутри замыкания
+                continue
+            
+            records.append({
+                'package': self.names.name(node_id),
+                'status': 'changed' if in_old and in_new else 'added' if in_new else 'removed',
+                'added': sorted(old_graph.names_of(added)),
+                'removed': sorted(old_graph.names_of(removed)),
+                'new_cycles': [new_cycles[index] for index in cycles],
+            })
+        
+        self.stats = {
+            'old_packages': len(old_graph.graph),
+            'new_packages': len(new_graph.graph),
+            'compared': len(candidates),
+            'skipped_by_fingerprint': skipped,
+            'added': sum(record['status'] == 'added' for record in records),
+            'removed': sum(record['status'] == 'removed' for record in records),
+            'changed': sum(record['status'] == 'changed' for record in records),
+            'new_cycles': len(new_cycles),
+            'resolved_cycles': resolved_cycles,
+        }
+        return records
+    
+    def _compare_cycles(self):
+        """Циклы новой версии, которых не было в старой
+        
+        Цикл сравнивается по составу компоненты сильной связности.
+        Возвращает (циклы - списки имен, ID узла -> номер цикла,
+        количество исчезнувших циклов).
+        """
+        old_cycles = {frozenset(members) for members in self._cyclic_components(self.old_graph)}
+        new_components = self._cyclic_components(self.new_graph)
+        current = {frozenset(members) for members in new_components}
+        
+        new_cycles = []
+        cycle_of = {}
+        for members in new_components:
+            if frozenset(members) in old_cycles:
+                continue
+            for node_id in members:
+                cycle_of[node_id] = len(new_cycles)
+            new_cycles.append(sorted(self.new_graph.names_of(members)))
+        return new_cycles, cycle_of, len(old_cycles - current)
+    
+    @staticmethod
+    def _cyclic_components(graph):
+        """Циклические компоненты графа (массивы ID узлов)"""
+        condensation = graph.get_condensation()
+        return [
+            members for component_id, members in enumerate(condensation.components)
+            if condensation.is_cyclic(component_id, graph.adjacency)
+        ]
@@ -0,0 +1,60 @@
+import json
+
+class ReportWriter:
+    """Машиночитаемый вывод результатов (JSON Lines или TSV) одной записью в поток
+    
+    Записи накапливаются в памяти и выводятся одной операцией записи в
+    flush, поэтому вывод большого замыкания не упирается в построчный
+    вывод в терминал. В JSON каждая запись - одна строка; в TSV первое
+    поле строки - имя поля записи, остальные - значения:
+        
+        dependencies<TAB>musl
+        stats<TAB>transitive<TAB>12
+        cycles<TAB>a b
+    """
+    
+    FORMATS = ('json', 'tsv')
+    
+    def __init__(self, stream, output_format):
+        self.stream = stream
+        self.output_format = output_format
+        self._lines = []
+    
+    def write(self, record):
+        """Добавить запись (словарь) в вывод"""
+        if self.output_format == 'json':
+            self._lines.append(json.dumps(record, ensure_ascii=False))
+            return
+        
+        for key, value in record.items():
+            if isinstance(value, dict):
+                for name, item in value.items():
+                    self._row(key, name, item)
+            elif isinstance(value, list):
+                for item in value:
+                    self._row(key, item)
+            else:
+                self._row(key, value)
+    
+    def _row(self, *fields):
+        """Строка TSV"""
+        self._lines.append("\t".join(map(self._scalar, fields)))
+    
+    @staticmethod
+    def _scalar(value):
+        """Значение поля TSV (None - пустая строка, списки - через пробел)"""
+        if value is None:
+            return ""
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        if isinstance(value, list):
+            return " ".join(map(ReportWriter._scalar, value))
+        return str(value).replace("\t", " ").replace("\n", " ")
+    
+    def flush(self):
+        """Записать накопленные записи в поток"""
+        if self._lines:
+            self._lines.append("")
+            self.stream.write("\n".join(self._lines))
+            self._lines.clear()
+        self.stream.flush()
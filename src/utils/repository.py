@@ -1,26 +1,101 @@
-import urllib.request
-import urllib.error
+import time
 from .errors import RepositoryError, PackageNotFoundError
-from .apk_parser import APKParser
+from .cache import IndexCache
+from .repository_index import RepositoryIndex
+from .mirrors import MirrorPool
+from .profiler import profiler
 
 class RepositoryManager:
-    def __init__(self, repository_url=None, test_mode=False, test_repo_path=None):
-        self.repository_url = repository_url
+    def __init__(self, repository_url=None, test_mode=False, test_repo_path=None,
+                 cache_dir=None, cache_ttl=3600, offline=False, arch=None, repository_urls=None,
+                 retries=3, timeout=10):
+        # Репозитории в порядке приоритета (первый - самый приоритетный);
+        # зеркала одного репозитория перечисляются через '|': 'URL1|URL2'
+        mirror_lists = [
+            MirrorPool.parse(spec) for spec in (repository_urls or ([repository_url] if repository_url else []))
+        ]
+        self.repository_urls = [mirrors[0] for mirrors in mirror_lists]
+        self.repository_url = self.repository_urls[0] if self.repository_urls else None
         self.test_mode = test_mode
         self.test_repo_path = test_repo_path
         self.packages_cache = {}
+        
+        # Кэш APKINDEX на диске (необязательный)
+        self.index_cache = IndexCache(cache_dir, cache_ttl) if cache_dir else None
+        self.offline = offline
+        self.arch = arch
+        self.indexes = [
+            RepositoryIndex(mirrors[0], self.index_cache, offline, arch,
+                            MirrorPool(mirrors, retries=retries, timeout=timeout))
+            for mirrors in mirror_lists
+        ]
+        
+        # Объединенный APKINDEX всех репозиториев и индекс виртуальных имен
+        self.apk_index = None
+        self.provides = None
+        
+        # Индекс тестового репозитория (имя пакета -> зависимости)
+        self.test_index = None
+        
+        # Счетчики обращений к индексу
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.index_load_time = 0.0
     
     def get_package_dependencies(self, package_name):
         """Получить прямые зависимости пакета"""
-        if self.test_mode:
-            return self._get_dependencies_from_test_file(package_name)
-        else:
-            return self._get_dependencies_from_apk_index(package_name)
+        profiler.count('repository.lookups')
+        try:
+            if self.test_mode:
+                return self._get_dependencies_from_test_file(package_name)
+            else:
+                return self._get_dependencies_from_apk_index(package_name)
+        except Exception:
+            profiler.count('repository.failed_lookups')
+            raise
     
-    def _get_dependencies_from_test_file(self, package_name):
-        """Получить зависимости из тестового файла"""
+    @property
+    def index_loads(self):
+        """Количество загрузок APKINDEX за запуск (по всем репозиториям)"""
+        return sum(index.loads for index in self.indexes)
+    
+    def get_cache_stats(self):
+        """Получить статистику обращений к индексу"""
+        return {
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'index_loads': self.index_loads,
+            'index_load_time': self.index_load_time + sum(index.load_time for index in self.indexes),
+            'index_source': ', '.join(str(index.index_source) for index in self.indexes),
+            'arch': ', '.join(str(index.resolved_arch) for index in self.indexes),
+            'indexed_packages': sum(len(index.records) for index in self.indexes if index.records is not None),
+            'repositories': [
+                {
+                    'url': index.repository_url,
+                    'source': index.index_source,
+                    'arch': index.resolved_arch,
+                    'mirror': index.mirror_url,
+                    'packages': len(index.records) if index.records is not None else 0,
+                    'load_time': index.load_time
+                }
+                for index in self.indexes
+            ]
+        }
+    
+    def load_test_index(self):
+        """Загрузить тестовый репозиторий в хеш-индекс (выполняется один раз)"""
+        if self.test_index is not None:
+            return self.test_index
+        
+        index = {}
         try:
-            with open(self.test_repo_path, 'r', encoding='utf-8') as file:
+            if self.test_repo_path.endswith('.gz'):
+                import gzip
+                file = gzip.open(self.test_repo_path, 'rt', encoding='utf-8')
+            else:
+                file = open(self.test_repo_path, 'r', encoding='utf-8')
+            
+            with file, profiler.span('repository.load_test_index'):
                 for line in file:
                     line = line.strip()
                     if not line or ':' not in line:
@@ -29,40 +104,230 @@ class RepositoryManager:
                     current_package, dependencies_str = line.split(':', 1)
                     current_package = current_package.strip()
                     
-                    if current_package == package_name:
-                        dependencies = [dep.strip() for dep in dependencies_str.split() if dep.strip()]
-                        return dependencies
-            
-            raise PackageNotFoundError(f"Пакет '{package_name}' не найден в тестовом репозитории")
+                    # Как и при построчном поиске, действует первое вхождение пакета
+                    if current_package not in index:
+                        index[current_package] = dependencies_str.split()
             
         except FileNotFoundError:
             raise RepositoryError(f"Тестовый файл '{self.test_repo_path}' не найден")
         except Exception as e:
             raise RepositoryError(f"Ошибка чтения тестового файла: {e}")
+        
+        self.test_index = index
+        return self.test_index
+    
+    def _get_dependencies_from_test_file(self, package_name):
+        """Получить зависимости из тестового файла"""
+        index = self.load_test_index()
+        
+        dependencies = index.get(package_name)
+        if dependencies is None:
+            raise PackageNotFoundError(
+                f"Пакет '{package_name}' не найден в тестовом репозитории '{self.test_repo_path}'"
+            )
+        
+        return list(dependencies)
+    
+    def load_apk_index(self):
+        """Загрузить APKINDEX всех репозиториев и объединить их в один индекс
+        
+        Индексы загружаются параллельно, затем объединяются в порядке
+        приоритета: пакет берется из первого репозитория, где он есть.
+        """
+        if len(self.indexes) == 1:
+            self.apk_index = self.indexes[0].load()
+            self.provides = self.indexes[0].provides
+            return self.apk_index
+        if self.apk_index is not None:
+            return self.apk_index
+        
+        start_time = time.perf_counter()
+        pending = [index for index in self.indexes if not index.is_loaded()]
+        errors = {}
+        if pending:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                futures = {index.repository_url: executor.submit(index.load) for index in pending}
+                for url, future in futures.items():
+                    try:
+                        future.result()
+                    except Exception as e:
+                        errors[url] = e
+        
+        for url, error in errors.items():
+            print(f"Предупреждение: не удалось загрузить индекс репозитория '{url}': {error}")
+        if len(errors) == len(self.indexes):
+            raise RepositoryError("Не удалось загрузить APKINDEX ни одного репозитория")
+        
+        loaded = [index for index in self.indexes if index.repository_url not in errors]
+        merged = {}
+        for index in loaded:
+            for name, record in index.records.items():
+                if name not in merged:
+                    merged[name] = record
+        
+        # Провайдеры виртуальных имен: больший k:, затем порядок репозиториев
+        merged_provides = {}
+        for index in loaded:
+            for virtual_name, providers in index.provides.items():
+                for name in providers:
+                    record = merged[name]
+                    if record is not index.records[name]:
+                        continue  # пакет перекрыт более приоритетным репозиторием
+                    current = merged_provides.get(virtual_name)
+                    if current is None:
+                        merged_provides[virtual_name] = [name]
+                    elif record.priority > merged[current[0]].priority:
+                        current.insert(0, name)
+                    else:
+                        current.append(name)
+        
+        self.apk_index = merged
+        self.provides = merged_provides
+        self.index_load_time += time.perf_counter() - start_time
+        return self.apk_index
+    
+    def _find_package_record(self, package_name):
+        """Найти запись пакета (или провайдера виртуального имени) с учетом приоритета репозиториев"""
+        if not self.indexes:
+            raise RepositoryError("Не указан ни один репозиторий")
+        if len(self.indexes) == 1:
+            # Один репозиторий читается лениво, только до нужного пакета
+            return self.indexes[0].find(package_name)
+        
+        packages = self.load_apk_index()
+        record = packages.get(package_name)
+        if record is None:
+            providers = self.provides.get(package_name)
+            if providers:
+                record = packages[providers[0]]
+        return record
+        
+    def _is_in_memory(self, package_name):
+        """Запись пакета уже загружена в память"""
+        if len(self.indexes) == 1:
+            index = self.indexes[0]
+            if index.records is None:
+                return False
+            return package_name in index.records or (index.is_loaded() and package_name in index.provides)
+        return self.apk_index is not None and (package_name in self.apk_index or package_name in self.provides)
+    
+    def resolve_package_name(self, package_name):
+        """Разрешить имя (в том числе виртуальное so:/cmd:/pc:) в имя реального пакета"""
+        if self.test_mode:
+            return package_name
+        record = self._find_package_record(package_name)
+        return record.name if record is not None else None
+    
+    def get_providers(self, virtual_name):
+        """Все пакеты, предоставляющие виртуальное имя (основной провайдер первый)"""
+        self.load_apk_index()
+        return list(self.provides.get(virtual_name, []))
+        
+    def get_package_repository(self, package_name):
+        """Репозиторий, из которого взят пакет (None, если пакет не загружен)"""
+        if self.test_mode:
+            return self.test_repo_path if self.test_index and package_name in self.test_index else None
+        if not self._is_in_memory(package_name):
+            return None
+        return self._find_package_record(package_name).repository
+    
+    def _clean_dependencies(self, package_info):
+        """Имена зависимостей записи с виртуальными именами, разрешенными в провайдеров
+        
+        Зависимости уже разобраны при чтении индекса (без версий и конфликтов),
+        поэтому здесь остается только разрешение имен.
+        """
+        clean_dependencies = []
+        for name, _, _ in package_info.dependencies:
+            provider = self._find_package_record(name)
+            if provider is not None:
+                name = provider.name
+            if name != package_info.name and name not in clean_dependencies:
+                clean_dependencies.append(name)
+        
+        return clean_dependencies
+    
+    def iter_package_dependencies(self):
+        """Все пакеты репозитория с прямыми зависимостями (один проход по индексу)"""
+        if self.test_mode:
+            for package_name, dependencies in self.load_test_index().items():
+                yield package_name, list(dependencies)
+            return
+        
+        for package_name, package_info in self.load_apk_index().items():
+            yield package_name, self._clean_dependencies(package_info)
+    
+    def package_fingerprints(self):
+        """Отпечаток каждого пакета: разобранные зависимости, конфликты, p: и k: записи"""
+        if self.test_mode:
+            return {name: tuple(dependencies) for name, dependencies in self.load_test_index().items()}
+        return {name: record.fingerprint() for name, record in self.load_apk_index().items()}
+    
+    def diff_dependencies(self, previous):
+        """Изменения прямых зависимостей относительно индекса менеджера previous
+        
+        Возвращает словарь имя -> новый список зависимостей (None - пакет
+        удален). Сравниваются отпечатки записей, поэтому зависимости
+        разбираются только у изменившихся пакетов. Если при этом сменился
+        провайдер какого-либо имени (so:, cmd:, ... или имя самого пакета),
+        разрешенные зависимости сравниваются у всех пакетов.
+        """
+        old = previous.package_fingerprints()
+        new = self.package_fingerprints()
+        changed = [name for name, fingerprint in new.items() if name not in old or old[name] != fingerprint]
+        removed = [name for name in old if name not in new]
+        
+        compare_all = False
+        if not self.test_mode and (changed or removed):
+            touched = set(removed) | {name for name in changed if name not in old}
+            for name in changed + removed:
+                for manager in (previous, self):
+                    record = manager.load_apk_index().get(name)
+                    if record is not None:
+                        touched.update(record.provides)
+            compare_all = any(
+                previous.resolve_package_name(name) != self.resolve_package_name(name) for name in touched
+            )
+        
+        changes = {}
+        for name in (new if compare_all else changed):
+            dependencies = self.get_package_dependencies(name)
+            if compare_all and name in old and previous.get_package_dependencies(name) == dependencies:
+                continue
+            changes[name] = dependencies
+        for name in removed:
+            changes[name] = None
+        return changes
     
     def _get_dependencies_from_apk_index(self, package_name):
         """Получить зависимости из APK индекса Alpine Linux"""
+        # Повторные обращения обслуживаются из памяти
+        if package_name in self.packages_cache:
+            self.cache_hits += 1
+            profiler.count('repository.cache_hits')
+            return list(self.packages_cache[package_name])
+        
+        if self._is_in_memory(package_name):
+            self.cache_hits += 1
+            profiler.count('repository.cache_hits')
+        else:
+            self.cache_misses += 1
+            profiler.count('repository.cache_misses')
+        
         try:
-            # Используем улучшенный парсер
-            index_content = APKParser.download_apkindex(self.repository_url)
-            packages = APKParser.parse_apkindex_content(index_content)
-            
-            if package_name not in packages:
-                raise PackageNotFoundError(f"Пакет '{package_name}' не найден в репозитории")
-            
-            package_info = packages[package_name]
-            dependencies = package_info.get('D', '').split()
+            package_info = self._find_package_record(package_name)
             
-            # Очищаем зависимости
-            clean_dependencies = []
-            for dep in dependencies:
-                clean_dep = dep.split('=')[0].split('<')[0].split('>')[0].split('~')[0]
-                if not clean_dep.startswith('!') and clean_dep:
-                    clean_dependencies.append(clean_dep)
+            if package_info is None:
+                raise PackageNotFoundError(
+                    f"Пакет '{package_name}' не найден в репозиториях: {', '.join(self.repository_urls)}"
+                )
             
-            return clean_dependencies
+            clean_dependencies = self._clean_dependencies(package_info)
+            self.packages_cache[package_name] = clean_dependencies
+            return list(clean_dependencies)
             
-        except urllib.error.URLError as e:
-            raise RepositoryError(f"Ошибка сети: {e}")
+        except (RepositoryError, PackageNotFoundError):
+            raise
         except Exception as e:
             raise RepositoryError(f"Ошибка при получении зависимостей: {e}")
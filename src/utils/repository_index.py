@@ -0,0 +1,233 @@
+import time
+from .errors import RepositoryError
+from .apk_parser import APKParser
+from .cache import IndexCache, TeeReader
+from .mirrors import MirrorPool
+from .profiler import profiler
+
+class RepositoryIndex:
+    """APKINDEX одного репозитория: загрузка (сеть или кэш) и ленивый поиск записей"""
+    
+    def __init__(self, repository_url, index_cache=None, offline=False, arch=None, mirrors=None):
+        self.repository_url = repository_url
+        self.index_cache = index_cache
+        self.offline = offline
+        self.index_source = None
+        
+        # Зеркала репозитория; первое (repository_url) задает ключ кэша.
+        # mirror_url - адрес, по которому индекс получен с другого зеркала
+        self.mirrors = mirrors or MirrorPool([repository_url])
+        self.mirror_url = None
+        
+        # Явно заданная архитектура отключает перебор вариантов URL
+        self.arch = arch
+        self.resolved_arch = None
+        
+        # Разобранные записи (имя пакета -> запись) и недочитанный поток.
+        # Поток, который одновременно сохраняется в кэш, читается до конца
+        # даже при поиске одного пакета: иначе запись в кэш не появится
+        self.records = None
+        self._index_stream = None
+        self._stream_stores = False
+        
+        # Виртуальное имя -> провайдеры; первый в списке выбирается при разрешении
+        self.provides = None
+        
+        self.loads = 0
+        self.load_time = 0.0
+    
+    def is_loaded(self):
+        """Индекс прочитан полностью"""
+        return self.records is not None and self._index_stream is None
+    
+    def load(self):
+        """Загрузить и разобрать APKINDEX целиком (выполняется один раз за запуск)"""
+        if not self.is_loaded():
+            self.find(None)
+        return self.records
+    
+    def find(self, package_name):
+        """Найти запись пакета, дочитывая поток APKINDEX только до нужного места
+        
+        Если пакета с таким именем нет, имя разрешается как виртуальное
+        (so:, cmd:, pc: ...) - для этого индекс дочитывается до конца, чтобы
+        выбор провайдера не зависел от порядка записей.
+        При package_name=None поток дочитывается до конца.
+        """
+        if self.records is not None:
+            record = self.records.get(package_name)
+            if record is not None:
+                return record
+            if self._index_stream is None:
+                return self.find_provider(package_name)
+        
+        import urllib.error
+        start_time = time.perf_counter()
+        loaded_before = len(self.records) if self.records is not None else 0
+        try:
+            with profiler.span('apkindex.load'):
+                if self.records is None:
+                    self.loads += 1
+                    self.records = {}
+                    self.provides = {}
+                    self._index_stream = self._open_index_stream()
+            
+                for record in self._index_stream:
+                    self._add_record(record)
+                    if record.name == package_name and not self._stream_stores:
+                        return record
+            
+            self._index_stream = None
+            self._stream_stores = False
+            record = self.records.get(package_name)
+            if record is not None:
+                return record
+            return self.find_provider(package_name)
+        
+        except urllib.error.URLError as e:
+            self._reset_index_stream()
+            raise RepositoryError(f"Ошибка сети: {e}")
+        except Exception:
+            self._reset_index_stream()
+            raise
+        finally:
+            self.load_time += time.perf_counter() - start_time
+            if self.records is not None:
+                profiler.count('apkindex.records', len(self.records) - loaded_before)
+    
+    def _add_record(self, record):
+        """Добавить запись в индекс и в индекс виртуальных имен (за один проход)"""
+        name = record.name
+        # При повторах действует первая запись, как и при поиске по потоку
+        if name in self.records:
+            return
+        
+        record.repository = self.repository_url
+        self.records[name] = record
+        
+        priority = record.priority
+        for virtual_name in record.provides:
+            providers = self.provides.get(virtual_name)
+            if providers is None:
+                self.provides[virtual_name] = [name]
+            elif priority > self.records[providers[0]].priority:
+                # Провайдер с большим приоритетом k: становится основным
+                providers.insert(0, name)
+            else:
+                providers.append(name)
+    
+    def find_provider(self, virtual_name):
+        """Запись основного провайдера виртуального имени (None, если его нет)"""
+        if self.provides is None:
+            return None
+        providers = self.provides.get(virtual_name)
+        if not providers:
+            return None
+        return self.records[providers[0]]
+    
+    def _reset_index_stream(self):
+        """Сбросить недочитанный индекс, чтобы следующий запрос загрузил его заново"""
+        self.records = None
+        self.provides = None
+        self._index_stream = None
+        self._stream_stores = False
+    
+    def _open_index_stream(self):
+        """Открыть источник записей APKINDEX"""
+        if self.index_cache:
+            return self._open_index_stream_with_cache()
+        
+        self.index_source = 'network'
+        return APKParser.iter_apkindex(
+            self.repository_url,
+            arch=self.arch,
+            on_open=self._remember_source,
+            mirrors=self.mirrors
+        )
+    
+    def _known_arch(self):
+        """Архитектура из прошлых запусков (хранится в каталоге кэша)"""
+        if self.arch or not self.index_cache:
+            return None
+        return self.index_cache.recall_arch(self.repository_url)
+    
+    def _remember_source(self, result):
+        """Запомнить архитектуру и зеркало, с которого получен индекс"""
+        mirror = result.get('mirror')
+        self.mirror_url = mirror if mirror != result['url'] else None
+        self._remember_arch(result['arch'])
+    
+    def _remember_arch(self, arch):
+        """Запомнить архитектуру, по которой удалось получить индекс"""
+        self.resolved_arch = arch
+        if self.index_cache and not self.arch and arch:
+            self.index_cache.remember_arch(self.repository_url, arch)
+    
+    def _open_index_stream_with_cache(self):
+        """Открыть источник записей через дисковый кэш с условной ревалидацией"""
+        known_arch = self._known_arch()
+        architectures = [arch for arch, url in APKParser.get_candidate_urls(self.repository_url, self.arch)]
+        if known_arch in architectures:
+            architectures.remove(known_arch)
+            architectures.insert(0, known_arch)
+        meta = self.index_cache.find_entry(self.repository_url, architectures)
+        
+        # Свежая запись или офлайн-режим - сеть не нужна
+        if meta and (self.offline or self.index_cache.is_fresh(meta)):
+            self.index_source = 'cache'
+            return iter(self.index_cache.load_index(meta).values())
+        
+        if self.offline:
+            raise RepositoryError(
+                f"Офлайн-режим: в кэше нет APKINDEX для репозитория '{self.repository_url}'"
+            )
+        
+        try:
+            if meta:
+                result = APKParser.open_apkindex_archive(
+                    self.repository_url,
+                    url=meta['url'],
+                    etag=meta.get('etag'),
+                    last_modified=meta.get('last_modified'),
+                    mirrors=self.mirrors
+                )
+            else:
+                result = APKParser.open_apkindex_archive(
+                    self.repository_url, arch=self.arch, preferred_arch=known_arch, mirrors=self.mirrors
+                )
+        except RepositoryError:
+            if meta:
+                # Сеть недоступна - используем устаревший кэш
+                print(f"Предупреждение: репозиторий '{self.repository_url}' недоступен, "
+                      f"используется устаревший кэш APKINDEX")
+                self.index_source = 'stale-cache'
+                return iter(self.index_cache.load_index(meta).values())
+            raise
+        
+        self._remember_source(result)
+        if result['not_modified']:
+            self.index_cache.touch(meta, result['etag'], result['last_modified'])
+            self.index_source = 'revalidated-cache'
+            return iter(self.index_cache.load_index(meta).values())
+        
+        self.index_source = 'network'
+        self._stream_stores = True
+        return self._stream_and_store(result)
+    
+    def _stream_and_store(self, result):
+        """Разбирать архив по мере загрузки, одновременно сохраняя его в кэш"""
+        archive_file = self.index_cache.open_archive_file(self.repository_url, result['arch'])
+        try:
+            with result['response'] as response:
+                tee = TeeReader(response, archive_file)
+                yield from APKParser.iter_apkindex_archive(tee)
+                tee.drain()
+        except BaseException:
+            IndexCache.discard_archive_file(archive_file)
+            raise
+        
+        # К этому моменту все записи уже добавлены в self.records
+        self.index_cache.store(
+            self.repository_url, result['arch'], result['url'], archive_file, self.records,
+            etag=result['etag'], last_modified=result['last_modified']
+        )
@@ -0,0 +1,231 @@
+import json
+import os
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from .dependency_graph import DependencyGraph
+from .errors import ClosureMemoryError
+
+class GraphSnapshot:
+    """Неизменяемый после построения граф всего репозитория для обслуживания запросов
+    
+    Все ленивые структуры (компоненты сильной связности, замыкания)
+    вычисляются при построении, поэтому чтение из разных потоков ничего
+    не изменяет и не требует блокировок. Если передан предыдущий снимок,
+    новый строится из его копии применением разницы индексов.
+    """
+    
+    def __init__(self, repository_manager, generation, closure_memory_limit=None, previous=None):
+        self.repository_manager = repository_manager
+        self.generation = generation
+        self.update_stats = None
+        
+        start_time = time.perf_counter()
+        if previous is not None:
+            self.dependency_graph = previous.dependency_graph.copy()
+            self.dependency_graph.repository_manager = repository_manager
+            self.update_stats = self.dependency_graph.apply_changes(
+                repository_manager.diff_dependencies(previous.repository_manager)
+            )
+            self.cycles = self.dependency_graph.has_cycles()
+        else:
+            self.dependency_graph = DependencyGraph(
+                repository_manager, closure_memory_limit=closure_memory_limit
+            )
+            self.cycles = self.dependency_graph.build_full_graph()
+        self.dependency_graph.get_condensation()
+        try:
+            self.dependency_graph.get_closure_index()
+        except ClosureMemoryError:
+            # Замыкания не помещаются в лимит - запросы обходят граф
+            pass
+        
+        self.build_time = time.perf_counter() - start_time
+        self.built_at = time.time()
+
+
+class DependencyServer:
+    """Сервер запросов к графу зависимостей с фоновым обновлением индекса
+    
+    Запросы читают текущий снимок графа; обновление строит новый снимок
+    в отдельном потоке и подменяет ссылку на него одним присваиванием.
+    """
+    
+    def __init__(self, manager_factory, refresh_interval=300, closure_memory_limit=None):
+        self.manager_factory = manager_factory
+        self.refresh_interval = refresh_interval
+        self.closure_memory_limit = closure_memory_limit
+        
+        self.snapshot = GraphSnapshot(manager_factory(), 1, closure_memory_limit)
+        self.refresh_error = None
+        self.refresh_requested = threading.Event()
+        self.stopped = threading.Event()
+        self.httpd = None
+    
+    def refresh(self):
+        """Построить новый снимок и подменить текущий (при ошибке остается старый)
+        
+        Снимок обновляется по разнице с текущим индексом; если это не
+        удалось, граф строится заново.
+        """
+        generation = self.snapshot.generation + 1
+        try:
+            manager = self.manager_factory()
+            try:
+                snapshot = GraphSnapshot(manager, generation, self.closure_memory_limit, self.snapshot)
+            except Exception as e:
+                print(f"Предупреждение: инкрементальное обновление не удалось ({e}), граф строится заново")
+                snapshot = GraphSnapshot(manager, generation, self.closure_memory_limit)
+        except Exception as e:
+            self.refresh_error = str(e)
+            print(f"Предупреждение: не удалось обновить индекс: {e}")
+            return False
+        
+        self.snapshot = snapshot
+        self.refresh_error = None
+        return True
+    
+    def _refresh_loop(self):
+        """Фоновое обновление по интервалу или по запросу POST /refresh"""
+        timeout = self.refresh_interval if self.refresh_interval > 0 else None
+        while not self.stopped.is_set():
+            self.refresh_requested.wait(timeout)
+            if self.stopped.is_set():
+                break
+            self.refresh_requested.clear()
+            self.refresh()
+    
+    def serve(self, host='127.0.0.1', port=8080, socket_path=None):
+        """Обслуживать запросы до остановки (HTTP по TCP или по Unix-сокету)"""
+        # Для TCP отключаем алгоритм Нейгла: иначе ответы keep-alive ждут подтверждения
+        handler = type('BoundRequestHandler', (RequestHandler,), {
+            'server_state': self,
+            'disable_nagle_algorithm': not socket_path,
+        })
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            self.httpd = ThreadingUnixHTTPServer(socket_path, handler)
+        else:
+            self.httpd = ThreadingHTTPServer((host, port), handler)
+        
+        refresher = threading.Thread(target=self._refresh_loop, daemon=True)
+        refresher.start()
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.stopped.set()
+            self.refresh_requested.set()
+            self.httpd.server_close()
+            if socket_path and os.path.exists(socket_path):
+                os.unlink(socket_path)
+    
+    def shutdown(self):
+        """Остановить сервер из другого потока"""
+        if self.httpd:
+            self.httpd.shutdown()
+    
+    # --- Запросы (выполняются над одним снимком) ---
+    
+    def query(self, path, params):
+        """Ответ на запрос: (HTTP-статус, словарь)"""
+        snapshot = self.snapshot
+        graph = snapshot.dependency_graph
+        
+        if path == '/status':
+            return 200, {
+                'generation': snapshot.generation,
+                'built_at': snapshot.built_at,
+                'build_time': round(snapshot.build_time, 3),
+                'packages': len(graph.graph),
+                'edges': graph.edge_count,
+                'cycles': len(snapshot.cycles),
+                'update': snapshot.update_stats,
+                'refresh_error': self.refresh_error,
+            }
+        
+        if path == '/cycles':
+            packages = params.get('package')
+            if not packages:
+                return 200, {'cycles': graph.get_cyclic_components()}
+            package = packages[0]
+            if package not in graph.graph:
+                return 404, {'error': f"Пакет '{package}' не найден"}
+            cycles = [group for wave in graph.get_install_waves(package) for group in wave
+                      if len(group) > 1 or group[0] in graph.graph.get(group[0], ())]
+            return 200, {'package': package, 'cycles': cycles}
+        
+        if path not in ('/closure', '/reverse', '/install-order'):
+            return 404, {'error': f"Неизвестный запрос: {path}"}
+        
+        packages = params.get('package')
+        if not packages:
+            return 400, {'error': "Не указан параметр package"}
+        missing = [package for package in packages if graph.node_id(package) is None]
+        if missing:
+            return 404, {'error': f"Пакеты не найдены: {', '.join(missing)}"}
+        package = packages[0]
+        
+        if path == '/closure':
+            return 200, {'package': package, 'dependencies': graph.get_all_dependencies(package)}
+        
+        if path == '/reverse':
+            depth = params.get('depth')
+            try:
+                max_depth = int(depth[0]) if depth else None
+            except ValueError:
+                return 400, {'error': f"Некорректная глубина: {depth[0]}"}
+            return 200, {'packages': packages, 'dependents': graph.get_reverse_closure(packages, max_depth)}
+        
+        waves = graph.get_install_waves(package)
+        return 200, {
+            'package': package,
+            'install_order': [name for wave in waves for group in wave for name in group],
+            'waves': waves,
+        }
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP-сервер на Unix-сокете (поток на соединение)"""
+    
+    daemon_threads = True
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """GET-запросы к графу и POST /refresh; ответы в JSON"""
+    
+    server_state = None
+    protocol_version = 'HTTP/1.1'
+    
+    def do_GET(self):
+        """Запрос к текущему снимку графа"""
+        url = urlsplit(self.path)
+        status, body = self.server_state.query(url.path, parse_qs(url.query))
+        self._send_json(status, body)
+    
+    def do_POST(self):
+        """Внеочередное обновление индекса в фоне"""
+        if urlsplit(self.path).path != '/refresh':
+            self._send_json(404, {'error': f"Неизвестный запрос: {self.path}"})
+            return
+        self.server_state.refresh_requested.set()
+        self._send_json(202, {'refresh': 'scheduled', 'generation': self.server_state.snapshot.generation})
+    
+    def _send_json(self, status, body):
+        """Отправить ответ в JSON"""
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def address_string(self):
+        """Адрес клиента (у Unix-сокета это пустая строка)"""
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+    
+    def log_message(self, format, *args):
+        """Журнал запросов отключен: на каждый запрос приходилась бы строка вывода"""
+        pass
@@ -0,0 +1,98 @@
+import sys
+
+class AsciiTreeRenderer:
+    """Итеративный вывод ASCII-дерева зависимостей
+    
+    Каждое общее поддерево раскрывается один раз, повторные вхождения
+    ссылаются на строку первого вывода, а ребра назад по циклу помечаются
+    отдельно. Поэтому объем вывода линеен по числу ребер графа.
+    """
+    
+    # Сколько строк накапливается перед записью в поток
+    FLUSH_LINES = 1024
+    
+    def __init__(self, dependency_graph, max_depth=None, max_width=None, stream=None):
+        self.dependency_graph = dependency_graph
+        self.max_depth = max_depth
+        self.max_width = max_width
+        self.stream = stream if stream is not None else sys.stdout
+        self._buffer = []
+        self.line_count = 0
+    
+    def render(self, package):
+        """Вывести дерево пакета; возвращает количество строк"""
+        graph = self.dependency_graph
+        node_id = graph.names.get_id(package)
+        if node_id is None:
+            self._write(f"└── {package}")
+            self._flush()
+            return self.line_count
+        
+        first_line = {}   # ID узла -> номер строки, где раскрыто его поддерево
+        on_path = set()
+        
+        # Элемент стека: (ID узла или None для служебной строки, префикс, последний ли, глубина, текст)
+        stack = [(node_id, "", True, 0, None)]
+        path = []         # (ID узла, глубина) текущей ветви
+        
+        while stack:
+            current, prefix, is_last, depth, text = stack.pop()
+            
+            # Снимаем с пути узлы, ветви которых уже выведены
+            while path and path[-1][1] >= depth:
+                on_path.discard(path.pop()[0])
+            
+            branch = "└── " if is_last else "├── "
+            if current is None:
+                self._write(f"{prefix}{branch}{text}")
+                continue
+            
+            name = graph.names.name(current)
+            dependencies = graph.successors(current)
+            
+            if dependencies and current in on_path:
+                self._write(f"{prefix}{branch}{name} (↺ цикл)")
+                continue
+            if dependencies and current in first_line:
+                self._write(f"{prefix}{branch}{name} (см. строку {first_line[current]})")
+                continue
+            if dependencies and self.max_depth is not None and depth >= self.max_depth:
+                self._write(f"{prefix}{branch}{name} (…)")
+                continue
+            
+            self._write(f"{prefix}{branch}{name}")
+            if not dependencies:
+                continue
+            
+            first_line[current] = self.line_count
+            on_path.add(current)
+            path.append((current, depth))
+            
+            child_prefix = prefix + ("    " if is_last else "│   ")
+            shown = len(dependencies)
+            if self.max_width is not None and shown > self.max_width:
+                shown = self.max_width
+                stack.append((None, child_prefix, True, depth + 1,
+                              f"… еще {len(dependencies) - shown}"))
+            
+            # Кладем в обратном порядке, чтобы выводить в исходном
+            for index in range(shown - 1, -1, -1):
+                last = index == len(dependencies) - 1
+                stack.append((dependencies[index], child_prefix, last, depth + 1, None))
+        
+        self._flush()
+        return self.line_count
+    
+    def _write(self, line):
+        """Добавить строку в буфер"""
+        self._buffer.append(line)
+        self.line_count += 1
+        if len(self._buffer) >= self.FLUSH_LINES:
+            self._flush()
+    
+    def _flush(self):
+        """Записать накопленные строки одним вызовом"""
+        if self._buffer:
+            self._buffer.append("")
+            self.stream.write("\n".join(self._buffer))
+            self._buffer.clear()
@@ -1,89 +1,43 @@
+import io
 from .errors import ConfigurationError
+from .exporters import PlantUMLExporter, CompactPlantUMLExporter
+from .profiler import profiler
 
 class PlantUMLVisualizer:
     def __init__(self, dependency_graph):
         self.dependency_graph = dependency_graph
         self.plantuml_code = ""
     
-    def generate_plantuml(self, root_package):
-        """Генерация кода PlantUML для графа зависимостей"""
-        if root_package not in self.dependency_graph.graph:
-            raise ConfigurationError(f"Пакет '{root_package}' не найден в графе")
-        
-        plantuml = ["@startuml", "hide empty description", "skinparam monochrome true"]
-        
-        # Добавляем все узлы и связи
-        visited = set()
-        
-        def add_connections(package):
-            if package in visited:
-                return
-            visited.add(package)
-            
-            dependencies = self.dependency_graph.graph.get(package, [])
-            for dep in dependencies:
-                # Добавляем связь
-                plantuml.append(f'"{package}" --> "{dep}"')
-                # Рекурсивно добавляем зависимости
-                add_connections(dep)
-        
-        # Начинаем с корневого пакета
-        add_connections(root_package)
-        
-        # Добавляем стили для корневого пакета
-        plantuml.append(f'"{root_package}" #LightBlue')
-        
-        plantuml.append("@enduml")
-        self.plantuml_code = "\n".join(plantuml)
-        return self.plantuml_code
+    @profiler.timed('render.plantuml')
+    def generate_plantuml(self, root_package, stream=None):
+        """Генерация кода PlantUML для графа зависимостей (только связи между пакетами)
+        
+        Если передан stream, диаграмма пишется в него по мере обхода и не
+        собирается в памяти; возвращается (узлов, связей).
+        """
+        return self._generate(CompactPlantUMLExporter, root_package, stream)
     
-    def generate_simple_plantuml(self, root_package):
-        """Упрощенная версия для лучшей читаемости"""
+    @profiler.timed('render.plantuml')
+    def generate_simple_plantuml(self, root_package, stream=None):
+        """Упрощенная версия для лучшей читаемости (stream - как в generate_plantuml)"""
+        return self._generate(PlantUMLExporter, root_package, stream)
+    
+    def _generate(self, exporter_class, root_package, stream):
+        """Выгрузка подграфа от root_package потоковым экспортером"""
         if root_package not in self.dependency_graph.graph:
             raise ConfigurationError(f"Пакет '{root_package}' не найден в графе")
         
-        plantuml = [
-            "@startuml",
-            "left to right direction",
-            "skinparam nodesep 10",
-            "skinparam ranksep 50",
-            "skinparam packageStyle rect",
-            "skinparam shadowing false",
-            ""
-        ]
-        
-        # Группируем по уровням глубины
-        levels = {}
-        for package in self.dependency_graph.graph:
-            depth = self.dependency_graph.depth_map.get(package, 0)
-            if depth not in levels:
-                levels[depth] = []
-            levels[depth].append(package)
-        
-        # Добавляем пакеты сгруппированные по уровням
-        for depth in sorted(levels.keys()):
-            if depth == 0:
-                # Корневой пакет
-                plantuml.append(f'rectangle "{root_package}" as {root_package.replace(".", "_")} #LightBlue')
-            else:
-                for package in levels[depth]:
-                    plantuml.append(f'rectangle "{package}" as {package.replace(".", "_").replace(":", "_").replace("/", "_")}')
-        
-        plantuml.append("")
-        
-        # Добавляем связи
-        visited_connections = set()
-        for package, dependencies in self.dependency_graph.graph.items():
-            for dep in dependencies:
-                connection = f'{package.replace(".", "_").replace(":", "_").replace("/", "_")} --> {dep.replace(".", "_").replace(":", "_").replace("/", "_")}'
-                if connection not in visited_connections:
-                    plantuml.append(connection)
-                    visited_connections.add(connection)
+        # Узлы идут в порядке обхода в ширину, то есть по уровням глубины
+        exporter = exporter_class(self.dependency_graph)
+        if stream is not None:
+            return exporter.export(stream, root_package)
         
-        plantuml.append("@enduml")
-        self.plantuml_code = "\n".join(plantuml)
+        buffer = io.StringIO()
+        exporter.export(buffer, root_package)
+        self.plantuml_code = buffer.getvalue().rstrip("\n")
         return self.plantuml_code
     
+    @profiler.timed('render.write')
     def save_plantuml_to_file(self, filename):
         """Сохранить PlantUML код в файл"""
         with open(filename, 'w', encoding='utf-8') as f: